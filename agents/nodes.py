@@ -1,175 +1,199 @@
-from retrieval.dense import DenseRetriever
-from retrieval.bm import SparseRetriever
-from retrieval.rrf import rrf
-from retrieval.rerank import simple_rerank
-from retrieval.recency import apply_recency_boost, within_recency_window
-from core.vector_store import VectorStore
-from groq import AsyncGroq
-from config import LLM_MODEL
-from dotenv import load_dotenv
-import os
-from langsmith import traceable
-from core.guardrails import validate_input_guardrail, sanitize_pii_and_secrets, is_grounded_context_sufficient
-
-load_dotenv()
-
-client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"))
-
-if not os.getenv("GROQ_API_KEY"):
-    raise RuntimeError("GROQ_API_KEY not set")
-
-
-def _filter_docs(docs: list, team: str | None, status_filter: str | None, severity_filter: str | None) -> list:
-    filtered = []
-    for d in docs:
-        meta = d.get("metadata", {}) or {}
-        if team and meta.get("team_tag") != team:
-            continue
-        if status_filter and meta.get("status", "OPEN") != status_filter.upper():
-            continue
-        if severity_filter and meta.get("severity", "").lower() != severity_filter.lower():
-            continue
-        sev = meta.get("severity")
-        if not within_recency_window(meta.get("timestamp"), sev):
-            continue
-        filtered.append(d)
-    return filtered
-
-
-@traceable(name="retrieve_node")
-def retrieve_node(state, _):
-    """
-    Hybrid retrieval with team filtering, recency weighting, and lifecycle filters.
-    """
-    query = state["query"]
-    is_valid, processed_query = validate_input_guardrail(query)
-    if not is_valid:
-        return {"docs": [], "blocked_reason": processed_query}
-    query = sanitize_pii_and_secrets(processed_query)
-    team = state.get("team")
-    status_filter = state.get("status_filter")
-    severity_filter = state.get("severity_filter")
-
-    vector_store = VectorStore()
-
-    dense = DenseRetriever(vector_store).search(query, 8)
-    dense = _filter_docs(dense, team, status_filter, severity_filter)
-
-    if team:
-        texts = [text for text, meta in vector_store.iter_docs() if meta.get("team_tag") == team]
-    else:
-        texts = vector_store.store.all_texts()
-
-    sparse = SparseRetriever(texts).search(query, 8) if texts else []
-
-    sparse_docs = []
-    text_to_meta = {text: meta for text, meta in vector_store.iter_docs()}
-    for text, bm25_score in sparse:
-        meta = text_to_meta.get(text, {})
-        if team and meta.get("team_tag") != team:
-            continue
-        if status_filter and meta.get("status", "OPEN") != status_filter.upper():
-            continue
-        if severity_filter and meta.get("severity", "").lower() != severity_filter.lower():
-            continue
-        if not within_recency_window(meta.get("timestamp"), meta.get("severity")):
-            continue
-        sparse_docs.append({"text": text, "score": 0, "bm25_score": bm25_score, "metadata": meta})
-
-    # Merge dense with bm25 scores
-    dense_enriched = []
-    bm25_map = {t: s for t, s in sparse}
-    for d in dense:
-        dense_enriched.append({**d, "bm25_score": bm25_map.get(d["text"], 0)})
-
-    fused = rrf(dense_enriched, [(d["text"], d["bm25_score"]) for d in sparse_docs])
-    fused_docs = []
-    all_by_text = {d["text"]: d for d in dense_enriched}
-    for t in sparse_docs:
-        all_by_text.setdefault(t["text"], t)
-    for text in fused:
-        fused_docs.append(all_by_text.get(text, {"text": text, "score": 0, "metadata": {}}))
-
-    boosted = apply_recency_boost(fused_docs)
-    reranked = simple_rerank(query, [{"text": d["text"], "final_score": d.get("final_score", 0)} for d in boosted])
-
-    return {"docs": [d["text"] for d in reranked[:3]]}
-
-
-def _system_prompt_for_team(team: str | None, user_context: dict | None = None) -> str:
-    base_prompt = "You are an operations analyst for an incident intelligence platform."
-    if team:
-        team_lower = team.lower()
-        if "devops" in team_lower:
-            base_prompt = "You are a DevOps SRE assistant focused on infrastructure, deployments, and reliability."
-        elif "security" in team_lower:
-            base_prompt = "You are a security analyst assistant focused on vulnerabilities and threats."
-        elif "ops" in team_lower or "backend" in team_lower:
-            base_prompt = "You are an operations analyst focused on incidents, SLAs, and service health."
-
-    if user_context:
-        base_prompt += f"\n\nSpeaking to {user_context.get('email', 'engineer')} (role: {user_context.get('role', 'engineer')})."
-    return base_prompt
-
-
-@traceable(name="answer_node")
-async def answer_node(state):
-    if state.get("blocked_reason"):
-        return {"answer": state["blocked_reason"]}
-
-    if not is_grounded_context_sufficient(state.get("docs", [])):
-        return {
-            "answer": "🔒 **Groundedness Guard Active:** Zero relevant historical incidents matching your inquiry were found in the vector database. LLM inference has been automatically bypassed to prevent AI hallucination and conserve API token consumption."
-        }
-
-    context = sanitize_pii_and_secrets("\n".join(state["docs"]))
-    team = state.get("team")
-    user_context = state.get("user_context")
-    system_prompt = _system_prompt_for_team(team, user_context)
-
-    prompt = f"""{system_prompt}
-
-Using ONLY the incident context below:
-- Explain relevant incidents in your own words
-- Note severity, status, and recency when available
-- Do NOT copy sentences verbatim
-- Do NOT add external assumptions
-
-Context:
-{context}
-
-Question:
-{state['query']}"""
-
-    res = await client.chat.completions.create(
-        model=LLM_MODEL,
-        messages=[{"role": "user", "content": prompt}],
-    )
-    return {"answer": res.choices[0].message.content}
-
-
-@traceable(name="summarize_node")
-async def summarize_node(state):
-    """Summarize retrieved incidents into structured output."""
-    if state.get("blocked_reason"):
-        return {"answer": state["blocked_reason"]}
-
-    if not is_grounded_context_sufficient(state.get("docs", [])):
-        return {"answer": "No valid historical incident context available for summarization."}
-
-    context = sanitize_pii_and_secrets("\n".join(state.get("docs", [])))
-    prompt = f"""Summarize these operational incidents. Provide:
-1. Executive summary (2-3 sentences)
-2. Root cause patterns
-3. Impact assessment
-4. Recommended remediation
-
-Incidents:
-{context}"""
-
-    res = await client.chat.completions.create(
-        model=LLM_MODEL,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.2,
-    )
-    return {"answer": res.choices[0].message.content}
+from retrieval.dense import DenseRetriever
+from retrieval.fusion import fuse
+from retrieval.rerank import simple_rerank
+from retrieval.recency import in_recency_window, min_time_bucket, recency_arrays
+from core.vector_store import get_vector_store
+from groq import AsyncGroq
+from config import LLM_MODEL
+from dotenv import load_dotenv
+import asyncio
+import os
+import time
+from langsmith import traceable
+from core.guardrails import validate_input_guardrail, sanitize_pii_and_secrets, is_grounded_context_sufficient
+from core.compute import run_cpu
+from core.metrics import LLM_REQUEST_SECONDS, RETRIEVAL_STAGE_SECONDS as STAGE, count_candidates
+
+load_dotenv()
+
+client = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"))
+
+if not os.getenv("GROQ_API_KEY"):
+    raise RuntimeError("GROQ_API_KEY not set")
+
+
+def _filter_docs(
+    docs: list, team: str | None, status_filter: str | None, severity_filter: str | None, now: float
+) -> list:
+    filtered = []
+    for d in docs:
+        meta = d.get("metadata", {}) or {}
+        if team and meta.get("team_tag") != team:
+            continue
+        if status_filter and meta.get("status", "OPEN") != status_filter.upper():
+            continue
+        if severity_filter and meta.get("severity", "").lower() != severity_filter.lower():
+            continue
+        filtered.append(d)
+    return _within_window(filtered, now)
+
+
+def _within_window(docs: list, now: float) -> list:
+    """Drop documents older than their severity's recency window (one vectorized pass)."""
+    if not docs:
+        return docs
+    keep = in_recency_window(*recency_arrays([d.get("metadata", {}) or {} for d in docs]), now)
+    return [d for d, ok in zip(docs, keep.tolist()) if ok]
+
+
+@traceable(name="retrieve_node")
+async def retrieve_node(state, vector_store=None):
+    """
+    Hybrid retrieval with team filtering, recency weighting, and lifecycle filters.
+    Dense search and sparse search + metadata fetch run concurrently.
+    """
+    query = state["query"]
+    with STAGE.time("guardrails"):
+        is_valid, processed_query = validate_input_guardrail(query)
+        if is_valid:
+            query = await run_cpu(sanitize_pii_and_secrets, processed_query)
+    if not is_valid:
+        return {"docs": [], "blocked_reason": processed_query}
+    team = state.get("team")
+    status_filter = state.get("status_filter")
+    severity_filter = state.get("severity_filter")
+
+    vector_store = vector_store or get_vector_store()
+    # One "now" for windowing and decay across the whole request
+    now = time.time()
+    # Only time partitions inside the largest applicable recency window are searched
+    min_bucket = min_time_bucket(severity_filter, now)
+
+    async def dense_search():
+        # Includes the query embedding (see embedding_encode_seconds)
+        with STAGE.time("dense"):
+            return await DenseRetriever(vector_store).search_async(
+                query, 8, team_tag=team, status=status_filter, severity=severity_filter, min_bucket=min_bucket
+            )
+
+    async def sparse_search():
+        with STAGE.time("sparse"):
+            ids, scores = await vector_store.sparse_search_async(query, 8, team_tag=team, min_bucket=min_bucket)
+        with STAGE.time("hydrate"):
+            meta = await vector_store.get_documents_async(ids.tolist())
+        return ids, scores, meta
+
+    dense, (sparse_ids, sparse_scores, sparse_meta) = await asyncio.gather(dense_search(), sparse_search())
+
+    with STAGE.time("dense_filter"):
+        dense_hits = len(dense)
+        dense = _filter_docs(dense, team, status_filter, severity_filter, now)
+    count_candidates("dense_filter", dense_hits, len(dense))
+
+    with STAGE.time("sparse_filter"):
+        sparse_docs = []
+        for doc_id, bm25_score in zip(sparse_ids.tolist(), sparse_scores.tolist()):
+            doc = sparse_meta.get(doc_id)
+            if doc is None:
+                continue
+            meta = doc.get("metadata", {}) or {}
+            if status_filter and meta.get("status", "OPEN") != status_filter.upper():
+                continue
+            if severity_filter and meta.get("severity", "").lower() != severity_filter.lower():
+                continue
+            sparse_docs.append(
+                {"id": doc_id, "text": doc["text"], "bm25_score": bm25_score, "metadata": meta}
+            )
+        sparse_docs = _within_window(sparse_docs, now)
+    count_candidates("sparse_filter", len(sparse_ids), len(sparse_docs))
+
+    with STAGE.time("fusion"):
+        fused = fuse(dense, sparse_docs, now)
+    count_candidates("fusion", len(dense) + len(sparse_docs), len(fused))
+
+    with STAGE.time("rerank"):
+        reranked = await run_cpu(simple_rerank, query, fused)
+    count_candidates("rerank", len(fused), min(len(reranked), 3))
+
+    return {"docs": [d["text"] for d in reranked[:3]]}
+
+
+def _system_prompt_for_team(team: str | None, user_context: dict | None = None) -> str:
+    base_prompt = "You are an operations analyst for an incident intelligence platform."
+    if team:
+        team_lower = team.lower()
+        if "devops" in team_lower:
+            base_prompt = "You are a DevOps SRE assistant focused on infrastructure, deployments, and reliability."
+        elif "security" in team_lower:
+            base_prompt = "You are a security analyst assistant focused on vulnerabilities and threats."
+        elif "ops" in team_lower or "backend" in team_lower:
+            base_prompt = "You are an operations analyst focused on incidents, SLAs, and service health."
+
+    if user_context:
+        base_prompt += f"\n\nSpeaking to {user_context.get('email', 'engineer')} (role: {user_context.get('role', 'engineer')})."
+    return base_prompt
+
+
+@traceable(name="answer_node")
+async def answer_node(state):
+    if state.get("blocked_reason"):
+        return {"answer": state["blocked_reason"]}
+
+    if not is_grounded_context_sufficient(state.get("docs", [])):
+        return {
+            "answer": "🔒 **Groundedness Guard Active:** Zero relevant historical incidents matching your inquiry were found in the vector database. LLM inference has been automatically bypassed to prevent AI hallucination and conserve API token consumption."
+        }
+
+    context = await run_cpu(sanitize_pii_and_secrets, "\n".join(state["docs"]))
+    team = state.get("team")
+    user_context = state.get("user_context")
+    system_prompt = _system_prompt_for_team(team, user_context)
+
+    prompt = f"""{system_prompt}
+
+Using ONLY the incident context below:
+- Explain relevant incidents in your own words
+- Note severity, status, and recency when available
+- Do NOT copy sentences verbatim
+- Do NOT add external assumptions
+
+Context:
+{context}
+
+Question:
+{state['query']}"""
+
+    with LLM_REQUEST_SECONDS.time("answer"):
+        res = await client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+        )
+    return {"answer": res.choices[0].message.content}
+
+
+@traceable(name="summarize_node")
+async def summarize_node(state):
+    """Summarize retrieved incidents into structured output."""
+    if state.get("blocked_reason"):
+        return {"answer": state["blocked_reason"]}
+
+    if not is_grounded_context_sufficient(state.get("docs", [])):
+        return {"answer": "No valid historical incident context available for summarization."}
+
+    context = await run_cpu(sanitize_pii_and_secrets, "\n".join(state.get("docs", [])))
+    prompt = f"""Summarize these operational incidents. Provide:
+1. Executive summary (2-3 sentences)
+2. Root cause patterns
+3. Impact assessment
+4. Recommended remediation
+
+Incidents:
+{context}"""
+
+    with LLM_REQUEST_SECONDS.time("summarize"):
+        res = await client.chat.completions.create(
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.2,
+        )
+    return {"answer": res.choices[0].message.content}
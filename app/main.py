@@ -1,8 +1,9 @@
 from fastapi import FastAPI, Body, Depends, Query, HTTPException
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from contextlib import asynccontextmanager
-from core.vector_store import VectorStore
+from core.vector_store import get_vector_store
 from agents.graph import build_graph
 from app.issues import router as issue_router
 from app.analytics import router as analytics_router
@@ -17,6 +18,10 @@ from app.rbac import can_access_team
 from core.summarizer import recommend_resolution
 from core.correlation import find_similar_incidents
 from jobs.scheduler import start_scheduler_in_thread
+from core import metrics
+from retrieval.recency import to_epoch
+import asyncio
+import json
 import time
 import os
 import uuid
@@ -31,15 +36,20 @@ print("Project:", os.getenv("LANGSMITH_PROJECT"))
 async def lifespan(app: FastAPI):
     from config import VECTOR_BACKEND, QDRANT_HOST, QDRANT_PORT
 
-    if VECTOR_BACKEND == "qdrant":
-        try:
-            from qdrant_client import QdrantClient
-            client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT, check_compatibility=False)
-            client.get_collections()
-            print(f"Qdrant connected at {QDRANT_HOST}:{QDRANT_PORT}")
-        except Exception as e:
+    # One backend + client for the whole process, injected via get_vector_store
+    try:
+        app.state.vector_store = await asyncio.to_thread(get_vector_store)
+        health = app.state.vector_store.health()
+        if health["ok"]:
+            print(f"Vector store ready ({VECTOR_BACKEND}): {health}")
+        else:
+            print(f"WARNING: vector store unhealthy — {health}")
+    except Exception as e:
+        if VECTOR_BACKEND == "qdrant":
             print(f"WARNING: Qdrant not reachable at {QDRANT_HOST}:{QDRANT_PORT} — {e}")
             print("Start with: docker compose up -d qdrant")
+        else:
+            print(f"WARNING: vector store failed to load — {e}")
 
     start_scheduler_in_thread()
     yield
@@ -79,7 +89,6 @@ async def register_user(req: RegisterRequest):
     if not supabase:
         raise HTTPException(500, "Supabase not configured")
 
-    import asyncio
     try:
         user_res = await asyncio.to_thread(
             lambda: supabase.auth.admin.create_user({
@@ -107,7 +116,15 @@ async def register_user(req: RegisterRequest):
     return {"message": "User registered successfully", "user_id": user.id}
 
 
-store = VectorStore()
+_graphs: dict = {}
+
+
+def _get_graph(mode: str):
+    """Compiled graphs are stateless; build one per mode and reuse it."""
+    graph = _graphs.get(mode)
+    if graph is None:
+        graph = _graphs[mode] = build_graph(get_vector_store(), mode=mode)
+    return graph
 
 
 @traceable(name="ask_request", run_type="chain")
@@ -128,7 +145,7 @@ async def _handle_ask(
             run_tree.add_metadata({"thread_id": request_id})
         except Exception as e:
             print(f"Failed to set LangSmith run metadata: {e}")
-    graph = build_graph(store, mode=mode)
+    graph = _get_graph(mode)
     initial_state: dict = {"query": query}
     if team:
         initial_state["team"] = team
@@ -138,20 +155,100 @@ async def _handle_ask(
         initial_state["status_filter"] = status_filter
     if severity_filter:
         initial_state["severity_filter"] = severity_filter
-    return await graph.ainvoke(initial_state)
+    result = await graph.ainvoke(initial_state)
+    if isinstance(result, dict) and result.get("docs"):
+        result = {**result, "docs": _string_ids(result["docs"])}
+    return result
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Per-stage retrieval, embedding and LLM latency histograms for Prometheus to scrape."""
+    from config import METRICS_ENABLED
+
+    if not METRICS_ENABLED:
+        raise HTTPException(404, "Metrics are disabled (METRICS_ENABLED=false)")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health")
+async def health(vs=Depends(get_vector_store)):
+    """Liveness plus vector backend reachability."""
+    status = await asyncio.to_thread(vs.health)
+    if not status["ok"]:
+        raise HTTPException(503, status)
+    return {"status": "ok", "vector_store": status}
+
+
+def _string_ids(docs: list) -> list:
+    """Document ids go out as strings: 63-bit point ids exceed what a JS number holds exactly (2^53)."""
+    return [{**doc, "id": str(doc["id"])} if isinstance(doc, dict) and "id" in doc else doc for doc in docs]
+
+
+def _epoch_param(name: str, value: str | None) -> float | None:
+    if value is None:
+        return None
+    ts = to_epoch(value)
+    if ts is None:
+        raise HTTPException(400, f"{name} must be an ISO-8601 timestamp")
+    return ts
 
 
 @app.get("/documents")
-async def list_documents(user: UserContext = Depends(get_current_user)):
-    """List indexed documents (authenticated, team-scoped for non-admins)."""
-    vs = VectorStore()
-    docs = vs.store.docs
-    if user.role != "admin" and user.team:
-        docs = {
-            k: v for k, v in docs.items()
-            if v.get("metadata", {}).get("team_tag") == user.team
+async def list_documents(
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: str | None = Query(default=None),
+    team: str | None = Query(default=None),
+    status: str | None = Query(default=None),
+    severity: str | None = Query(default=None),
+    since: str | None = Query(default=None, description="ISO timestamp, inclusive"),
+    until: str | None = Query(default=None, description="ISO timestamp, exclusive"),
+    format: str = Query(default="json", pattern="^(json|ndjson)$"),
+    user: UserContext = Depends(get_current_user),
+    vs=Depends(get_vector_store),
+):
+    """
+    List indexed documents (authenticated, team-scoped for non-admins), with
+    the filters applied inside the vector backend.
+
+    json: one page of `limit` documents keyed by id plus `next_cursor` (null
+    on the last page); ids and cursors are strings, as 63-bit point ids do
+    not survive a JS number. ndjson: every matching document from `cursor` on, one JSON object
+    per line, fetched `limit` at a time as the response streams.
+    """
+    if team is None and user.role != "admin":
+        team = user.team
+    if not can_access_team(user, team):
+        raise HTTPException(403, "You do not have access to this team's data")
+    try:
+        offset = int(cursor) if cursor is not None else None
+    except ValueError:
+        raise HTTPException(400, "Invalid cursor")
+    filters = {
+        "team_tag": team,
+        "status": status,
+        "severity": severity,
+        "min_ts": _epoch_param("since", since),
+        "max_ts": _epoch_param("until", until),
+    }
+
+    if format == "json":
+        docs, next_offset = await vs.scroll_async(limit, offset, **filters)
+        return {
+            "documents": {str(doc_id): doc for doc_id, doc in docs.items()},
+            "next_cursor": None if next_offset is None else str(next_offset),
         }
-    return docs
+
+    async def stream():
+        page_offset = offset
+        while True:
+            docs, page_offset = await vs.scroll_async(limit, page_offset, **filters)
+            if docs:
+                yield "".join(json.dumps({"id": str(doc_id), **doc}) + "\n" for doc_id, doc in docs.items())
+            if page_offset is None:
+                return
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
 
 
 @app.post("/ask")
@@ -212,13 +309,13 @@ async def recommend(
     query: str = Body(..., media_type="text/plain"),
     team_id: str | None = Query(default=None),
     user: UserContext = Depends(get_current_user),
+    vs=Depends(get_vector_store),
 ):
     """Suggest resolution based on similar historical incidents."""
     team = team_id or user.team
     if not can_access_team(user, team):
         raise HTTPException(403, "Access denied")
 
-    vs = VectorStore()
-    similar = find_similar_incidents(query, vs, team=team, k=5)
+    similar = await asyncio.to_thread(find_similar_incidents, query, vs, team=team, k=5)
     recommendation = await recommend_resolution(similar, query)
     return {"similar_incidents": similar, "recommendation": recommendation}
@@ -1,40 +1,113 @@
-import os
-
-# Embeddings — BGE-small for production-inspired setup; falls back to MiniLM
-EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
-EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
-TOP_K = int(os.getenv("TOP_K", "5"))
-LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.1-8b-instant")
-
-# Vector backend: "qdrant" (default) or "faiss" (local fallback)
-VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant").lower()
-QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
-QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
-QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "incidents")
-
-# Recency windows (days) by severity
-RECENCY_WINDOWS = {
-    "critical": int(os.getenv("RECENCY_CRITICAL_DAYS", "90")),
-    "high": int(os.getenv("RECENCY_HIGH_DAYS", "60")),
-    "normal": int(os.getenv("RECENCY_NORMAL_DAYS", "30")),
-    "low": int(os.getenv("RECENCY_LOW_DAYS", "30")),
-    "medium": int(os.getenv("RECENCY_MEDIUM_DAYS", "30")),
-}
-
-# Retention / cleanup
-RETENTION_DAYS_RESOLVED = int(os.getenv("RETENTION_DAYS_RESOLVED", "365"))
-RETENTION_DAYS_CLOSED = int(os.getenv("RETENTION_DAYS_CLOSED", "180"))
-CLEANUP_INTERVAL_HOURS = int(os.getenv("CLEANUP_INTERVAL_HOURS", "24"))
-
-# Notification channels
-SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL", "")
-TEAMS_WEBHOOK_URL = os.getenv("TEAMS_WEBHOOK_URL", "")
-SMTP_HOST = os.getenv("SMTP_HOST", "")
-SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
-SMTP_USER = os.getenv("SMTP_USER", "")
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
-NOTIFY_FROM_EMAIL = os.getenv("NOTIFY_FROM_EMAIL", "incidents@localhost")
-
-# RBAC roles (ordered by privilege)
-ROLES = ["analyst", "engineer", "sre", "team_lead", "admin"]
-ROLE_ALIASES = {"user": "engineer", "viewer": "analyst"}
+import os
+
+# Embeddings — BGE-small for production-inspired setup; falls back to MiniLM
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
+TOP_K = int(os.getenv("TOP_K", "5"))
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.1-8b-instant")
+
+# CPU-heavy stages (BM25, rerank, PII redaction, embedding): "thread" | "process" | "auto"
+# (auto = threads on a free-threaded build, processes otherwise); see core/compute.py
+CPU_EXECUTOR_MODE = os.getenv("CPU_EXECUTOR_MODE", "thread").lower()
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(os.cpu_count() or 4)))
+
+# Per-stage latency histograms / counters served on /metrics (Prometheus text format)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Embedding cache — in-memory LRU, optionally spilled to a memmap under EMBEDDING_CACHE_DIR
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "4096"))
+EMBEDDING_CACHE_TTL_SECONDS = int(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "3600"))
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "")
+EMBEDDING_CACHE_DISK_SLOTS = int(os.getenv("EMBEDDING_CACHE_DISK_SLOTS", "65536"))
+
+# Micro-batching — concurrent encode calls are coalesced into one model.encode
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+
+# Vector backend: "qdrant" (default) or "faiss" (local fallback)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant").lower()
+QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
+QDRANT_PORT = int(os.getenv("QDRANT_PORT", "6333"))
+QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "incidents")
+# Embedded Qdrant instead of a server: ":memory:" or a directory (benchmarks, local dev)
+QDRANT_LOCATION = os.getenv("QDRANT_LOCATION", "")
+# One client per process: HTTP keep-alive pool size (or gRPC), request timeout in seconds
+QDRANT_POOL_SIZE = int(os.getenv("QDRANT_POOL_SIZE", "32"))
+QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() in ("1", "true", "yes")
+QDRANT_TIMEOUT = int(os.getenv("QDRANT_TIMEOUT", "10"))
+# Node field (0-1023) of this process's point ids. Unset: leased from data/ so
+# writers sharing it never collide; set one per process when writers span hosts
+QDRANT_ID_NODE = os.getenv("QDRANT_ID_NODE", "")
+
+# Sparse (BM25) index — snapshot is rewritten after this many logged mutations
+SPARSE_COMPACT_EVERY = int(os.getenv("SPARSE_COMPACT_EVERY", "2000"))
+# FAISS backend: WAL records replayed on top of the snapshot before it is compacted
+FAISS_COMPACT_EVERY = int(os.getenv("FAISS_COMPACT_EVERY", "5000"))
+# FAISS index type: flat (exact) | hnsw | ivf_flat | ivf_pq. ANN types are only
+# built once the corpus reaches FAISS_ANN_MIN_DOCS; below that search stays exact.
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat").lower()
+FAISS_ANN_MIN_DOCS = int(os.getenv("FAISS_ANN_MIN_DOCS", "50000"))
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_HNSW_EF_CONSTRUCTION = int(os.getenv("FAISS_HNSW_EF_CONSTRUCTION", "80"))
+FAISS_IVF_NLIST = int(os.getenv("FAISS_IVF_NLIST", "0"))  # 0 = ~4*sqrt(corpus size)
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "48"))
+# Retrain IVF once the corpus grows by this factor; rebuild HNSW once this
+# fraction of its vectors are deleted (HNSW cannot remove in place)
+FAISS_REBUILD_GROWTH = float(os.getenv("FAISS_REBUILD_GROWTH", "2.0"))
+FAISS_TOMBSTONE_RATIO = float(os.getenv("FAISS_TOMBSTONE_RATIO", "0.2"))
+FAISS_MAINTENANCE_INTERVAL_MINUTES = int(os.getenv("FAISS_MAINTENANCE_INTERVAL_MINUTES", "30"))
+
+# Recency windows (days) by severity
+RECENCY_WINDOWS = {
+    "critical": int(os.getenv("RECENCY_CRITICAL_DAYS", "90")),
+    "high": int(os.getenv("RECENCY_HIGH_DAYS", "60")),
+    "normal": int(os.getenv("RECENCY_NORMAL_DAYS", "30")),
+    "low": int(os.getenv("RECENCY_LOW_DAYS", "30")),
+    "medium": int(os.getenv("RECENCY_MEDIUM_DAYS", "30")),
+}
+# Vector/sparse indexes are partitioned into time buckets of this many days;
+# queries only search buckets inside the largest applicable recency window
+TIME_BUCKET_DAYS = int(os.getenv("TIME_BUCKET_DAYS", "7"))
+
+# Kafka
+KAFKA_BOOTSTRAP_SERVERS = os.getenv("KAFKA_BOOTSTRAP_SERVERS", "localhost:9092")
+KAFKA_TOPIC = os.getenv("KAFKA_TOPIC", "live_issues")
+KAFKA_CONSUMER_GROUP = os.getenv("KAFKA_CONSUMER_GROUP", "incident-indexer")
+KAFKA_BATCH_MAX_RECORDS = int(os.getenv("KAFKA_BATCH_MAX_RECORDS", "256"))
+KAFKA_BATCH_MAX_WAIT_MS = float(os.getenv("KAFKA_BATCH_MAX_WAIT_MS", "500"))
+KAFKA_INDEX_CONCURRENCY = int(os.getenv("KAFKA_INDEX_CONCURRENCY", "2"))
+KAFKA_INDEX_MAX_RETRIES = int(os.getenv("KAFKA_INDEX_MAX_RETRIES", "5"))
+# A batch that still fails after this many redeliveries is dead-lettered and committed past
+KAFKA_INDEX_MAX_REDELIVERIES = int(os.getenv("KAFKA_INDEX_MAX_REDELIVERIES", "3"))
+# Records that cannot be indexed go here (with topic/partition/offset and the error); "" = log only
+KAFKA_DEAD_LETTER_TOPIC = os.getenv("KAFKA_DEAD_LETTER_TOPIC", f"{KAFKA_TOPIC}.dlq")
+
+# Bulk ingestion (/log_issues)
+INGEST_BATCH_MAX = int(os.getenv("INGEST_BATCH_MAX", "1000"))
+INGEST_SUMMARY_CONCURRENCY = int(os.getenv("INGEST_SUMMARY_CONCURRENCY", "8"))
+
+# Retention / cleanup
+RETENTION_DAYS_RESOLVED = int(os.getenv("RETENTION_DAYS_RESOLVED", "365"))
+RETENTION_DAYS_CLOSED = int(os.getenv("RETENTION_DAYS_CLOSED", "180"))
+# Opt-in: the cleanup job also drops whole index time partitions older than
+# RETENTION_DAYS_INDEX, whatever their incidents' status (OPEN ones included)
+RETENTION_DROP_PARTITIONS = os.getenv("RETENTION_DROP_PARTITIONS", "false").lower() in ("1", "true", "yes")
+RETENTION_DAYS_INDEX = int(
+    os.getenv("RETENTION_DAYS_INDEX", str(max(RETENTION_DAYS_RESOLVED, RETENTION_DAYS_CLOSED)))
+)
+CLEANUP_INTERVAL_HOURS = int(os.getenv("CLEANUP_INTERVAL_HOURS", "24"))
+
+# Notification channels
+SLACK_WEBHOOK_URL = os.getenv("SLACK_WEBHOOK_URL", "")
+TEAMS_WEBHOOK_URL = os.getenv("TEAMS_WEBHOOK_URL", "")
+SMTP_HOST = os.getenv("SMTP_HOST", "")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USER = os.getenv("SMTP_USER", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+NOTIFY_FROM_EMAIL = os.getenv("NOTIFY_FROM_EMAIL", "incidents@localhost")
+
+# RBAC roles (ordered by privilege)
+ROLES = ["analyst", "engineer", "sre", "team_lead", "admin"]
+ROLE_ALIASES = {"user": "engineer", "viewer": "analyst"}
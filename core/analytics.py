@@ -1,55 +1,136 @@
-"""
-Analytics & Insights Module
-
-Tracks:
-- Query analytics (questions, response times, accuracy)
-- Issue ingestion metrics (by team, type, over time)
-- Trending issues (frequency, patterns)
-"""
-
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
-from sqlalchemy import Column, String, Float, DateTime, Integer, create_engine, text
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-import json
-from collections import Counter, defaultdict
-
-# SQLite for analytics (lightweight, no external DB needed)
-engine = create_engine("sqlite:///rag_analytics.db")
-Base = declarative_base()
-Session = sessionmaker(bind=engine)
-
-
-class QueryAnalytic(Base):
-    """Track query metrics"""
-    __tablename__ = "query_analytics"
-    
-    query_id = Column(String(50), primary_key=True)
-    question = Column(String(500))
-    team = Column(String(50))
-    response_time = Column(Float)  # ms
-    accuracy = Column(Float)  # 0.0-1.0
-    timestamp = Column(DateTime, default=datetime.utcnow)
-
-
+"""
+Analytics & Insights Module
+
+Tracks:
+- Query analytics (questions, response times, accuracy)
+- Issue ingestion metrics (by team, type, over time)
+- Trending issues (frequency, patterns)
+"""
+
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import (
+    Column, String, Float, DateTime, Index, Integer, UniqueConstraint, and_, cast, create_engine, func, or_, text,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+import json
+
+# SQLite for analytics (lightweight, no external DB needed)
+engine = create_engine("sqlite:///rag_analytics.db")
+Base = declarative_base()
+Session = sessionmaker(bind=engine)
+
+
+class QueryAnalytic(Base):
+    """Track query metrics"""
+    __tablename__ = "query_analytics"
+    
+    query_id = Column(String(50), primary_key=True)
+    question = Column(String(500))
+    team = Column(String(50))
+    response_time = Column(Float)  # ms
+    accuracy = Column(Float)  # 0.0-1.0
+    timestamp = Column(DateTime, default=datetime.utcnow)
+
+    # Covering indexes: window aggregates by team, and top questions, read no table rows
+    __table_args__ = (
+        Index("ix_query_analytics_timestamp_team", "timestamp", "team", "response_time", "accuracy"),
+        Index("ix_query_analytics_question_timestamp", "question", "timestamp"),
+    )
+
+
 class IssueAnalytic(Base):
     """Track issue metrics"""
     __tablename__ = "issue_analytics"
-    
-    issue_id = Column(String(100), primary_key=True)
+    
+    issue_id = Column(String(100), primary_key=True)
     issue_type = Column(String(50))
     team = Column(String(50))
     text = Column(String(200))
     created_by_user_id = Column(String(100), nullable=True)
     created_by_email = Column(String(255), nullable=True)
     timestamp = Column(DateTime, default=datetime.utcnow)
-
-
+
+    __table_args__ = (
+        Index("ix_issue_analytics_timestamp_team", "timestamp", "team"),
+        Index("ix_issue_analytics_timestamp_type", "timestamp", "issue_type"),
+    )
+
+
+# Rollup resolutions; reads use whole hours plus the minutes before the first one
+ROLLUP_GRANULARITIES = ("minute", "hour")
+ROLLUP_DIMENSIONS = ("team", "issue_type", "severity", "service", "le")
+# Upper bounds (ms) of the response-time histogram; slower queries land in "+Inf"
+RESPONSE_TIME_BUCKETS_MS = (100, 250, 500, 1000, 2500, 5000, 10000)
+# Minute rows are kept for the longest dashboard window (720h) plus its partial first hour
+MINUTE_ROLLUP_HOURS = 721
+
+
+class AnalyticsRollup(Base):
+    """
+    Pre-aggregated dashboard counters per minute and per hour, incremented in
+    the same transaction as the event they count. Each metric sets at most
+    one dimension (the rest are ""), so an hour holds a handful of rows
+    instead of one per dimension combination:
+
+      query              team        count, value_sum = response ms, accuracy_sum
+      query_latency      le          count per response-time bucket
+      issue_team         team        count
+      issue_type         issue_type  count
+      incident_severity  severity    count, by created_at
+      incident_service   service     count, by created_at
+      resolution         -           count, value_sum = minutes to resolve, by created_at
+    """
+    __tablename__ = "analytics_rollups"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    metric = Column(String(20), nullable=False)
+    granularity = Column(String(6), nullable=False)
+    bucket = Column(DateTime, nullable=False)
+    team = Column(String(50), nullable=False, default="")
+    issue_type = Column(String(50), nullable=False, default="")
+    severity = Column(String(20), nullable=False, default="")
+    service = Column(String(100), nullable=False, default="")
+    le = Column(String(10), nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
+    value_sum = Column(Float, nullable=False, default=0.0)
+    accuracy_sum = Column(Float, nullable=False, default=0.0)
+
+    # Also serves window reads: metric = ? AND granularity = ? AND bucket >= ?
+    __table_args__ = (
+        UniqueConstraint("metric", "granularity", "bucket", *ROLLUP_DIMENSIONS, name="uq_analytics_rollups_key"),
+    )
+
+
+# Bump when rollup rows change meaning, so the startup backfill rebuilds them
+ROLLUP_VERSION = 1
+
+
+class AnalyticsRollupState(Base):
+    """Marker row written in the transaction that completes a rollup backfill."""
+    __tablename__ = "analytics_rollup_state"
+
+    name = Column(String(20), primary_key=True)
+    version = Column(Integer, nullable=False)
+    completed_at = Column(DateTime, nullable=False)
+
+
 # Create tables
 Base.metadata.create_all(engine)
 
 
+def ensure_indexes(base, bind):
+    """create_all() skips indexes of tables that already exist; add any missing ones."""
+    for table in base.metadata.tables.values():
+        for index in table.indexes:
+            index.create(bind, checkfirst=True)
+
+
+ensure_indexes(Base, engine)
+
+
 def _ensure_issue_analytics_columns():
     """Lightweight SQLite migration for issue ownership fields."""
     with engine.begin() as conn:
@@ -62,29 +143,133 @@ def _ensure_issue_analytics_columns():
 
 
 _ensure_issue_analytics_columns()
-
-
+
+
+# ── Rollups ──────────────────────────────────────────────────────
+
+_ROLLUP_KEY = ("metric", "granularity", "bucket", *ROLLUP_DIMENSIONS)
+
+
+def _floor(ts: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return ts.replace(minute=0, second=0, microsecond=0)
+    return ts.replace(second=0, microsecond=0)
+
+
+def latency_bucket(response_time: float) -> str:
+    for bound in RESPONSE_TIME_BUCKETS_MS:
+        if response_time <= bound:
+            return str(bound)
+    return "+Inf"
+
+
+def query_events(team: str, response_time: float, accuracy: float, ts: datetime) -> list[dict]:
+    return [
+        {"metric": "query", "ts": ts, "team": team, "value": response_time or 0.0, "accuracy": accuracy or 0.0},
+        {"metric": "query_latency", "ts": ts, "le": latency_bucket(response_time or 0.0)},
+    ]
+
+
+def issue_events(team: str, issue_type: str, ts: datetime, sign: int = 1) -> list[dict]:
+    return [
+        {"metric": "issue_team", "ts": ts, "team": team, "count": sign},
+        {"metric": "issue_type", "ts": ts, "issue_type": issue_type or "", "count": sign},
+    ]
+
+
+def record_rollups(session, events: list[dict]):
+    """
+    Add event deltas ({metric, ts, dimensions, count=1, value, accuracy}) to
+    the minute and hour rollups, as upsert increments inside `session`'s
+    transaction. Negative counts retract events that are deleted.
+    """
+    totals: dict[tuple, list] = {}
+    for event in events:
+        if event["ts"] is None:
+            continue
+        dims = tuple(event.get(d) or "" for d in ROLLUP_DIMENSIONS)
+        for granularity in ROLLUP_GRANULARITIES:
+            acc = totals.setdefault((event["metric"], granularity, _floor(event["ts"], granularity), *dims), [0, 0.0, 0.0])
+            acc[0] += event.get("count", 1)
+            acc[1] += event.get("value", 0.0)
+            acc[2] += event.get("accuracy", 0.0)
+    if not totals:
+        return
+    stmt = sqlite_insert(AnalyticsRollup)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(_ROLLUP_KEY),
+        set_={
+            "count": AnalyticsRollup.count + stmt.excluded.count,
+            "value_sum": AnalyticsRollup.value_sum + stmt.excluded.value_sum,
+            "accuracy_sum": AnalyticsRollup.accuracy_sum + stmt.excluded.accuracy_sum,
+        },
+    )
+    session.execute(stmt, [
+        {**dict(zip(_ROLLUP_KEY, key)), "count": c, "value_sum": v, "accuracy_sum": a}
+        for key, (c, v, a) in totals.items()
+    ])
+
+
+def prune_minute_rollups(session) -> int:
+    """Delete minute rollups past MINUTE_ROLLUP_HOURS; hour rollups are kept."""
+    cutoff = datetime.utcnow() - timedelta(hours=MINUTE_ROLLUP_HOURS)
+    return (
+        session.query(AnalyticsRollup)
+        .filter(AnalyticsRollup.granularity == "minute", AnalyticsRollup.bucket < cutoff)
+        .delete(synchronize_session=False)
+    )
+
+
+def _rollup_window(cutoff: datetime):
+    """Rows covering [cutoff, now] to the minute: whole hours from the first full one, minutes before it."""
+    edge = _floor(cutoff, "hour")
+    if edge < cutoff:
+        edge += timedelta(hours=1)
+    return or_(
+        and_(AnalyticsRollup.granularity == "hour", AnalyticsRollup.bucket >= edge),
+        and_(
+            AnalyticsRollup.granularity == "minute",
+            AnalyticsRollup.bucket >= _floor(cutoff, "minute"),
+            AnalyticsRollup.bucket < edge,
+        ),
+    )
+
+
+def rollup_totals(session, metric: str, cutoff: datetime, *dimensions: str) -> list[tuple]:
+    """(dimension values..., count, value_sum, accuracy_sum) over the window, grouped by `dimensions`."""
+    columns = [getattr(AnalyticsRollup, d) for d in dimensions]
+    count = func.sum(AnalyticsRollup.count)
+    return (
+        session.query(*columns, count, func.sum(AnalyticsRollup.value_sum), func.sum(AnalyticsRollup.accuracy_sum))
+        .filter(AnalyticsRollup.metric == metric, _rollup_window(cutoff))
+        .group_by(*columns)
+        .having(count != 0)
+        .all()
+    )
+
+
 class AnalyticsManager:
     """Lightweight analytics tracking and querying"""
-    
-    @staticmethod
-    def track_query(query_id: str, question: str, team: Optional[str], response_time: float, accuracy: float = 0.85):
-        """Log a query"""
-        session = Session()
-        try:
-            q = QueryAnalytic()
-            q.query_id = query_id
-            q.question = question[:500]
-            q.team = team or "unknown"
-            q.response_time = response_time
-            q.accuracy = accuracy
-            q.timestamp = datetime.utcnow()
-            session.add(q)
-            session.commit()
-        finally:
-            session.close()
-    
-    @staticmethod
+    
+    @staticmethod
+    def track_query(query_id: str, question: str, team: Optional[str], response_time: float, accuracy: float = 0.85):
+        """Log a query"""
+        session = Session()
+        try:
+            q = QueryAnalytic()
+            q.query_id = query_id
+            q.question = question[:500]
+            q.team = team or "unknown"
+            q.response_time = response_time
+            q.accuracy = accuracy
+            q.timestamp = datetime.utcnow()
+            session.add(q)
+            record_rollups(session, query_events(q.team, response_time, accuracy, q.timestamp))
+            session.commit()
+        finally:
+            session.close()
+    
+    @staticmethod
     def track_issue(
         issue_id: str,
         issue_type: str,
@@ -96,7 +281,7 @@ class AnalyticsManager:
         """Log an issue"""
         session = Session()
         try:
-            i = IssueAnalytic()
+            i = IssueAnalytic()
             i.issue_id = issue_id
             i.issue_type = issue_type
             i.team = team or "unknown"
@@ -105,6 +290,32 @@ class AnalyticsManager:
             i.created_by_email = created_by_email
             i.timestamp = datetime.utcnow()
             session.add(i)
+            record_rollups(session, issue_events(i.team, issue_type, i.timestamp))
+            session.commit()
+        finally:
+            session.close()
+
+    @staticmethod
+    def track_issues(issues: List[dict]):
+        """Log many issues in one transaction (same fields as track_issue)."""
+        session = Session()
+        try:
+            now = datetime.utcnow()
+            session.add_all(
+                IssueAnalytic(
+                    issue_id=i["issue_id"],
+                    issue_type=i["issue_type"],
+                    team=i.get("team") or "unknown",
+                    text=i["text"][:200],
+                    created_by_user_id=i.get("created_by_user_id"),
+                    created_by_email=i.get("created_by_email"),
+                    timestamp=now,
+                )
+                for i in issues
+            )
+            record_rollups(session, [
+                e for i in issues for e in issue_events(i.get("team") or "unknown", i["issue_type"], now)
+            ])
             session.commit()
         finally:
             session.close()
@@ -163,90 +374,151 @@ class AnalyticsManager:
             issue = session.query(IssueAnalytic).filter(IssueAnalytic.issue_id == issue_id).first()
             if issue is None:
                 return False
+            record_rollups(session, issue_events(issue.team, issue.issue_type, issue.timestamp, sign=-1))
             session.delete(issue)
             session.commit()
             return True
         finally:
             session.close()
-    
-    @staticmethod
-    def get_query_stats(hours: int = 24) -> dict:
-        """Get query analytics for last N hours"""
-        session = Session()
-        try:
-            cutoff = datetime.utcnow() - timedelta(hours=hours)
-            queries = session.query(QueryAnalytic).filter(QueryAnalytic.timestamp >= cutoff).all()
-            
-            if not queries:
-                return {"total_queries": 0, "by_team": {}, "avg_response_time": 0, "avg_accuracy": 0, "top_questions": []}
-            
-            teams_data = defaultdict(lambda: {"count": 0, "avg_response_time": 0, "avg_accuracy": 0, "times": [], "accuracies": []})
-            top_questions = Counter([q.question for q in queries])
-            
-            for q in queries:
-                teams_data[q.team]["count"] += 1
-                teams_data[q.team]["times"].append(q.response_time)
-                teams_data[q.team]["accuracies"].append(q.accuracy)
-            
-            # Calculate averages
-            for team, data in teams_data.items():
-                data["avg_response_time"] = round(sum(data["times"]) / len(data["times"]), 2)
-                data["avg_accuracy"] = round(sum(data["accuracies"]) / len(data["accuracies"]), 2)
-                del data["times"]
-                del data["accuracies"]
-            
-            return {
-                "total_queries": len(queries),
-                "by_team": dict(teams_data),
-                "avg_response_time": round(sum(q.response_time for q in queries) / len(queries), 2),
-                "avg_accuracy": round(sum(q.accuracy for q in queries) / len(queries), 2),
-                "top_questions": [{"question": q, "count": c} for q, c in top_questions.most_common(5)]
-            }
-        finally:
-            session.close()
-    
-    @staticmethod
-    def get_issue_stats(hours: int = 24) -> dict:
-        """Get issue analytics for last N hours"""
-        session = Session()
-        try:
-            cutoff = datetime.utcnow() - timedelta(hours=hours)
-            issues = session.query(IssueAnalytic).filter(IssueAnalytic.timestamp >= cutoff).all()
-            
-            if not issues:
-                return {"total_issues": 0, "by_team": {}, "by_type": {}, "trending": []}
-            
-            by_team = defaultdict(int)
-            by_type = defaultdict(int)
-            trending = Counter([i.issue_type for i in issues])
-            
-            for issue in issues:
-                by_team[issue.team] += 1
-                by_type[issue.issue_type] += 1
-            
-            return {
-                "total_issues": len(issues),
-                "by_team": dict(by_team),
-                "by_type": dict(by_type),
-                "trending": [{"type": t, "count": c, "percentage": round(c/len(issues)*100, 1)} for t, c in trending.most_common(5)]
-            }
-        finally:
-            session.close()
-    
-    @staticmethod
-    def get_time_series(hours: int = 24, interval_minutes: int = 60) -> dict:
-        """Get issue count over time"""
-        session = Session()
-        try:
-            cutoff = datetime.utcnow() - timedelta(hours=hours)
-            issues = session.query(IssueAnalytic).filter(IssueAnalytic.timestamp >= cutoff).all()
-            
-            timeline = defaultdict(int)
-            for issue in issues:
-                bucket = issue.timestamp.replace(minute=0, second=0, microsecond=0)
-                timeline[bucket.isoformat()] += 1
-            
-            sorted_timeline = sorted(timeline.items())
-            return {"timeline": [{"timestamp": ts, "count": count} for ts, count in sorted_timeline]}
-        finally:
-            session.close()
+
+    @staticmethod
+    def delete_issues(issue_ids: List[str], batch: int = 500) -> int:
+        """Bulk delete issue analytics records; returns how many existed."""
+        session = Session()
+        try:
+            deleted = 0
+            for i in range(0, len(issue_ids), batch):
+                chunk = IssueAnalytic.issue_id.in_(issue_ids[i:i + batch])
+                record_rollups(session, [
+                    e
+                    for team, issue_type, ts in session.query(
+                        IssueAnalytic.team, IssueAnalytic.issue_type, IssueAnalytic.timestamp
+                    ).filter(chunk)
+                    for e in issue_events(team, issue_type, ts, sign=-1)
+                ])
+                deleted += session.query(IssueAnalytic).filter(chunk).delete(synchronize_session=False)
+            session.commit()
+            return deleted
+        finally:
+            session.close()
+    
+    @staticmethod
+    def prune_rollups() -> int:
+        """Drop minute rollups no dashboard window reaches any more."""
+        session = Session()
+        try:
+            pruned = prune_minute_rollups(session)
+            session.commit()
+            return pruned
+        finally:
+            session.close()
+
+    @staticmethod
+    def get_query_stats(hours: int = 24) -> dict:
+        """Get query analytics for last N hours (from the minute/hour rollups)"""
+        session = Session()
+        try:
+            cutoff = datetime.utcnow() - timedelta(hours=hours)
+            teams = rollup_totals(session, "query", cutoff, "team")
+            total = sum(count for _, count, _, _ in teams)
+
+            if not total:
+                return {
+                    "total_queries": 0, "by_team": {}, "avg_response_time": 0, "avg_accuracy": 0,
+                    "response_time_histogram": {}, "top_questions": [],
+                }
+
+            by_team = {
+                team: {
+                    "count": count,
+                    "avg_response_time": round(time_sum / count, 2),
+                    "avg_accuracy": round(accuracy_sum / count, 2),
+                }
+                for team, count, time_sum, accuracy_sum in teams
+            }
+            latency = {le: count for le, count, _, _ in rollup_totals(session, "query_latency", cutoff, "le")}
+            histogram = {str(b): latency.get(str(b), 0) for b in RESPONSE_TIME_BUCKETS_MS}
+            histogram["+Inf"] = latency.get("+Inf", 0)
+
+            # Free-text questions have no bounded dimension to roll up; the
+            # (question, timestamp) index keeps this a covering scan
+            count = func.count().label("count")
+            top_questions = (
+                session.query(QueryAnalytic.question, count)
+                .filter(QueryAnalytic.timestamp >= cutoff)
+                .group_by(QueryAnalytic.question)
+                .order_by(count.desc(), QueryAnalytic.question)
+                .limit(5)
+            )
+
+            return {
+                "total_queries": total,
+                "by_team": by_team,
+                "avg_response_time": round(sum(t for _, _, t, _ in teams) / total, 2),
+                "avg_accuracy": round(sum(a for _, _, _, a in teams) / total, 2),
+                "response_time_histogram": histogram,
+                "top_questions": [{"question": q, "count": c} for q, c in top_questions]
+            }
+        finally:
+            session.close()
+    
+    @staticmethod
+    def get_issue_stats(hours: int = 24) -> dict:
+        """Get issue analytics for last N hours (from the minute/hour rollups)"""
+        session = Session()
+        try:
+            cutoff = datetime.utcnow() - timedelta(hours=hours)
+            by_type = {t: count for t, count, _, _ in rollup_totals(session, "issue_type", cutoff, "issue_type")}
+            total = sum(by_type.values())
+
+            if not total:
+                return {"total_issues": 0, "by_team": {}, "by_type": {}, "trending": []}
+
+            by_team = {team: count for team, count, _, _ in rollup_totals(session, "issue_team", cutoff, "team")}
+
+            trending = sorted(by_type.items(), key=lambda x: x[1], reverse=True)[:5]
+
+            return {
+                "total_issues": total,
+                "by_team": by_team,
+                "by_type": by_type,
+                "trending": [{"type": t, "count": c, "percentage": round(c/total*100, 1)} for t, c in trending]
+            }
+        finally:
+            session.close()
+    
+    @staticmethod
+    def get_time_series(hours: int = 24, interval_minutes: int = 60) -> dict:
+        """Get issue count over time, one row per interval summed from the rollups"""
+        session = Session()
+        try:
+            cutoff = datetime.utcnow() - timedelta(hours=hours)
+            step = interval_minutes * 60
+            if step % 3600 == 0:
+                window = _rollup_window(cutoff)
+            else:
+                # Sub-hour intervals need minute resolution throughout
+                window = and_(
+                    AnalyticsRollup.granularity == "minute", AnalyticsRollup.bucket >= _floor(cutoff, "minute")
+                )
+            # Buckets are naive UTC; strftime('%s') reads them as such
+            bucket = (cast(func.strftime("%s", AnalyticsRollup.bucket), Integer) // step).label("bucket")
+            count = func.sum(AnalyticsRollup.count)
+            rows = (
+                session.query(bucket, count)
+                .filter(AnalyticsRollup.metric == "issue_type", window)
+                .group_by(bucket)
+                .having(count != 0)
+                .order_by(bucket)
+            )
+            return {
+                "timeline": [
+                    {
+                        "timestamp": datetime.fromtimestamp(b * step, timezone.utc).replace(tzinfo=None).isoformat(),
+                        "count": count,
+                    }
+                    for b, count in rows
+                ]
+            }
+        finally:
+            session.close()
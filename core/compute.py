@@ -0,0 +1,89 @@
+"""
+Where CPU-heavy stages run: BM25 scoring, rerank tokenization, PII/secret
+redaction over LLM contexts, and embedding.
+
+CPU_EXECUTOR_MODE:
+  thread  — (default) a shared thread pool; keeps the event loop free, and
+            runs in parallel on a free-threaded interpreter or where the work
+            releases the GIL (numpy, FAISS, torch).
+  process — a pool of CPU_WORKERS processes, so pure-Python work uses every
+            core; only queries and results are pickled. Workers share the
+            BM25 postings (bm25.bin), the FAISS snapshot and docs.bin through
+            memory maps and hold only the postings log since the last
+            compaction; embedding models stay in the parent process (torch
+            releases the GIL), so memory grows by little more than one
+            interpreter per worker.
+  auto    — thread on a free-threaded (no-GIL) build, process otherwise.
+"""
+
+import asyncio
+import atexit
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from config import CPU_EXECUTOR_MODE, CPU_WORKERS
+
+_executor: Executor | None = None
+_executor_lock = threading.Lock()
+_in_worker = False
+
+
+def gil_enabled() -> bool:
+    check = getattr(sys, "_is_gil_enabled", None)  # Python 3.13+
+    return True if check is None else check()
+
+
+def mode() -> str:
+    if CPU_EXECUTOR_MODE == "auto":
+        return "process" if gil_enabled() else "thread"
+    return CPU_EXECUTOR_MODE
+
+
+def in_worker() -> bool:
+    """True inside a pool process (tasks must not dispatch to the pool again)."""
+    return _in_worker
+
+
+def _init_worker():
+    global _in_worker
+    _in_worker = True
+
+
+def get_executor() -> Executor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                if mode() == "process":
+                    # forkserver: never fork a parent that is already running threads
+                    methods = multiprocessing.get_all_start_methods()
+                    context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                    _executor = ProcessPoolExecutor(
+                        max_workers=CPU_WORKERS, mp_context=context, initializer=_init_worker
+                    )
+                else:
+                    _executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+                atexit.register(_executor.shutdown, wait=False)
+    return _executor
+
+
+async def run_cpu(fn, *args):
+    """Await fn(*args) in the CPU pool. In process mode fn must be a module-level function."""
+    return await asyncio.get_running_loop().run_in_executor(get_executor(), fn, *args)
+
+
+def map_chunks(fn, items: list, min_chunk: int = 16) -> list:
+    """
+    fn over contiguous chunks of `items` across the pool (blocking), results
+    concatenated in order. Small inputs run inline.
+    """
+    if len(items) < 2 * min_chunk or in_worker():
+        return list(fn(items))
+    size = max(min_chunk, -(-len(items) // CPU_WORKERS))
+    chunks = [items[i:i + size] for i in range(0, len(items), size)]
+    out = []
+    for part in get_executor().map(fn, chunks):
+        out.extend(part)
+    return out
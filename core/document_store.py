@@ -1,23 +1,405 @@
-class DocumentStore:
-    def __init__(self):
-        self.docs = {}
-        self.counter = 0
-
-    def add(self, text, metadata=None):
-        doc_id = self.counter
-        self.docs[doc_id] = {
-            "text": text,
-            "metadata": metadata or {}
-        }
-        self.counter += 1
-        return doc_id
-
-    def get(self, doc_id):
-        return self.docs[doc_id]
-
-    def all_texts(self):
-        return [v["text"] for v in self.docs.values()]
-    
-    def all(self):
-        return self.docs
-
+import json
+import math
+import os
+import sys
+import threading
+from array import array
+from collections.abc import Mapping, MutableMapping
+
+import numpy as np
+
+# Low-cardinality metadata stored as small integer codes instead of per-document strings
+CATEGORICAL_FIELDS = ("team_tag", "severity", "status", "service", "issue_type")
+# Numeric metadata stored as float64 columns (NaN = absent)
+NUMERIC_FIELDS = ("ts",)
+
+_MAGIC = b"RDOCS002"
+
+
+def _split(metadata: dict | None) -> tuple[dict, bytes]:
+    """Column values (categorical strings, numbers), plus every other field as compact JSON."""
+    metadata = metadata or {}
+    cats, extra = {}, {}
+    for key, value in metadata.items():
+        if key in CATEGORICAL_FIELDS and isinstance(value, str):
+            cats[key] = value
+        elif key in NUMERIC_FIELDS and isinstance(value, (int, float)) and not isinstance(value, bool):
+            cats[key] = float(value)
+        else:
+            extra[key] = value
+    return cats, json.dumps(extra, separators=(",", ":")).encode("utf-8") if extra else b""
+
+
+def _join(text: str, cats: dict, extra: bytes) -> dict:
+    metadata = dict(cats)
+    if extra:
+        metadata.update(json.loads(extra))
+    return {"text": text, "metadata": metadata}
+
+
+class Vocab:
+    """Append-only value <-> code dictionary; code 0 means "absent"."""
+
+    __slots__ = ("values", "codes", "_lock")
+
+    def __init__(self, values=None):
+        self.values = [None] + list(values or [])
+        self.codes = {v: i for i, v in enumerate(self.values) if i}
+        self._lock = threading.Lock()
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self.codes.get(value)
+                if code is None:
+                    code = len(self.values)
+                    self.values.append(value)
+                    self.codes[value] = code
+        return code
+
+
+class ColumnarDocs(Mapping):
+    """
+    Read-only documents in one memory-mapped file:
+
+        magic | header length | JSON header (vocabularies, section offsets) | sections
+
+    Sections are sorted ids, text offsets + UTF-8 text, extra-metadata offsets
+    + JSON, one uint32 code column per categorical field and one float64 column
+    per numeric field. Opening the file
+    is O(1), workers share its pages via the page cache, and a document is
+    decoded only when it is accessed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self._mm[:8]) != _MAGIC:
+            raise ValueError(f"{path} is not a document file")
+        header_len = int(np.frombuffer(self._mm, dtype="<i8", count=1, offset=8)[0])
+        header = json.loads(bytes(self._mm[16:16 + header_len]))
+        self.vocab = {field: Vocab(values) for field, values in header["vocab"].items()}
+        sections = {}
+        for name, (offset, dtype, count) in header["sections"].items():
+            sections[name] = np.frombuffer(self._mm, dtype=dtype, count=count, offset=offset)
+        self.ids = sections.pop("ids")
+        self._text_off = sections.pop("text_off")
+        self._text = sections.pop("text")
+        self._extra_off = sections.pop("extra_off")
+        self._extra = sections.pop("extra")
+        self.numbers = {field: sections.pop(field) for field in NUMERIC_FIELDS if field in sections}
+        self.codes = sections
+
+    @staticmethod
+    def write(path: str, docs: Mapping) -> None:
+        ids = np.fromiter(docs.keys(), dtype="<i8", count=len(docs))
+        ids.sort()
+        columns_of = getattr(docs, "columns", None)
+        vocab = {field: Vocab() for field in CATEGORICAL_FIELDS}
+        codes = {field: np.zeros(len(ids), dtype="<u4") for field in CATEGORICAL_FIELDS}
+        numbers = {field: np.full(len(ids), np.nan, dtype="<f8") for field in NUMERIC_FIELDS}
+        texts, extras = [], []
+        for row, doc_id in enumerate(ids.tolist()):
+            if columns_of:
+                text, cats, extra = columns_of(doc_id)
+            else:
+                doc = docs[doc_id]
+                text = doc["text"].encode("utf-8")
+                cats, extra = _split(doc.get("metadata"))
+            texts.append(text)
+            extras.append(extra)
+            for field, value in cats.items():
+                if field in numbers:
+                    numbers[field][row] = value
+                else:
+                    codes[field][row] = vocab[field].code(value)
+
+        def offsets(blobs):
+            out = np.zeros(len(blobs) + 1, dtype="<i8")
+            np.cumsum([len(b) for b in blobs], out=out[1:])
+            return out
+
+        payload = [
+            ("ids", ids),
+            ("text_off", offsets(texts)),
+            ("extra_off", offsets(extras)),
+            *((field, codes[field]) for field in CATEGORICAL_FIELDS),
+            *((field, numbers[field]) for field in NUMERIC_FIELDS),
+            ("text", np.frombuffer(b"".join(texts), dtype=np.uint8)),
+            ("extra", np.frombuffer(b"".join(extras), dtype=np.uint8)),
+        ]
+        header = {"vocab": {f: v.values[1:] for f, v in vocab.items()}, "sections": {}}
+        # Section offsets depend on the header length; reserve room, then pad
+        header_len = len(json.dumps(header).encode()) + 64 * len(payload) + 64
+        header_len += -header_len % 8
+        offset = 16 + header_len
+        for name, arr in payload:
+            header["sections"][name] = [offset, arr.dtype.str, len(arr)]
+            offset += arr.nbytes + (-arr.nbytes % 8)
+        header_bytes = json.dumps(header).encode()
+        assert len(header_bytes) <= header_len
+        with open(path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(np.array([header_len], dtype="<i8").tobytes())
+            f.write(header_bytes.ljust(header_len, b" "))
+            for _, arr in payload:
+                f.write(arr.tobytes())
+                f.write(b"\0" * (-arr.nbytes % 8))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _position(self, doc_id) -> int:
+        pos = int(np.searchsorted(self.ids, doc_id))
+        if pos < len(self.ids) and self.ids[pos] == doc_id:
+            return pos
+        return -1
+
+    def columns(self, doc_id) -> tuple[bytes, dict, bytes]:
+        """(UTF-8 text, categorical values, extra JSON) without decoding the JSON."""
+        pos = self._position(doc_id)
+        if pos < 0:
+            raise KeyError(doc_id)
+        text = bytes(self._text[self._text_off[pos]:self._text_off[pos + 1]])
+        extra = bytes(self._extra[self._extra_off[pos]:self._extra_off[pos + 1]])
+        cats = {}
+        for field, column in self.codes.items():
+            code = int(column[pos])
+            if code:
+                cats[field] = self.vocab[field].values[code]
+        for field, column in self.numbers.items():
+            value = float(column[pos])
+            if value == value:
+                cats[field] = value
+        return text, cats, extra
+
+    def __getitem__(self, doc_id):
+        text, cats, extra = self.columns(doc_id)
+        return _join(text.decode("utf-8"), cats, extra)
+
+    def __contains__(self, doc_id):
+        return self._position(doc_id) >= 0
+
+    def __iter__(self):
+        for doc_id in self.ids:
+            yield int(doc_id)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def max_id(self) -> int:
+        return int(self.ids[-1]) if len(self.ids) else -1
+
+    def nbytes(self) -> int:
+        return len(self._mm)
+
+
+class CompactDocs(MutableMapping):
+    """
+    Growable in-memory counterpart of `ColumnarDocs`: texts in one buffer with
+    offsets, categorical metadata as codes into shared vocabularies, and the
+    remaining metadata as JSON bytes. Overwritten/deleted rows are dead space
+    until the next snapshot.
+    """
+
+    __slots__ = ("vocab", "_rows", "_text", "_text_off", "_extra", "_extra_off", "_codes", "_numbers")
+
+    def __init__(self, vocab: dict[str, Vocab] | None = None):
+        self.vocab = vocab or {field: Vocab() for field in CATEGORICAL_FIELDS}
+        self._rows: dict[int, int] = {}
+        self._text = bytearray()
+        self._text_off = array("Q", [0])
+        self._extra = bytearray()
+        self._extra_off = array("Q", [0])
+        self._codes = {field: array("I") for field in CATEGORICAL_FIELDS}
+        self._numbers = {field: array("d") for field in NUMERIC_FIELDS}
+
+    @classmethod
+    def from_mapping(cls, docs: Mapping) -> "CompactDocs":
+        compact = cls()
+        for doc_id, doc in docs.items():
+            compact[int(doc_id)] = doc
+        return compact
+
+    def copy(self) -> "CompactDocs":
+        """Independent copy sharing the (append-only) vocabularies."""
+        other = CompactDocs(self.vocab)
+        other._rows = dict(self._rows)
+        other._text = bytearray(self._text)
+        other._text_off = array("Q", self._text_off)
+        other._extra = bytearray(self._extra)
+        other._extra_off = array("Q", self._extra_off)
+        other._codes = {field: array("I", column) for field, column in self._codes.items()}
+        other._numbers = {field: array("d", column) for field, column in self._numbers.items()}
+        return other
+
+    def columns(self, doc_id) -> tuple[bytes, dict, bytes]:
+        row = self._rows[doc_id]
+        text = bytes(self._text[self._text_off[row]:self._text_off[row + 1]])
+        extra = bytes(self._extra[self._extra_off[row]:self._extra_off[row + 1]])
+        cats = {}
+        for field, column in self._codes.items():
+            code = column[row]
+            if code:
+                cats[field] = self.vocab[field].values[code]
+        for field, column in self._numbers.items():
+            value = column[row]
+            if value == value:
+                cats[field] = value
+        return text, cats, extra
+
+    def __getitem__(self, doc_id):
+        text, cats, extra = self.columns(doc_id)
+        return _join(text.decode("utf-8"), cats, extra)
+
+    def __setitem__(self, doc_id, doc):
+        cats, extra = _split(doc.get("metadata"))
+        self._text += doc["text"].encode("utf-8")
+        self._text_off.append(len(self._text))
+        self._extra += extra
+        self._extra_off.append(len(self._extra))
+        for field, column in self._codes.items():
+            value = cats.get(field)
+            column.append(self.vocab[field].code(value) if value is not None else 0)
+        for field, column in self._numbers.items():
+            column.append(cats.get(field, math.nan))
+        self._rows[doc_id] = len(self._text_off) - 2
+
+    def __delitem__(self, doc_id):
+        del self._rows[doc_id]
+
+    def __contains__(self, doc_id):
+        return doc_id in self._rows
+
+    def __iter__(self):
+        return iter(self._rows)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def nbytes(self) -> int:
+        """Approximate heap footprint, including the id -> row index."""
+        columns = sum(c.itemsize * len(c) for c in (*self._codes.values(), *self._numbers.values()))
+        offsets = 8 * (len(self._text_off) + len(self._extra_off))
+        rows = sys.getsizeof(self._rows) + 32 * len(self._rows)  # int key + row objects
+        return len(self._text) + len(self._extra) + offsets + columns + rows
+
+
+class LayeredDocs(MutableMapping):
+    """
+    A read-only base (the snapshot) plus in-memory changes made since:
+    `overlay` holds added documents and `removed` hides deleted base ids.
+    """
+
+    __slots__ = ("base", "overlay", "removed")
+
+    def __init__(self, base: Mapping | None = None):
+        self.base = base if base is not None else {}
+        self.overlay = CompactDocs()
+        self.removed = set()
+
+    def copy(self) -> "LayeredDocs":
+        """Point-in-time view; the base is immutable and shared."""
+        view = LayeredDocs(self.base)
+        view.overlay = self.overlay.copy()
+        view.removed = set(self.removed)
+        return view
+
+    def columns(self, doc_id) -> tuple[bytes, dict, bytes]:
+        if doc_id in self.overlay:
+            return self.overlay.columns(doc_id)
+        if hasattr(self.base, "columns"):
+            return self.base.columns(doc_id)
+        doc = self.base[doc_id]
+        return (doc["text"].encode("utf-8"), *_split(doc.get("metadata")))
+
+    def __getitem__(self, doc_id):
+        if doc_id in self.overlay:
+            return self.overlay[doc_id]
+        if doc_id in self.removed:
+            raise KeyError(doc_id)
+        return self.base[doc_id]
+
+    def __setitem__(self, doc_id, doc):
+        if doc_id not in self.overlay and doc_id in self.base:
+            self.removed.add(doc_id)  # the overlay copy shadows the base record
+        self.overlay[doc_id] = doc
+
+    def __delitem__(self, doc_id):
+        if doc_id in self.overlay:
+            del self.overlay[doc_id]
+        elif doc_id not in self.removed and doc_id in self.base:
+            self.removed.add(doc_id)
+        else:
+            raise KeyError(doc_id)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.overlay or (doc_id not in self.removed and doc_id in self.base)
+
+    def __iter__(self):
+        for doc_id in self.base:
+            if doc_id not in self.removed:
+                yield doc_id
+        yield from self.overlay
+
+    def __len__(self):
+        return len(self.base) - len(self.removed) + len(self.overlay)
+
+
+class DocumentStore:
+    __slots__ = ("docs", "counter")
+
+    def __init__(self, base: Mapping | None = None):
+        if base is not None and not isinstance(base, (ColumnarDocs, CompactDocs)):
+            base = CompactDocs.from_mapping(base)  # legacy docs.json
+        self.docs = LayeredDocs(base)
+        if isinstance(base, ColumnarDocs):
+            self.counter = base.max_id() + 1
+        else:
+            self.counter = max(base or (), default=-1) + 1
+
+    def add(self, text, metadata=None):
+        doc_id = self.counter
+        self.docs[doc_id] = {
+            "text": text,
+            "metadata": metadata or {}
+        }
+        self.counter += 1
+        return doc_id
+
+    def put(self, doc_id, text, metadata=None):
+        """Insert under a known id (WAL replay); keeps the counter ahead of it."""
+        self.docs[doc_id] = {
+            "text": text,
+            "metadata": metadata or {}
+        }
+        self.counter = max(self.counter, doc_id + 1)
+
+    def remove(self, doc_id):
+        if doc_id in self.docs:
+            del self.docs[doc_id]
+
+    def get(self, doc_id):
+        return self.docs[doc_id]
+
+    def all_texts(self):
+        return [v["text"] for v in self.docs.values()]
+
+    def all(self):
+        return self.docs
+
+    def memory_stats(self) -> dict:
+        """Bytes held for documents: heap, plus the mapped snapshot (page cache, shared)."""
+        base = self.docs.base
+        heap = self.docs.overlay.nbytes() + (base.nbytes() if isinstance(base, CompactDocs) else 0)
+        mapped = base.nbytes() if isinstance(base, ColumnarDocs) else 0
+        n = len(self.docs)
+        return {
+            "documents": n,
+            "heap_bytes": heap,
+            "mapped_bytes": mapped,
+            "bytes_per_doc": round((heap + mapped) / n, 1) if n else 0.0,
+        }
+
+    def bytes_per_doc(self) -> float:
+        return self.memory_stats()["bytes_per_doc"]
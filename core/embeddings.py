@@ -1,67 +1,412 @@
-from config import EMBEDDING_MODEL
-import threading
-import logging
-import hashlib
-import numpy as np
-
-logging.basicConfig(level=logging.INFO)
-from langsmith import traceable
-
-
-# Try to import SentenceTransformer; if unavailable (or torch missing),
-# fall back to a lightweight deterministic pseudo-embedding for dev.
-_HAS_ST = False
-try:
-    from sentence_transformers import SentenceTransformer
-    _HAS_ST = True
-except Exception:
-    SentenceTransformer = None
-
-
-def _pseudo_embedding(text: str, dim: int = 512) -> np.ndarray:
-    # Deterministic RNG seeded from text hash -> reproducible embeddings
-    h = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], 16)
-    rng = np.random.RandomState(h % (2 ** 32))
-    v = rng.rand(dim).astype("float32")
-    norm = np.linalg.norm(v)
-    if norm > 0:
-        v = v / norm
-    return v
-
-
-class EmbeddingModel:
-    _model = None
-    _lock = threading.Lock()
-
-    @classmethod
-    @traceable(name="embeddingsload")
-    def load(cls):
-        if cls._model is None:
-            with cls._lock:
-                if cls._model is None:
-                    if _HAS_ST and EMBEDDING_MODEL:
-                        logging.info("🔥 Loading SentenceTransformer model (ONCE)...")
-                        cls._model = SentenceTransformer(EMBEDDING_MODEL)
-                        logging.info("✅ SentenceTransformer model loaded")
-                    else:
-                        logging.info(
-                            "⚠️ sentence_transformers not available — using pseudo-embeddings"
-                        )
-                        cls._model = None
-        return cls._model
-
-    @classmethod
-    @traceable(name="embeddingsencode")
-    def encode(cls, texts):
-        model = cls.load()
-        if model is not None:
-            return model.encode(
-                texts,
-                convert_to_numpy=True,
-                normalize_embeddings=True,
-            )
-        # Fallback: deterministic pseudo-embeddings using numpy
-        if isinstance(texts, str):
-            texts = [texts]
-        vecs = [_pseudo_embedding(t) for t in texts]
-        return np.stack(vecs, axis=0)
+from config import (
+    EMBEDDING_BATCH_MAX_SIZE,
+    EMBEDDING_BATCH_MAX_WAIT_MS,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_DISK_SLOTS,
+    EMBEDDING_CACHE_SIZE,
+    EMBEDDING_CACHE_TTL_SECONDS,
+    EMBEDDING_MODEL,
+)
+from collections import OrderedDict
+from concurrent.futures import Future
+import asyncio
+import queue
+import threading
+import logging
+import hashlib
+import os
+import time
+import numpy as np
+
+logging.basicConfig(level=logging.INFO)
+from langsmith import traceable
+
+from core import compute
+from core.metrics import EMBEDDING_ENCODE_SECONDS
+from core.persistence import locked
+
+
+# Try to import SentenceTransformer; if unavailable (or torch missing),
+# fall back to a lightweight deterministic pseudo-embedding for dev.
+_HAS_ST = False
+try:
+    from sentence_transformers import SentenceTransformer
+    _HAS_ST = True
+except Exception:
+    SentenceTransformer = None
+
+
+_PSEUDO_DIM = 512
+
+
+def _pseudo_embedding(text: str, dim: int = _PSEUDO_DIM) -> np.ndarray:
+    # Deterministic RNG seeded from text hash -> reproducible embeddings
+    h = int(hashlib.sha256(text.encode("utf-8")).hexdigest()[:16], 16)
+    rng = np.random.RandomState(h % (2 ** 32))
+    v = rng.rand(dim).astype("float32")
+    norm = np.linalg.norm(v)
+    if norm > 0:
+        v = v / norm
+    return v
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+class _DiskSpill:
+    """
+    Direct-mapped on-disk cache: slot = key % slots in two memmaps
+    (uint64 keys, float32 vectors), so entries survive restarts and are
+    shared by every process using the same directory. Reads and writes of a
+    slot hold the file lock, so no reader pairs a key with another vector.
+    """
+
+    def __init__(self, directory: str, slots: int):
+        self.directory = directory
+        self.slots = slots
+        self._keys = None
+        self._vecs = None
+        self._lock_path = None
+
+    def _open(self, dim: int):
+        if self._vecs is not None:
+            return self._vecs.shape[1] == dim
+        os.makedirs(self.directory, exist_ok=True)
+        key_path = os.path.join(self.directory, f"keys_{dim}.u64")
+        vec_path = os.path.join(self.directory, f"vecs_{dim}.f32")
+        with locked(vec_path):  # another process may be creating the files
+            mode = "r+" if os.path.exists(key_path) and os.path.exists(vec_path) else "w+"
+            self._keys = np.memmap(key_path, dtype=np.uint64, mode=mode, shape=(self.slots,))
+            self._vecs = np.memmap(vec_path, dtype=np.float32, mode=mode, shape=(self.slots, dim))
+        self._lock_path = vec_path
+        return True
+
+    def get(self, key: int, dim: int | None):
+        if dim is None or not self._open(dim):
+            return None
+        slot = key % self.slots
+        with locked(self._lock_path):
+            if int(self._keys[slot]) != key:
+                return None
+            return np.array(self._vecs[slot])
+
+    def put(self, key: int, vec: np.ndarray):
+        if not self._open(vec.shape[0]):
+            return
+        slot = key % self.slots
+        with locked(self._lock_path):
+            # Invalidate first: the slot's old key must not outlive its vector
+            self._keys[slot] = 0
+            self._vecs[slot] = vec
+            self._keys[slot] = key
+
+
+class EmbeddingCache:
+    """Bounded, thread-safe LRU of embeddings keyed by model name + normalized text."""
+
+    def __init__(
+        self,
+        max_size: int = EMBEDDING_CACHE_SIZE,
+        ttl_seconds: float = EMBEDDING_CACHE_TTL_SECONDS,
+        disk_dir: str = EMBEDDING_CACHE_DIR,
+        disk_slots: int = EMBEDDING_CACHE_DISK_SLOTS,
+    ):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[int, tuple[np.ndarray, float]] = OrderedDict()
+        self._disk = _DiskSpill(disk_dir, disk_slots) if disk_dir else None
+        self._dim: int | None = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(model_name: str, text: str) -> int:
+        digest = hashlib.blake2b(f"{model_name}\0{text}".encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") or 1  # 0 marks an empty disk slot
+
+    def get(self, key: int, dim: int | None = None):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                vec, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vec
+                del self._entries[key]
+            if self._disk is not None:
+                vec = self._disk.get(key, dim or self._dim)
+                if vec is not None:
+                    self.disk_hits += 1
+                    self._insert(key, vec, now)
+                    return vec
+            self.misses += 1
+            return None
+
+    def put(self, key: int, vec: np.ndarray):
+        vec = np.array(vec, dtype=np.float32)
+        with self._lock:
+            self._dim = vec.shape[0]
+            self._insert(key, vec, time.monotonic())
+            if self._disk is not None:
+                self._disk.put(key, vec)
+
+    def _insert(self, key, vec, now):
+        vec.flags.writeable = False  # callers get copies via np.stack
+        self._entries[key] = (vec, now + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            }
+
+
+class EmbeddingBatcher:
+    """
+    In-process micro-batching: callers submit single texts and get a Future;
+    one worker thread drains up to `max_batch_size` texts (or waits at most
+    `max_wait_ms` for more), runs a single encode call and fans results out.
+    """
+
+    _SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+    def __init__(self, encode_fn, max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE,
+                 max_wait_ms: float = EMBEDDING_BATCH_MAX_WAIT_MS):
+        self._encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue: queue.Queue[tuple[str, Future]] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+        self.size_histogram = {b: 0 for b in self._SIZE_BUCKETS}
+
+    def _ensure_worker(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="embedding-batcher", daemon=True
+                    )
+                    self._thread.start()
+
+    def submit(self, text: str) -> Future:
+        self._ensure_worker()
+        fut: Future = Future()
+        self._queue.put((text, fut))
+        return fut
+
+    def _drain(self) -> list[tuple[str, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._drain()
+            try:
+                self._process(batch)
+            except Exception:
+                # Never let one batch end the worker; its futures get the error
+                logging.exception("Embedding batch failed")
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(RuntimeError("embedding batch failed"))
+
+    def _process(self, batch: list[tuple[str, Future]]):
+        # Callers that gave up (e.g. a cancelled request) are dropped; once
+        # marked running, a future can no longer be cancelled under us
+        batch = [(text, fut) for text, fut in batch if fut.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        self._record(len(batch))
+        try:
+            vecs = self._encode_fn([text for text, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+        for (_, fut), vec in zip(batch, vecs):
+            fut.set_result(vec)
+
+    def _record(self, size: int):
+        self.batches += 1
+        self.items += size
+        self.largest_batch = max(self.largest_batch, size)
+        bucket = next((b for b in self._SIZE_BUCKETS if size <= b), self._SIZE_BUCKETS[-1])
+        self.size_histogram[bucket] += 1
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "batch_size_histogram": {f"<={b}": c for b, c in self.size_histogram.items()},
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+class EmbeddingModel:
+    _model = None
+    _lock = threading.Lock()
+    cache = EmbeddingCache()
+    batcher: EmbeddingBatcher | None = None
+
+    @classmethod
+    @traceable(name="embeddingsload")
+    def load(cls):
+        if cls._model is None:
+            with cls._lock:
+                if cls._model is None:
+                    if _HAS_ST and EMBEDDING_MODEL:
+                        logging.info("🔥 Loading SentenceTransformer model (ONCE)...")
+                        cls._model = SentenceTransformer(EMBEDDING_MODEL)
+                        logging.info("✅ SentenceTransformer model loaded")
+                    else:
+                        logging.info(
+                            "⚠️ sentence_transformers not available — using pseudo-embeddings"
+                        )
+                        cls._model = None
+        return cls._model
+
+    @classmethod
+    def _model_name(cls) -> str:
+        return EMBEDDING_MODEL if cls._model is not None else "pseudo"
+
+    @classmethod
+    def _dim(cls) -> int:
+        if cls._model is not None:
+            return cls._model.get_sentence_embedding_dimension()
+        return _PSEUDO_DIM
+
+    @classmethod
+    def _encode_uncached(cls, texts):
+        if compute.mode() == "process" and cls.load() is None:
+            # Pure-Python pseudo-embeddings split across the CPU pool. A real
+            # model always encodes here (torch releases the GIL and uses every
+            # core), so pool workers never hold a copy of it.
+            return np.stack(compute.map_chunks(_encode_chunk, list(texts)), axis=0)
+        return cls._encode_local(texts)
+
+    @classmethod
+    def _encode_local(cls, texts):
+        model = cls.load()
+        if model is not None:
+            return model.encode(
+                texts,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+        # Fallback: deterministic pseudo-embeddings using numpy
+        vecs = [_pseudo_embedding(t) for t in texts]
+        return np.stack(vecs, axis=0)
+
+    @classmethod
+    def _get_batcher(cls) -> EmbeddingBatcher | None:
+        if EMBEDDING_BATCH_MAX_SIZE <= 1:
+            return None
+        if cls.batcher is None:
+            with cls._lock:
+                if cls.batcher is None:
+                    cls.batcher = EmbeddingBatcher(cls._encode_uncached)
+        return cls.batcher
+
+    @classmethod
+    def _lookup(cls, texts):
+        """Normalize texts and resolve cache hits: (texts, keys, vecs-with-None-for-misses)."""
+        if isinstance(texts, str):
+            texts = [texts]
+        cls.load()
+        model_name, dim = cls._model_name(), cls._dim()
+        texts = [normalize_text(t) for t in texts]
+        keys = [EmbeddingCache.key(model_name, t) for t in texts]
+        vecs = [cls.cache.get(k, dim) if EMBEDDING_CACHE_SIZE > 0 else None for k in keys]
+        return texts, keys, vecs
+
+    @classmethod
+    def _fill(cls, texts, keys, vecs, encoded: dict):
+        for i, v in enumerate(vecs):
+            if v is None:
+                vecs[i] = encoded[texts[i]]
+                if EMBEDDING_CACHE_SIZE > 0:
+                    cls.cache.put(keys[i], vecs[i])
+        return np.stack(vecs, axis=0).astype(np.float32, copy=False)
+
+    @classmethod
+    @traceable(name="embeddingsencode")
+    def encode(cls, texts):
+        with EMBEDDING_ENCODE_SECONDS.time():
+            texts, keys, vecs = cls._lookup(texts)
+            # Deduplicate so repeated texts in one call are encoded once
+            unique = list(dict.fromkeys(t for t, v in zip(texts, vecs) if v is None))
+            encoded = {}
+            if unique:
+                batcher = cls._get_batcher()
+                if batcher is not None and len(unique) < batcher.max_batch_size:
+                    # Small request: coalesce with concurrent callers
+                    futures = [batcher.submit(t) for t in unique]
+                    encoded = {t: f.result() for t, f in zip(unique, futures)}
+                else:
+                    encoded = dict(zip(unique, cls._encode_uncached(unique)))
+            return cls._fill(texts, keys, vecs, encoded)
+
+    @classmethod
+    async def encode_async(cls, texts):
+        """Like encode(), but awaits the batcher/executor instead of blocking the event loop."""
+        with EMBEDDING_ENCODE_SECONDS.time():
+            texts, keys, vecs = cls._lookup(texts)
+            unique = list(dict.fromkeys(t for t, v in zip(texts, vecs) if v is None))
+            encoded = {}
+            if unique:
+                batcher = cls._get_batcher()
+                if batcher is not None and len(unique) < batcher.max_batch_size:
+                    futures = [asyncio.wrap_future(batcher.submit(t)) for t in unique]
+                    encoded = dict(zip(unique, await asyncio.gather(*futures)))
+                else:
+                    encoded = dict(zip(unique, await asyncio.to_thread(cls._encode_uncached, unique)))
+            return cls._fill(texts, keys, vecs, encoded)
+
+    @classmethod
+    def cache_stats(cls) -> dict:
+        return cls.cache.stats()
+
+    @classmethod
+    def batcher_stats(cls) -> dict:
+        return cls.batcher.stats() if cls.batcher is not None else {"enabled": EMBEDDING_BATCH_MAX_SIZE > 1}
+
+
+def _encode_chunk(texts: list[str]):
+    """Process-pool task: pseudo-embeddings (never loads a model in the worker)."""
+    return [_pseudo_embedding(t) for t in texts]
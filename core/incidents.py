@@ -1,439 +1,577 @@
-"""
-Incident lifecycle management — persistent incident records with status,
-severity, summarization fields, correlation groups, and timeline events.
-"""
-
-from datetime import datetime, timedelta
-from enum import Enum
-from typing import Optional
-
-from sqlalchemy import (
-    Boolean,
-    Column,
-    DateTime,
-    Float,
-    Integer,
-    String,
-    Text,
-    create_engine,
-    text,
-)
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-
-from core.analytics import engine as analytics_engine
-
-Base = declarative_base()
-Session = sessionmaker(bind=analytics_engine)
-
-
-class IncidentStatus(str, Enum):
-    OPEN = "OPEN"
-    INVESTIGATING = "INVESTIGATING"
-    MITIGATED = "MITIGATED"
-    RESOLVED = "RESOLVED"
-    CLOSED = "CLOSED"
-
-
-VALID_TRANSITIONS = {
-    IncidentStatus.OPEN: {IncidentStatus.INVESTIGATING, IncidentStatus.MITIGATED, IncidentStatus.RESOLVED},
-    IncidentStatus.INVESTIGATING: {IncidentStatus.MITIGATED, IncidentStatus.RESOLVED, IncidentStatus.OPEN},
-    IncidentStatus.MITIGATED: {IncidentStatus.RESOLVED, IncidentStatus.INVESTIGATING},
-    IncidentStatus.RESOLVED: {IncidentStatus.CLOSED, IncidentStatus.INVESTIGATING},
-    IncidentStatus.CLOSED: {IncidentStatus.OPEN},
-}
-
-
-class Incident(Base):
-    __tablename__ = "incidents"
-
-    incident_id = Column(String(100), primary_key=True)
-    status = Column(String(30), default=IncidentStatus.OPEN.value)
-    severity = Column(String(20), default="medium")
-    service = Column(String(100), nullable=True)
-    team = Column(String(50))
-    issue_type = Column(String(50), default="alert")
-    text = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    resolved_at = Column(DateTime, nullable=True)
-    created_by_user_id = Column(String(100), nullable=True)
-    created_by_email = Column(String(255), nullable=True)
-    summary = Column(Text, nullable=True)
-    root_cause = Column(Text, nullable=True)
-    impact = Column(Text, nullable=True)
-    recommendation = Column(Text, nullable=True)
-    correlation_group = Column(String(100), nullable=True)
-    archived = Column(Boolean, default=False)
-
-
-class IncidentTimelineEvent(Base):
-    __tablename__ = "incident_timeline"
-
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    incident_id = Column(String(100), index=True)
-    event_type = Column(String(50))
-    description = Column(Text)
-    user_id = Column(String(100), nullable=True)
-    user_email = Column(String(255), nullable=True)
-    timestamp = Column(DateTime, default=datetime.utcnow)
-
-
-class WebNotification(Base):
-    __tablename__ = "web_notifications"
-
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(String(100), index=True)
-    incident_id = Column(String(100), nullable=True)
-    channel = Column(String(30), default="web")
-    title = Column(String(200))
-    message = Column(Text)
-    read = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-
-
-Base.metadata.create_all(analytics_engine)
-
-
-def _incident_to_dict(i: Incident) -> dict:
-    return {
-        "incident_id": i.incident_id,
-        "status": i.status,
-        "severity": i.severity,
-        "service": i.service,
-        "team": i.team,
-        "issue_type": i.issue_type,
-        "text": i.text,
-        "created_at": i.created_at.isoformat() if i.created_at else None,
-        "resolved_at": i.resolved_at.isoformat() if i.resolved_at else None,
-        "created_by_user_id": i.created_by_user_id,
-        "created_by_email": i.created_by_email,
-        "summary": i.summary,
-        "root_cause": i.root_cause,
-        "impact": i.impact,
-        "recommendation": i.recommendation,
-        "correlation_group": i.correlation_group,
-        "archived": i.archived,
-    }
-
-
-class IncidentManager:
-    @staticmethod
-    def create(
-        incident_id: str,
-        text: str,
-        team: str,
-        issue_type: str = "alert",
-        severity: str = "medium",
-        service: str | None = None,
-        created_by_user_id: str | None = None,
-        created_by_email: str | None = None,
-        correlation_group: str | None = None,
-        metadata: dict | None = None,
-    ) -> dict:
-        session = Session()
-        try:
-            inc = Incident()
-            inc.incident_id = incident_id
-            inc.text = text
-            inc.team = team
-            inc.issue_type = issue_type
-            inc.severity = (severity or "medium").lower()
-            inc.service = service or (metadata or {}).get("service")
-            inc.created_by_user_id = created_by_user_id
-            inc.created_by_email = created_by_email
-            inc.correlation_group = correlation_group
-            inc.status = IncidentStatus.OPEN.value
-            inc.created_at = datetime.utcnow()
-            session.add(inc)
-            session.commit()
-
-            IncidentManager.add_timeline_event(
-                incident_id,
-                "created",
-                f"Incident created: {text[:120]}",
-                created_by_user_id,
-                created_by_email,
-            )
-            return _incident_to_dict(inc)
-        finally:
-            session.close()
-
-    @staticmethod
-    def add_timeline_event(
-        incident_id: str,
-        event_type: str,
-        description: str,
-        user_id: str | None = None,
-        user_email: str | None = None,
-    ):
-        session = Session()
-        try:
-            ev = IncidentTimelineEvent()
-            ev.incident_id = incident_id
-            ev.event_type = event_type
-            ev.description = description
-            ev.user_id = user_id
-            ev.user_email = user_email
-            ev.timestamp = datetime.utcnow()
-            session.add(ev)
-            session.commit()
-        finally:
-            session.close()
-
-    @staticmethod
-    def get(incident_id: str) -> Optional[dict]:
-        session = Session()
-        try:
-            inc = session.query(Incident).filter(Incident.incident_id == incident_id).first()
-            return _incident_to_dict(inc) if inc else None
-        finally:
-            session.close()
-
-    @staticmethod
-    def list_incidents(
-        team: str | None = None,
-        status: str | None = None,
-        severity: str | None = None,
-        hours: int | None = None,
-        include_archived: bool = False,
-        limit: int = 100,
-    ) -> list[dict]:
-        session = Session()
-        try:
-            q = session.query(Incident)
-            if not include_archived:
-                q = q.filter(Incident.archived == False)  # noqa: E712
-            if team:
-                q = q.filter(Incident.team == team)
-            if status:
-                q = q.filter(Incident.status == status.upper())
-            if severity:
-                q = q.filter(Incident.severity == severity.lower())
-            if hours:
-                cutoff = datetime.utcnow() - timedelta(hours=hours)
-                q = q.filter(Incident.created_at >= cutoff)
-            incidents = q.order_by(Incident.created_at.desc()).limit(limit).all()
-            return [_incident_to_dict(i) for i in incidents]
-        finally:
-            session.close()
-
-    @staticmethod
-    def transition_status(
-        incident_id: str,
-        new_status: str,
-        user_id: str | None = None,
-        user_email: str | None = None,
-    ) -> dict:
-        session = Session()
-        try:
-            inc = session.query(Incident).filter(Incident.incident_id == incident_id).first()
-            if not inc:
-                raise ValueError("Incident not found")
-
-            current = IncidentStatus(inc.status)
-            target = IncidentStatus(new_status.upper())
-            if target not in VALID_TRANSITIONS.get(current, set()):
-                raise ValueError(f"Cannot transition from {current.value} to {target.value}")
-
-            inc.status = target.value
-            if target in (IncidentStatus.RESOLVED, IncidentStatus.CLOSED):
-                inc.resolved_at = datetime.utcnow()
-            elif target == IncidentStatus.OPEN:
-                inc.resolved_at = None
-
-            session.commit()
-            IncidentManager.add_timeline_event(
-                incident_id,
-                f"status_{target.value.lower()}",
-                f"Status changed to {target.value}",
-                user_id,
-                user_email,
-            )
-            return _incident_to_dict(inc)
-        finally:
-            session.close()
-
-    @staticmethod
-    def update_summary(
-        incident_id: str,
-        summary: str | None = None,
-        root_cause: str | None = None,
-        impact: str | None = None,
-        recommendation: str | None = None,
-    ) -> dict:
-        session = Session()
-        try:
-            inc = session.query(Incident).filter(Incident.incident_id == incident_id).first()
-            if not inc:
-                raise ValueError("Incident not found")
-            if summary is not None:
-                inc.summary = summary
-            if root_cause is not None:
-                inc.root_cause = root_cause
-            if impact is not None:
-                inc.impact = impact
-            if recommendation is not None:
-                inc.recommendation = recommendation
-            session.commit()
-            return _incident_to_dict(inc)
-        finally:
-            session.close()
-
-    @staticmethod
-    def set_correlation_group(incident_id: str, group_id: str) -> dict:
-        session = Session()
-        try:
-            inc = session.query(Incident).filter(Incident.incident_id == incident_id).first()
-            if not inc:
-                raise ValueError("Incident not found")
-            inc.correlation_group = group_id
-            session.commit()
-            return _incident_to_dict(inc)
-        finally:
-            session.close()
-
-    @staticmethod
-    def get_timeline(incident_id: str) -> list[dict]:
-        session = Session()
-        try:
-            events = (
-                session.query(IncidentTimelineEvent)
-                .filter(IncidentTimelineEvent.incident_id == incident_id)
-                .order_by(IncidentTimelineEvent.timestamp.asc())
-                .all()
-            )
-            return [
-                {
-                    "id": e.id,
-                    "event_type": e.event_type,
-                    "description": e.description,
-                    "user_id": e.user_id,
-                    "user_email": e.user_email,
-                    "timestamp": e.timestamp.isoformat() if e.timestamp else None,
-                }
-                for e in events
-            ]
-        finally:
-            session.close()
-
-    @staticmethod
-    def get_correlation_group(group_id: str) -> list[dict]:
-        session = Session()
-        try:
-            incidents = (
-                session.query(Incident)
-                .filter(Incident.correlation_group == group_id)
-                .order_by(Incident.created_at.asc())
-                .all()
-            )
-            return [_incident_to_dict(i) for i in incidents]
-        finally:
-            session.close()
-
-    @staticmethod
-    def archive_resolved_older_than(days: int) -> int:
-        session = Session()
-        try:
-            cutoff = datetime.utcnow() - timedelta(days=days)
-            count = (
-                session.query(Incident)
-                .filter(
-                    Incident.status.in_([IncidentStatus.RESOLVED.value, IncidentStatus.CLOSED.value]),
-                    Incident.resolved_at != None,  # noqa: E711
-                    Incident.resolved_at < cutoff,
-                    Incident.archived == False,  # noqa: E712
-                )
-                .update({"archived": True})
-            )
-            session.commit()
-            return count
-        finally:
-            session.close()
-
-    @staticmethod
-    def get_expired_incident_ids(days: int) -> list[str]:
-        session = Session()
-        try:
-            cutoff = datetime.utcnow() - timedelta(days=days)
-            rows = (
-                session.query(Incident.incident_id)
-                .filter(
-                    Incident.archived == True,  # noqa: E712
-                    Incident.resolved_at != None,  # noqa: E711
-                    Incident.resolved_at < cutoff,
-                )
-                .all()
-            )
-            return [r[0] for r in rows]
-        finally:
-            session.close()
-
-    @staticmethod
-    def delete_incident(incident_id: str) -> bool:
-        session = Session()
-        try:
-            session.query(IncidentTimelineEvent).filter(
-                IncidentTimelineEvent.incident_id == incident_id
-            ).delete()
-            deleted = (
-                session.query(Incident).filter(Incident.incident_id == incident_id).delete()
-            )
-            session.commit()
-            return deleted > 0
-        finally:
-            session.close()
-
-    @staticmethod
-    def get_mttr_stats(hours: int = 168) -> dict:
-        session = Session()
-        try:
-            cutoff = datetime.utcnow() - timedelta(hours=hours)
-            resolved = (
-                session.query(Incident)
-                .filter(
-                    Incident.resolved_at != None,  # noqa: E711
-                    Incident.created_at >= cutoff,
-                )
-                .all()
-            )
-            if not resolved:
-                return {"mttr_minutes": 0, "resolved_count": 0}
-            durations = [
-                (i.resolved_at - i.created_at).total_seconds() / 60
-                for i in resolved
-                if i.resolved_at and i.created_at
-            ]
-            return {
-                "mttr_minutes": round(sum(durations) / len(durations), 1),
-                "resolved_count": len(durations),
-            }
-        finally:
-            session.close()
-
-    @staticmethod
-    def get_severity_distribution(hours: int = 168) -> dict:
-        session = Session()
-        try:
-            cutoff = datetime.utcnow() - timedelta(hours=hours)
-            incidents = session.query(Incident).filter(Incident.created_at >= cutoff).all()
-            dist: dict[str, int] = {}
-            for i in incidents:
-                dist[i.severity or "unknown"] = dist.get(i.severity or "unknown", 0) + 1
-            return dist
-        finally:
-            session.close()
-
-    @staticmethod
-    def get_top_services(hours: int = 168, limit: int = 10) -> list[dict]:
-        session = Session()
-        try:
-            cutoff = datetime.utcnow() - timedelta(hours=hours)
-            incidents = session.query(Incident).filter(Incident.created_at >= cutoff).all()
-            counts: dict[str, int] = {}
-            for i in incidents:
-                svc = i.service or "unknown"
-                counts[svc] = counts.get(svc, 0) + 1
-            ranked = sorted(counts.items(), key=lambda x: x[1], reverse=True)[:limit]
-            return [{"service": s, "count": c} for s, c in ranked]
-        finally:
-            session.close()
+"""
+Incident lifecycle management — persistent incident records with status,
+severity, summarization fields, correlation groups, and timeline events.
+"""
+
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Optional
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    String,
+    Text,
+    create_engine,
+    func,
+    text,
+)
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from core.analytics import engine as analytics_engine, ensure_indexes, record_rollups, rollup_totals
+
+Base = declarative_base()
+Session = sessionmaker(bind=analytics_engine)
+
+
+class IncidentStatus(str, Enum):
+    OPEN = "OPEN"
+    INVESTIGATING = "INVESTIGATING"
+    MITIGATED = "MITIGATED"
+    RESOLVED = "RESOLVED"
+    CLOSED = "CLOSED"
+
+
+VALID_TRANSITIONS = {
+    IncidentStatus.OPEN: {IncidentStatus.INVESTIGATING, IncidentStatus.MITIGATED, IncidentStatus.RESOLVED},
+    IncidentStatus.INVESTIGATING: {IncidentStatus.MITIGATED, IncidentStatus.RESOLVED, IncidentStatus.OPEN},
+    IncidentStatus.MITIGATED: {IncidentStatus.RESOLVED, IncidentStatus.INVESTIGATING},
+    IncidentStatus.RESOLVED: {IncidentStatus.CLOSED, IncidentStatus.INVESTIGATING},
+    IncidentStatus.CLOSED: {IncidentStatus.OPEN},
+}
+
+
+class Incident(Base):
+    __tablename__ = "incidents"
+
+    incident_id = Column(String(100), primary_key=True)
+    status = Column(String(30), default=IncidentStatus.OPEN.value)
+    severity = Column(String(20), default="medium")
+    service = Column(String(100), nullable=True)
+    team = Column(String(50))
+    issue_type = Column(String(50), default="alert")
+    text = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    resolved_at = Column(DateTime, nullable=True)
+    created_by_user_id = Column(String(100), nullable=True)
+    created_by_email = Column(String(255), nullable=True)
+    summary = Column(Text, nullable=True)
+    root_cause = Column(Text, nullable=True)
+    impact = Column(Text, nullable=True)
+    recommendation = Column(Text, nullable=True)
+    correlation_group = Column(String(100), nullable=True)
+    archived = Column(Boolean, default=False)
+
+    # Dashboard aggregates over a created_at window read only these indexes
+    __table_args__ = (
+        Index("ix_incidents_created_severity", "created_at", "severity"),
+        Index("ix_incidents_created_service", "created_at", "service"),
+        Index("ix_incidents_created_resolved", "created_at", "resolved_at"),
+    )
+
+
+class IncidentTimelineEvent(Base):
+    __tablename__ = "incident_timeline"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    incident_id = Column(String(100), index=True)
+    event_type = Column(String(50))
+    description = Column(Text)
+    user_id = Column(String(100), nullable=True)
+    user_email = Column(String(255), nullable=True)
+    timestamp = Column(DateTime, default=datetime.utcnow)
+
+
+class WebNotification(Base):
+    __tablename__ = "web_notifications"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String(100), index=True)
+    incident_id = Column(String(100), nullable=True)
+    channel = Column(String(30), default="web")
+    title = Column(String(200))
+    message = Column(Text)
+    read = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+Base.metadata.create_all(analytics_engine)
+ensure_indexes(Base, analytics_engine)
+
+
+def incident_events(
+    severity: str | None,
+    service: str | None,
+    created_at: datetime,
+    resolved_at: datetime | None,
+    sign: int = 1,
+) -> list[dict]:
+    """Rollup deltas for one incident: its creation, and its resolution time when resolved."""
+    events = [
+        {"metric": "incident_severity", "ts": created_at, "severity": severity or "unknown", "count": sign},
+        {"metric": "incident_service", "ts": created_at, "service": service or "unknown", "count": sign},
+    ]
+    if resolved_at is not None:
+        events.extend(resolution_events(created_at, resolved_at, sign))
+    return events
+
+
+def resolution_events(created_at: datetime, resolved_at: datetime, sign: int = 1) -> list[dict]:
+    # Keyed by created_at, the same window get_mttr_stats filters on
+    minutes = (resolved_at - created_at).total_seconds() / 60
+    return [{"metric": "resolution", "ts": created_at, "count": sign, "value": sign * minutes}]
+
+
+def _incident_to_dict(i: Incident) -> dict:
+    return {
+        "incident_id": i.incident_id,
+        "status": i.status,
+        "severity": i.severity,
+        "service": i.service,
+        "team": i.team,
+        "issue_type": i.issue_type,
+        "text": i.text,
+        "created_at": i.created_at.isoformat() if i.created_at else None,
+        "resolved_at": i.resolved_at.isoformat() if i.resolved_at else None,
+        "created_by_user_id": i.created_by_user_id,
+        "created_by_email": i.created_by_email,
+        "summary": i.summary,
+        "root_cause": i.root_cause,
+        "impact": i.impact,
+        "recommendation": i.recommendation,
+        "correlation_group": i.correlation_group,
+        "archived": i.archived,
+    }
+
+
+def _deleted_events(session, condition) -> list[dict]:
+    """Rollup retractions for the incidents matching `condition`, read before they are deleted."""
+    rows = session.query(
+        Incident.severity, Incident.service, Incident.created_at, Incident.resolved_at
+    ).filter(condition)
+    return [e for row in rows for e in incident_events(*row, sign=-1)]
+
+
+class IncidentManager:
+    @staticmethod
+    def create(
+        incident_id: str,
+        text: str,
+        team: str,
+        issue_type: str = "alert",
+        severity: str = "medium",
+        service: str | None = None,
+        created_by_user_id: str | None = None,
+        created_by_email: str | None = None,
+        correlation_group: str | None = None,
+        metadata: dict | None = None,
+    ) -> dict:
+        session = Session()
+        try:
+            inc = Incident()
+            inc.incident_id = incident_id
+            inc.text = text
+            inc.team = team
+            inc.issue_type = issue_type
+            inc.severity = (severity or "medium").lower()
+            inc.service = service or (metadata or {}).get("service")
+            inc.created_by_user_id = created_by_user_id
+            inc.created_by_email = created_by_email
+            inc.correlation_group = correlation_group
+            inc.status = IncidentStatus.OPEN.value
+            inc.created_at = datetime.utcnow()
+            session.add(inc)
+            record_rollups(session, incident_events(inc.severity, inc.service, inc.created_at, None))
+            session.commit()
+
+            IncidentManager.add_timeline_event(
+                incident_id,
+                "created",
+                f"Incident created: {text[:120]}",
+                created_by_user_id,
+                created_by_email,
+            )
+            return _incident_to_dict(inc)
+        finally:
+            session.close()
+
+    @staticmethod
+    def create_many(items: list[dict]) -> list[dict]:
+        """
+        Bulk create incidents (plus their timeline events) in one transaction.
+
+        Each item takes the keyword arguments of `create`, and optionally an
+        initial `status` which is applied when it is a valid transition from OPEN.
+        """
+        session = Session()
+        try:
+            now = datetime.utcnow()
+            incidents = []
+            for item in items:
+                metadata = item.get("metadata") or {}
+                inc = Incident()
+                inc.incident_id = item["incident_id"]
+                inc.text = item["text"]
+                inc.team = item["team"]
+                inc.issue_type = item.get("issue_type", "alert")
+                inc.severity = (item.get("severity") or "medium").lower()
+                inc.service = item.get("service") or metadata.get("service")
+                inc.created_by_user_id = item.get("created_by_user_id")
+                inc.created_by_email = item.get("created_by_email")
+                inc.correlation_group = item.get("correlation_group")
+                inc.status = IncidentStatus.OPEN.value
+                inc.created_at = now
+                events = [
+                    IncidentTimelineEvent(
+                        incident_id=inc.incident_id,
+                        event_type="created",
+                        description=f"Incident created: {inc.text[:120]}",
+                        user_id=inc.created_by_user_id,
+                        user_email=inc.created_by_email,
+                        timestamp=now,
+                    )
+                ]
+
+                target = IncidentStatus.__members__.get((item.get("status") or "OPEN").upper())
+                if target in VALID_TRANSITIONS[IncidentStatus.OPEN]:
+                    inc.status = target.value
+                    if target in (IncidentStatus.RESOLVED, IncidentStatus.CLOSED):
+                        inc.resolved_at = now
+                    events.append(
+                        IncidentTimelineEvent(
+                            incident_id=inc.incident_id,
+                            event_type=f"status_{target.value.lower()}",
+                            description=f"Status changed to {target.value}",
+                            user_id=inc.created_by_user_id,
+                            user_email=inc.created_by_email,
+                            timestamp=now,
+                        )
+                    )
+                session.add(inc)
+                session.add_all(events)
+                incidents.append(inc)
+            record_rollups(session, [
+                e
+                for i in incidents
+                for e in incident_events(i.severity, i.service, i.created_at, i.resolved_at)
+            ])
+            session.commit()
+            return [_incident_to_dict(i) for i in incidents]
+        finally:
+            session.close()
+
+    @staticmethod
+    def add_timeline_event(
+        incident_id: str,
+        event_type: str,
+        description: str,
+        user_id: str | None = None,
+        user_email: str | None = None,
+    ):
+        session = Session()
+        try:
+            ev = IncidentTimelineEvent()
+            ev.incident_id = incident_id
+            ev.event_type = event_type
+            ev.description = description
+            ev.user_id = user_id
+            ev.user_email = user_email
+            ev.timestamp = datetime.utcnow()
+            session.add(ev)
+            session.commit()
+        finally:
+            session.close()
+
+    @staticmethod
+    def get(incident_id: str) -> Optional[dict]:
+        session = Session()
+        try:
+            inc = session.query(Incident).filter(Incident.incident_id == incident_id).first()
+            return _incident_to_dict(inc) if inc else None
+        finally:
+            session.close()
+
+    @staticmethod
+    def list_incidents(
+        team: str | None = None,
+        status: str | None = None,
+        severity: str | None = None,
+        hours: int | None = None,
+        include_archived: bool = False,
+        limit: int = 100,
+    ) -> list[dict]:
+        session = Session()
+        try:
+            q = session.query(Incident)
+            if not include_archived:
+                q = q.filter(Incident.archived == False)  # noqa: E712
+            if team:
+                q = q.filter(Incident.team == team)
+            if status:
+                q = q.filter(Incident.status == status.upper())
+            if severity:
+                q = q.filter(Incident.severity == severity.lower())
+            if hours:
+                cutoff = datetime.utcnow() - timedelta(hours=hours)
+                q = q.filter(Incident.created_at >= cutoff)
+            incidents = q.order_by(Incident.created_at.desc()).limit(limit).all()
+            return [_incident_to_dict(i) for i in incidents]
+        finally:
+            session.close()
+
+    @staticmethod
+    def transition_status(
+        incident_id: str,
+        new_status: str,
+        user_id: str | None = None,
+        user_email: str | None = None,
+    ) -> dict:
+        session = Session()
+        try:
+            inc = session.query(Incident).filter(Incident.incident_id == incident_id).first()
+            if not inc:
+                raise ValueError("Incident not found")
+
+            current = IncidentStatus(inc.status)
+            target = IncidentStatus(new_status.upper())
+            if target not in VALID_TRANSITIONS.get(current, set()):
+                raise ValueError(f"Cannot transition from {current.value} to {target.value}")
+
+            inc.status = target.value
+            previous = inc.resolved_at
+            if target in (IncidentStatus.RESOLVED, IncidentStatus.CLOSED):
+                inc.resolved_at = datetime.utcnow()
+            elif target == IncidentStatus.OPEN:
+                inc.resolved_at = None
+
+            # Swap the old resolution time (if any) for the new one in the MTTR rollups
+            events = []
+            if previous is not None:
+                events.extend(resolution_events(inc.created_at, previous, sign=-1))
+            if inc.resolved_at is not None:
+                events.extend(resolution_events(inc.created_at, inc.resolved_at))
+            record_rollups(session, events)
+            session.commit()
+            IncidentManager.add_timeline_event(
+                incident_id,
+                f"status_{target.value.lower()}",
+                f"Status changed to {target.value}",
+                user_id,
+                user_email,
+            )
+            return _incident_to_dict(inc)
+        finally:
+            session.close()
+
+    @staticmethod
+    def update_summary(
+        incident_id: str,
+        summary: str | None = None,
+        root_cause: str | None = None,
+        impact: str | None = None,
+        recommendation: str | None = None,
+    ) -> dict:
+        session = Session()
+        try:
+            inc = session.query(Incident).filter(Incident.incident_id == incident_id).first()
+            if not inc:
+                raise ValueError("Incident not found")
+            if summary is not None:
+                inc.summary = summary
+            if root_cause is not None:
+                inc.root_cause = root_cause
+            if impact is not None:
+                inc.impact = impact
+            if recommendation is not None:
+                inc.recommendation = recommendation
+            session.commit()
+            return _incident_to_dict(inc)
+        finally:
+            session.close()
+
+    @staticmethod
+    def update_summaries(summaries: dict[str, dict]) -> None:
+        """Bulk `update_summary`: {incident_id: {summary, root_cause, ...}} in one transaction."""
+        if not summaries:
+            return
+        session = Session()
+        try:
+            incidents = (
+                session.query(Incident)
+                .filter(Incident.incident_id.in_(list(summaries)))
+                .all()
+            )
+            for inc in incidents:
+                fields = summaries[inc.incident_id]
+                for field in ("summary", "root_cause", "impact", "recommendation"):
+                    if fields.get(field) is not None:
+                        setattr(inc, field, fields[field])
+            session.commit()
+        finally:
+            session.close()
+
+    @staticmethod
+    def set_correlation_group(incident_id: str, group_id: str) -> dict:
+        session = Session()
+        try:
+            inc = session.query(Incident).filter(Incident.incident_id == incident_id).first()
+            if not inc:
+                raise ValueError("Incident not found")
+            inc.correlation_group = group_id
+            session.commit()
+            return _incident_to_dict(inc)
+        finally:
+            session.close()
+
+    @staticmethod
+    def get_timeline(incident_id: str) -> list[dict]:
+        session = Session()
+        try:
+            events = (
+                session.query(IncidentTimelineEvent)
+                .filter(IncidentTimelineEvent.incident_id == incident_id)
+                .order_by(IncidentTimelineEvent.timestamp.asc())
+                .all()
+            )
+            return [
+                {
+                    "id": e.id,
+                    "event_type": e.event_type,
+                    "description": e.description,
+                    "user_id": e.user_id,
+                    "user_email": e.user_email,
+                    "timestamp": e.timestamp.isoformat() if e.timestamp else None,
+                }
+                for e in events
+            ]
+        finally:
+            session.close()
+
+    @staticmethod
+    def get_correlation_group(group_id: str) -> list[dict]:
+        session = Session()
+        try:
+            incidents = (
+                session.query(Incident)
+                .filter(Incident.correlation_group == group_id)
+                .order_by(Incident.created_at.asc())
+                .all()
+            )
+            return [_incident_to_dict(i) for i in incidents]
+        finally:
+            session.close()
+
+    @staticmethod
+    def archive_resolved_older_than(days: int) -> int:
+        session = Session()
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=days)
+            count = (
+                session.query(Incident)
+                .filter(
+                    Incident.status.in_([IncidentStatus.RESOLVED.value, IncidentStatus.CLOSED.value]),
+                    Incident.resolved_at != None,  # noqa: E711
+                    Incident.resolved_at < cutoff,
+                    Incident.archived == False,  # noqa: E712
+                )
+                .update({"archived": True})
+            )
+            session.commit()
+            return count
+        finally:
+            session.close()
+
+    @staticmethod
+    def get_expired_incident_ids(days: int) -> list[str]:
+        session = Session()
+        try:
+            cutoff = datetime.utcnow() - timedelta(days=days)
+            rows = (
+                session.query(Incident.incident_id)
+                .filter(
+                    Incident.archived == True,  # noqa: E712
+                    Incident.resolved_at != None,  # noqa: E711
+                    Incident.resolved_at < cutoff,
+                )
+                .all()
+            )
+            return [r[0] for r in rows]
+        finally:
+            session.close()
+
+    @staticmethod
+    def delete_incident(incident_id: str) -> bool:
+        session = Session()
+        try:
+            session.query(IncidentTimelineEvent).filter(
+                IncidentTimelineEvent.incident_id == incident_id
+            ).delete()
+            record_rollups(session, _deleted_events(session, Incident.incident_id == incident_id))
+            deleted = (
+                session.query(Incident).filter(Incident.incident_id == incident_id).delete()
+            )
+            session.commit()
+            return deleted > 0
+        finally:
+            session.close()
+
+    @staticmethod
+    def delete_incidents(incident_ids: list[str], batch: int = 500) -> int:
+        """Bulk delete incidents and their timelines; returns the incidents removed."""
+        session = Session()
+        try:
+            deleted = 0
+            for i in range(0, len(incident_ids), batch):
+                chunk = incident_ids[i:i + batch]
+                session.query(IncidentTimelineEvent).filter(
+                    IncidentTimelineEvent.incident_id.in_(chunk)
+                ).delete(synchronize_session=False)
+                record_rollups(session, _deleted_events(session, Incident.incident_id.in_(chunk)))
+                deleted += (
+                    session.query(Incident)
+                    .filter(Incident.incident_id.in_(chunk))
+                    .delete(synchronize_session=False)
+                )
+            session.commit()
+            return deleted
+        finally:
+            session.close()
+
+    @staticmethod
+    def get_mttr_stats(hours: int = 168) -> dict:
+        session = Session()
+        try:
+            cutoff = datetime.utcnow() - timedelta(hours=hours)
+            rows = rollup_totals(session, "resolution", cutoff)
+            count, minutes, _ = rows[0] if rows else (0, 0.0, 0.0)
+            if not count:
+                return {"mttr_minutes": 0, "resolved_count": 0}
+            return {"mttr_minutes": round(minutes / count, 1), "resolved_count": count}
+        finally:
+            session.close()
+
+    @staticmethod
+    def get_severity_distribution(hours: int = 168) -> dict:
+        session = Session()
+        try:
+            cutoff = datetime.utcnow() - timedelta(hours=hours)
+            rows = rollup_totals(session, "incident_severity", cutoff, "severity")
+            return {severity: count for severity, count, _, _ in rows}
+        finally:
+            session.close()
+
+    @staticmethod
+    def get_top_services(hours: int = 168, limit: int = 10) -> list[dict]:
+        session = Session()
+        try:
+            cutoff = datetime.utcnow() - timedelta(hours=hours)
+            rows = rollup_totals(session, "incident_service", cutoff, "service")
+            ranked = sorted(((s, c) for s, c, _, _ in rows), key=lambda x: (-x[1], x[0]))[:limit]
+            return [{"service": s, "count": c} for s, c in ranked]
+        finally:
+            session.close()
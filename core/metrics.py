@@ -0,0 +1,145 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Histograms and counters live in a module-level registry and are rendered by
+`/metrics`. An observation is one bisect over the bucket bounds plus a few
+additions under a lock, so instrumenting the hot path costs a few
+microseconds per stage; with METRICS_ENABLED=false every call is a no-op.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+from config import METRICS_ENABLED
+
+# Latency buckets in seconds, from sub-millisecond index lookups to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: list = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, *labels: str):
+        if not METRICS_ENABLED:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+inf last), sum]
+        self._series: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *labels: str):
+        if not METRICS_ENABLED:
+            return
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += value
+
+    def time(self, *labels: str) -> "_Timer":
+        """`with histogram.time("dense"): ...` observes the block's wall-clock seconds."""
+        return _Timer(self, labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((labels, list(counts), total) for labels, (counts, total) in self._series.items())
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = f'le="{bound if bound == "+Inf" else _number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+def render() -> str:
+    """Every registered metric, in Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ── Application metrics ───────────────────────────────────────────
+
+RETRIEVAL_STAGE_SECONDS = Histogram(
+    "retrieval_stage_seconds", "Wall-clock time of each retrieve_node stage.", ("stage",)
+)
+RETRIEVAL_CANDIDATES = Counter(
+    "retrieval_candidates_total",
+    "Candidate documents entering (in) and leaving (out) each retrieve_node stage.",
+    ("stage", "direction"),
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "llm_request_seconds", "Latency of LLM completion calls by graph node.", ("node",)
+)
+EMBEDDING_ENCODE_SECONDS = Histogram(
+    "embedding_encode_seconds", "EmbeddingModel.encode latency, cache hits included."
+)
+
+
+def count_candidates(stage: str, n_in: int, n_out: int):
+    RETRIEVAL_CANDIDATES.inc(n_in, stage, "in")
+    RETRIEVAL_CANDIDATES.inc(n_out, stage, "out")
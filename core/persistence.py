@@ -1,54 +1,230 @@
-import faiss
-import json
-import os
-
-DATA_DIR = "data"
-INDEX_PATH = os.path.join(DATA_DIR, "faiss.index")
-DOC_PATH = os.path.join(DATA_DIR, "docs.json")
-VERSION_PATH = os.path.join(DATA_DIR, "version.txt")
-
-
-def current_version():
-    """
-    Returns current data version.
-    Creates version.txt if missing.
-    """
-    os.makedirs(DATA_DIR, exist_ok=True)
-
-    if not os.path.exists(VERSION_PATH):
-        with open(VERSION_PATH, "w") as f:
-            f.write("0")
-        return 0
-
-    with open(VERSION_PATH) as f:
-        return int(f.read().strip())
-
-
-def bump_version():
-    v = current_version() + 1
-    with open(VERSION_PATH, "w") as f:
-        f.write(str(v))
-    return v
-
-
-def save(index, docs):
-    os.makedirs(DATA_DIR, exist_ok=True)
-
-    faiss.write_index(index, INDEX_PATH)
-
-    with open(DOC_PATH, "w") as f:
-        json.dump(docs, f)
-
-    bump_version()   # 🔥 important
-
-
-def load():
-    if not os.path.exists(INDEX_PATH) or not os.path.exists(DOC_PATH):
-        return None, None
-
-    index = faiss.read_index(INDEX_PATH)
-
-    with open(DOC_PATH) as f:
-        docs = json.load(f)
-
-    return index, docs
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+
+from core.document_store import ColumnarDocs
+
+DATA_DIR = "data"
+INDEX_PATH = os.path.join(DATA_DIR, "faiss.index")
+DOC_PATH = os.path.join(DATA_DIR, "docs.json")  # legacy format, read if docs.bin is absent
+DOCS_BIN_PATH = os.path.join(DATA_DIR, "docs.bin")
+VERSION_PATH = os.path.join(DATA_DIR, "version.txt")
+WAL_PATH = os.path.join(DATA_DIR, "faiss.wal")
+INDEX_META_PATH = os.path.join(DATA_DIR, "faiss.meta.json")
+SPARSE_INDEX_PATH = os.path.join(DATA_DIR, "bm25.bin")
+SPARSE_LEGACY_PATH = os.path.join(DATA_DIR, "bm25.json")  # pre-columnar snapshot, read if bm25.bin is absent
+SPARSE_LOG_PATH = os.path.join(DATA_DIR, "bm25.log")
+
+
+def current_version():
+    """
+    Returns current data version.
+    Creates version.txt if missing.
+    """
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+    if not os.path.exists(VERSION_PATH):
+        with open(VERSION_PATH, "w") as f:
+            f.write("0")
+        return 0
+
+    with open(VERSION_PATH) as f:
+        return int(f.read().strip())
+
+
+def bump_version():
+    v = current_version() + 1
+    with open(VERSION_PATH, "w") as f:
+        f.write(str(v))
+    return v
+
+
+def save(index, docs, meta=None):
+    """Write a full snapshot (index + docs) and bump the version."""
+    install_snapshot(stage_snapshot(index, docs, meta))
+
+
+def stage_snapshot(index, docs, meta=None) -> str:
+    """
+    Write the snapshot to per-process temp files and return their suffix;
+    `install_snapshot(suffix)` swaps them in.
+    """
+    import faiss  # optional dependency, only needed with VECTOR_BACKEND=faiss
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    suffix = f".{os.getpid()}.tmp"
+
+    faiss.write_index(index, INDEX_PATH + suffix)
+    ColumnarDocs.write(DOCS_BIN_PATH + suffix, docs)
+
+    with open(INDEX_META_PATH + suffix, "w") as f:
+        json.dump(meta or {}, f)
+
+    return suffix
+
+
+def install_snapshot(suffix: str):
+    os.replace(INDEX_PATH + suffix, INDEX_PATH)
+    os.replace(DOCS_BIN_PATH + suffix, DOCS_BIN_PATH)
+    os.replace(INDEX_META_PATH + suffix, INDEX_META_PATH)
+    bump_version()   # 🔥 important
+
+
+def discard_snapshot(suffix: str):
+    for path in (INDEX_PATH, DOCS_BIN_PATH, INDEX_META_PATH):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+def load(mmap: bool = True):
+    """
+    (index, docs) from the last snapshot, or (None, None).
+
+    With `mmap`, vectors and documents stay on disk and are paged in on
+    demand (shared between processes); the index is then read-only.
+    """
+    if not os.path.exists(INDEX_PATH):
+        return None, None
+    if os.path.exists(DOCS_BIN_PATH):
+        docs = ColumnarDocs(DOCS_BIN_PATH)
+    elif os.path.exists(DOC_PATH):
+        with open(DOC_PATH) as f:
+            docs = {int(k): v for k, v in json.load(f).items()}
+    else:
+        return None, None
+
+    import faiss
+
+    flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) if mmap else 0
+    index = faiss.read_index(INDEX_PATH, flags)
+
+    return index, docs
+
+
+# ── Append-only logs ──────────────────────────────────────────────
+# Small JSON-lines logs let several processes (API workers, the Kafka
+# consumer) share an index without rewriting it on every mutation.
+
+
+def file_signature(path: str):
+    """(inode, mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class FileWatcher:
+    """
+    Change detection by stat() alone: no file is opened while nothing has
+    changed. Appends grow the size, atomic replaces change the inode.
+    """
+
+    def __init__(self, *paths: str):
+        self.paths = paths
+        self.mark()
+
+    def _signatures(self):
+        return [file_signature(p) for p in self.paths]
+
+    def mark(self) -> None:
+        """Record the current state as seen."""
+        self._seen = self._signatures()
+
+    def changed(self) -> bool:
+        return self._signatures() != self._seen
+
+
+@contextmanager
+def locked(path: str):
+    """Exclusive advisory lock shared by every process touching `path`."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def lease_slot(directory: str, slots: int):
+    """
+    Claim the first of `slots` numbered lock files in `directory` that no
+    live process holds. Returns (slot, lock file); the lease lasts while the
+    file stays open and the kernel releases it when the process exits.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for slot in range(slots):
+        lock_file = open(os.path.join(directory, f"{slot}.lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            continue
+        return slot, lock_file
+    raise RuntimeError(f"all {slots} slots in {directory} are leased")
+
+
+def write_json_atomic(path: str, obj) -> None:
+    """Write JSON to a temp file and rename it over `path`."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_json(path: str):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def append_log(path: str, records: list[dict]) -> None:
+    """Append records as JSON lines. Caller should hold `locked(path)`."""
+    if not records:
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    payload = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records)
+    with open(path, "a") as f:
+        f.write(payload)
+        f.flush()
+
+
+def read_log(path: str, offset: int = 0) -> tuple[list[dict], int]:
+    """Read complete records written after byte `offset`; returns (records, new_offset)."""
+    if not os.path.exists(path):
+        return [], 0
+    records = []
+    with open(path, "rb") as f:
+        f.seek(offset)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # partially written record; pick it up next time
+            offset += len(line)
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records, offset
+
+
+def truncate_log(path: str) -> None:
+    with open(path, "w"):
+        pass
+
+
+def rewrite_log(path: str, records: list[dict]) -> None:
+    """Atomically replace a log with `records` (used when compacting)."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write("".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
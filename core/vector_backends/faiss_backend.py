@@ -1,97 +1,532 @@
-"""FAISS vector backend — optional local fallback (no Qdrant required)."""
-
-import faiss
-import numpy as np
-
-from core.embeddings import EmbeddingModel
-from core.document_store import DocumentStore
-from core.persistence import load, save, current_version
-from config import EMBEDDING_DIM
-
-
-class FaissBackend:
-    def __init__(self):
-        self._load_from_disk()
-
-    def _load_from_disk(self):
-        index, docs = load()
-        if index is not None and docs is not None:
-            self.index = index
-            self.store = DocumentStore()
-            self.store.docs = {int(k): v for k, v in docs.items()}
-            self.store.counter = max(self.store.docs.keys(), default=-1) + 1
-        else:
-            self.index = faiss.IndexIDMap(faiss.IndexFlatIP(EMBEDDING_DIM))
-            self.store = DocumentStore()
-        self.version = current_version()
-
-    def reload(self):
-        latest = current_version()
-        if latest != self.version:
-            print("Reloading FAISS backend from disk...")
-            self._load_from_disk()
-
-    def add_document(self, text: str, metadata: dict | None = None) -> int:
-        emb = EmbeddingModel.encode([text])
-        faiss.normalize_L2(emb)
-        doc_id = self.store.add(text, metadata)
-        self.index.add_with_ids(emb, np.array([doc_id]))
-        save(self.index, self.store.docs)
-        self.version = current_version()
-        return doc_id
-
-    def delete_documents(self, *, issue_id=None, text=None, team_tag=None) -> int:
-        self.reload()
-        ids_to_delete = []
-        for doc_id, doc in self.store.docs.items():
-            metadata = doc.get("metadata", {}) or {}
-            issue_match = issue_id and metadata.get("issue_id") == issue_id
-            fallback_match = (
-                text is not None
-                and doc.get("text") == text
-                and (team_tag is None or metadata.get("team_tag") == team_tag)
-            )
-            if issue_match or fallback_match:
-                ids_to_delete.append(int(doc_id))
-
-        if not ids_to_delete:
-            return 0
-
-        self.index.remove_ids(np.array(ids_to_delete, dtype="int64"))
-        for doc_id in ids_to_delete:
-            self.store.docs.pop(doc_id, None)
-        save(self.index, self.store.docs)
-        self.version = current_version()
-        return len(ids_to_delete)
-
-    def search(self, query: str, k: int = 4, team_tag: str | None = None, **_) -> list[dict]:
-        self.reload()
-        q_emb = EmbeddingModel.encode([query])
-        faiss.normalize_L2(q_emb)
-        scores, ids = self.index.search(q_emb, k * 3 if team_tag else k)
-
-        results = []
-        for s, i in zip(scores[0], ids[0]):
-            if i == -1:
-                continue
-            doc = self.store.get(int(i))
-            meta = doc.get("metadata", {}) or {}
-            if team_tag and meta.get("team_tag") != team_tag:
-                continue
-            results.append({"text": doc["text"], "score": float(s), "metadata": meta})
-            if len(results) >= k:
-                break
-        return results
-
-    def all_docs(self) -> dict:
-        self.reload()
-        return dict(self.store.docs)
-
-    def count(self) -> int:
-        return len(self.store.docs)
-
-    def reset(self):
-        self.index = faiss.IndexIDMap(faiss.IndexFlatIP(EMBEDDING_DIM))
-        self.store = DocumentStore()
-        save(self.index, self.store.docs)
-        self.version = current_version()
+"""FAISS vector backend — optional local fallback (no Qdrant required)."""
+
+import base64
+import threading
+
+import faiss
+import numpy as np
+
+from core.embeddings import EmbeddingModel
+from core.document_store import DocumentStore
+from core.persistence import (
+    INDEX_META_PATH,
+    INDEX_PATH,
+    WAL_PATH,
+    FileWatcher,
+    append_log,
+    discard_snapshot,
+    file_signature,
+    install_snapshot,
+    load,
+    locked,
+    read_json,
+    read_log,
+    rewrite_log,
+    save,
+    stage_snapshot,
+    truncate_log,
+)
+from core.vector_backends.faiss_filters import KeyIndex, MetadataBitmaps
+from core.vector_backends.faiss_index import (
+    build_index,
+    empty_index,
+    extract_vectors,
+    index_kind,
+    remove_vectors,
+    search_params,
+    set_search_params,
+)
+from config import (
+    FAISS_ANN_MIN_DOCS,
+    FAISS_COMPACT_EVERY,
+    FAISS_INDEX_TYPE,
+    FAISS_REBUILD_GROWTH,
+    FAISS_TOMBSTONE_RATIO,
+)
+from retrieval.recency import time_bucket
+
+_REEMBED_CHUNK = 1024
+
+
+def _encode_vector(vec: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(vec, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def _decode_vector(data: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(data), dtype=np.float32)
+
+
+class FaissBackend:
+    """
+    Snapshot (`faiss.index` + the columnar, memory-mapped `docs.bin`, see
+    `ColumnarDocs`) plus an append-only WAL of adds/metadata updates/deletes.
+    Writes append to the WAL; a background thread folds it into a new
+    snapshot every FAISS_COMPACT_EVERY records, and rebuilds the index as
+    FAISS_INDEX_TYPE once the corpus crosses FAISS_ANN_MIN_DOCS.
+    """
+
+    def __init__(self):
+        self._write_lock = threading.RLock()
+        self._compacting = False
+        self._watcher = FileWatcher(INDEX_PATH, WAL_PATH)
+        self._load_from_disk()
+
+    def _load_from_disk(self):
+        with self._write_lock, locked(WAL_PATH):
+            self._load_locked()
+
+    def _load_locked(self):
+        """Snapshot (memory-mapped) + full WAL replay. Caller holds the WAL file lock."""
+        index, docs = load()
+        self._meta = read_json(INDEX_META_PATH) or {}
+        if index is not None:
+            # Read-only base; writes since the snapshot go to the in-memory delta
+            self.index = index
+            set_search_params(self.index)
+            self.store = DocumentStore(docs)
+            self.store.counter = max(self.store.counter, self._meta.get("next_id", 0))
+        else:
+            self.index = empty_index()
+            self.store = DocumentStore()
+        self.delta = empty_index(self.index.d)
+        self._delta_ids: set[int] = set()
+        self._bitmaps = MetadataBitmaps(self.store.docs, self._write_lock)
+        self._keys = KeyIndex(self.store.docs)
+        self._snapshot_sig = file_signature(INDEX_PATH)
+        self._wal_offset = 0
+        self._wal_records = 0
+        self._replay_wal()
+
+    def _replay_wal(self):
+        records, self._wal_offset = read_log(WAL_PATH, self._wal_offset)
+        self._apply(records)
+        self._wal_records += len(records)
+        self._watcher.mark()
+
+    def _apply(self, records):
+        """Apply WAL records; replay is idempotent, so overlap with the snapshot is harmless."""
+        pending_ids, pending_vecs = [], []
+
+        def flush_adds():
+            if pending_ids:
+                self._add_vectors(np.vstack(pending_vecs), pending_ids)
+                pending_ids.clear()
+                pending_vecs.clear()
+
+        for r in records:
+            if r["op"] == "add":
+                doc_id = int(r["id"])
+                if doc_id in self.store.docs:
+                    continue
+                self.store.put(doc_id, r["text"], r.get("metadata"))
+                self._bitmaps.add(doc_id, r.get("metadata"))
+                self._keys.add(doc_id, r["text"], r.get("metadata"))
+                pending_ids.append(doc_id)
+                pending_vecs.append(_decode_vector(r["vec"]))
+            elif r["op"] == "update":
+                doc_id = int(r["id"])
+                if doc_id in self.store.docs:  # deleted since: nothing to update
+                    text = self.store.docs[doc_id]["text"]
+                    self.store.put(doc_id, text, r["metadata"])
+                    self._bitmaps.add(doc_id, r["metadata"])
+                    self._keys.add(doc_id, text, r["metadata"])
+            elif r["op"] == "delete":
+                flush_adds()
+                self._remove(int(i) for i in r["ids"])
+        flush_adds()
+
+    def _add_vectors(self, vectors, doc_ids):
+        self.delta.add_with_ids(vectors, np.array(doc_ids, dtype="int64"))
+        self._delta_ids.update(doc_ids)
+
+    def _remove(self, doc_ids):
+        """Delta vectors are removed; snapshot vectors are tombstoned until compaction."""
+        delta_ids = []
+        for doc_id in doc_ids:
+            if doc_id in self._delta_ids:
+                self._delta_ids.discard(doc_id)
+                delta_ids.append(doc_id)
+            self.store.remove(doc_id)
+            self._bitmaps.remove(doc_id)
+            self._keys.remove(doc_id)
+        if delta_ids:
+            remove_vectors(self.delta, delta_ids)
+
+    def _catch_up(self):
+        """Replay other writers' WAL records (or reload after their compaction). Caller holds the lock."""
+        wal_sig = file_signature(WAL_PATH)
+        wal_size = wal_sig[2] if wal_sig else 0
+        if file_signature(INDEX_PATH) != self._snapshot_sig or wal_size < self._wal_offset:
+            print("Reloading FAISS backend from disk...")
+            self._load_locked()
+        elif wal_size > self._wal_offset:
+            self._replay_wal()
+
+    def _log(self, records):
+        """Append records to the WAL. Caller holds the lock."""
+        append_log(WAL_PATH, records)
+        self._wal_offset = file_signature(WAL_PATH)[2]
+        self._wal_records += len(records)
+        self._watcher.mark()
+
+    def reload(self):
+        """
+        Pick up other processes' writes. Costs two stat() calls when nothing
+        changed; an append replays only the new WAL records, and only a
+        compaction elsewhere (new snapshot) triggers a full load.
+        """
+        if not self._watcher.changed():
+            return
+        with self._write_lock, locked(WAL_PATH):
+            self._catch_up()
+
+    # ── compaction / rebuild ─────────────────────────────────────
+
+    def _tombstones(self) -> int:
+        """Deleted documents whose vectors are still in the snapshot index."""
+        return max(self.index.ntotal + self.delta.ntotal - len(self.store.docs), 0)
+
+    def _extract_all(self):
+        """(ids, vectors) of snapshot + delta, or None if the snapshot is lossy."""
+        base = extract_vectors(self.index)
+        if base is None:
+            return None
+        delta_ids, delta_vecs = extract_vectors(self.delta)
+        return np.concatenate([base[0], delta_ids]), np.vstack([base[1], delta_vecs])
+
+    def _rebuild_target(self) -> str | None:
+        """Index type to rebuild as, or None if the current index is still fine."""
+        n = len(self.store.docs)
+        kind = index_kind(self.index)
+        if kind == "flat" and FAISS_INDEX_TYPE != "flat" and n >= FAISS_ANN_MIN_DOCS:
+            return FAISS_INDEX_TYPE
+        if kind.startswith("ivf") and n > self._meta.get("trained_on", n) * FAISS_REBUILD_GROWTH:
+            return kind  # centroids were trained on a much smaller corpus
+        if self._tombstones() > FAISS_TOMBSTONE_RATIO * max(n, 1):
+            return kind
+        return None
+
+    def _claim_compaction(self) -> bool:
+        """Mark a compaction as running (check-and-set under the lock); False if one already is."""
+        with self._write_lock:
+            if self._compacting:
+                return False
+            self._compacting = True
+            return True
+
+    def _maybe_compact(self):
+        if self._compacting:
+            return
+        rebuild_as = self._rebuild_target()
+        if rebuild_as is None and self._wal_records < FAISS_COMPACT_EVERY:
+            return
+        if not self._claim_compaction():
+            return
+        threading.Thread(target=self._compact, args=(rebuild_as,), name="faiss-compact", daemon=True).start()
+
+    def _build(self, kind: str, docs, extracted) -> object:
+        """Train/build a fresh index over `docs`, reusing stored vectors when exact."""
+        if extracted is not None:
+            ids, vectors = extracted
+            keep = np.fromiter((int(i) in docs for i in ids), dtype=bool, count=len(ids))
+            ids, vectors = ids[keep], vectors[keep]
+        else:
+            ids = np.fromiter(docs.keys(), dtype="int64", count=len(docs))
+            texts = [docs[int(i)]["text"] for i in ids]
+            chunks = [
+                EmbeddingModel.encode(texts[i:i + _REEMBED_CHUNK])
+                for i in range(0, len(texts), _REEMBED_CHUNK)
+            ]
+            vectors = np.vstack(chunks).astype("float32") if chunks else np.empty((0, self.index.d), "float32")
+            faiss.normalize_L2(vectors)
+        return build_index(kind, np.ascontiguousarray(vectors), ids)
+
+    def _merge(self, removed, delta) -> object:
+        """Owned copy of the snapshot index with deletes and the delta folded in."""
+        index, _ = load(mmap=False)
+        if index is None:
+            index = empty_index(self.index.d)
+        if removed:
+            remove_vectors(index, sorted(removed))  # HNSW keeps them as tombstones
+        ids, vectors = delta
+        if len(ids):
+            index.add_with_ids(vectors, ids)
+        set_search_params(index)
+        return index
+
+    def _compact(self, rebuild_as: str | None = None) -> bool:
+        """
+        Fold the WAL into a new snapshot (rebuilding the index as `rebuild_as`
+        if given). The snapshot is built and written outside the locks; only
+        the final swap (and WAL tail carry-over) blocks writers.
+        """
+        suffix = None
+        try:
+            with self._write_lock, locked(WAL_PATH):
+                self._catch_up()
+                snapshot_sig = self._snapshot_sig
+                docs = self.store.docs.copy()
+                next_id = self.store.counter
+                cut = self._wal_offset
+                if rebuild_as is None:
+                    # Base ids shadowed by an overlay record were updated in place, not deleted
+                    removed = {doc_id for doc_id in docs.removed if doc_id not in docs.overlay}
+                    delta = extract_vectors(self.delta)
+                else:
+                    extracted = self._extract_all()
+
+            if rebuild_as is None:
+                index = self._merge(removed, delta)
+                meta = dict(self._meta)
+            else:
+                print(f"Rebuilding FAISS index as {rebuild_as} over {len(docs)} documents...")
+                index = self._build(rebuild_as, docs, extracted)
+                meta = {"kind": index_kind(index), "trained_on": len(docs)}
+            meta["next_id"] = next_id
+            suffix = stage_snapshot(index, docs, meta)
+            del index
+
+            with self._write_lock, locked(WAL_PATH):
+                self._catch_up()
+                if self._snapshot_sig != snapshot_sig:
+                    return False  # another process compacted first
+                tail, _ = read_log(WAL_PATH, cut)
+                rewrite_log(WAL_PATH, tail)
+                install_snapshot(suffix)
+                suffix = None
+                self._load_locked()  # mmap the new snapshot, replay the carried-over tail
+            return True
+        except Exception as e:
+            print(f"FAISS compaction failed: {e}")
+            return False
+        finally:
+            if suffix is not None:
+                discard_snapshot(suffix)
+            self._compacting = False
+
+    def rebuild(self, kind: str | None = None) -> bool:
+        """Synchronously rebuild the index as `kind` (default: FAISS_INDEX_TYPE); False if a compaction is running."""
+        if not self._claim_compaction():
+            return False
+        return self._compact(kind or FAISS_INDEX_TYPE)
+
+    def maintain(self) -> str | None:
+        """Rebuild if a size/tombstone threshold was crossed; returns the new index type."""
+        self.reload()
+        rebuild_as = self._rebuild_target()
+        if rebuild_as is None or not self._claim_compaction():
+            return None
+        return rebuild_as if self._compact(rebuild_as) else None
+
+    def index_info(self) -> dict:
+        return {
+            "type": index_kind(self.index),
+            "vectors": int(self.index.ntotal + self.delta.ntotal),
+            "delta_vectors": int(self.delta.ntotal),
+            "documents": len(self.store.docs),
+            "tombstones": self._tombstones(),
+            "trained_on": self._meta.get("trained_on"),
+            "wal_records": self._wal_records,
+            "doc_memory": self.store.memory_stats(),
+        }
+
+    # ── writes ───────────────────────────────────────────────────
+
+    def add_document(self, text: str, metadata: dict | None = None) -> int:
+        return self.add_documents([text], [metadata])[0]
+
+    def add_documents(self, texts: list[str], metadatas: list[dict | None] | None = None) -> list[int]:
+        """Embed a batch with one encode call and append it to the WAL."""
+        if not texts:
+            return []
+        metadatas = metadatas or [None] * len(texts)
+        emb = EmbeddingModel.encode(texts)
+        faiss.normalize_L2(emb)
+        with self._write_lock, locked(WAL_PATH):
+            self._catch_up()  # ids must follow other writers' adds
+            doc_ids = [self.store.add(text, metadata) for text, metadata in zip(texts, metadatas)]
+            for doc_id, text, metadata in zip(doc_ids, texts, metadatas):
+                self._bitmaps.add(doc_id, metadata)
+                self._keys.add(doc_id, text, metadata)
+            self._add_vectors(emb, doc_ids)
+            self._log([
+                {"op": "add", "id": doc_id, "text": text, "metadata": metadata or {}, "vec": _encode_vector(vec)}
+                for doc_id, text, metadata, vec in zip(doc_ids, texts, metadatas, emb)
+            ])
+        self._maybe_compact()
+        return doc_ids
+
+    def update_metadata(self, issue_id, patch: dict) -> list[int]:
+        """
+        Merge `patch` into the metadata of the issue's documents. The text,
+        vector and id stay as they are; the WAL records the merged metadata.
+        """
+        with self._write_lock, locked(WAL_PATH):
+            self._catch_up()
+            docs = self.store.docs
+            records = [
+                {"op": "update", "id": doc_id, "metadata": {**(docs[doc_id].get("metadata") or {}), **patch}}
+                for doc_id in self._keys.issue_ids([issue_id])
+            ]
+            if not records:
+                return []
+            self._apply(records)
+            self._log(records)
+        self._maybe_compact()
+        return [r["id"] for r in records]
+
+    def _delete(self, doc_ids: list[int]) -> list[int]:
+        """Remove `doc_ids` with one WAL record. Caller holds the lock."""
+        if doc_ids:
+            self._remove(doc_ids)
+            self._log([{"op": "delete", "ids": doc_ids}])
+        return doc_ids
+
+    def delete_documents(self, *, issue_id=None, text=None, team_tag=None) -> list[int]:
+        """Documents of `issue_id`, plus those whose text (and team, if given) is exactly `text`."""
+        with self._write_lock, locked(WAL_PATH):
+            self._catch_up()
+            ids_to_delete = set(self._keys.issue_ids([issue_id])) if issue_id else set()
+            if text is not None:
+                ids_to_delete.update(self._keys.text_ids(text, team_tag))
+            deleted = self._delete(sorted(ids_to_delete))
+        if deleted:
+            self._maybe_compact()
+        return deleted
+
+    def delete_many(self, issue_ids) -> list[int]:
+        """Bulk delete every document of `issue_ids` (one WAL record)."""
+        with self._write_lock, locked(WAL_PATH):
+            self._catch_up()
+            deleted = self._delete(sorted(set(self._keys.issue_ids(issue_ids))))
+        if deleted:
+            self._maybe_compact()
+        return deleted
+
+    def drop_buckets_before(self, bucket: int) -> int:
+        """Delete every document in a time bucket older than `bucket`; returns the count."""
+        with self._write_lock, locked(WAL_PATH):
+            self._catch_up()
+            ids_to_delete = self._delete(self._bitmaps.ids_before(bucket))
+        if ids_to_delete:
+            self._maybe_compact()
+        return len(ids_to_delete)
+
+    # ── reads ────────────────────────────────────────────────────
+
+    def _search_vectors(self, q_emb, k: int, mask=None) -> tuple[np.ndarray, np.ndarray]:
+        """Search the snapshot and the delta (restricted to `mask`), merged best first."""
+        selector = MetadataBitmaps.selector(mask) if mask is not None else None
+        parts = []
+        for index in (self.index, self.delta):
+            if index.ntotal:
+                params = search_params(index, selector) if selector is not None else None
+                parts.append(index.search(q_emb, k, params=params))
+        if not parts:
+            return np.empty(0, "float32"), np.empty(0, "int64")
+        scores = np.concatenate([p[0][0] for p in parts])
+        ids = np.concatenate([p[1][0] for p in parts])
+        order = np.argsort(-scores, kind="stable")[:k]
+        return scores[order], ids[order]
+
+    def search(
+        self,
+        query: str,
+        k: int = 4,
+        team_tag: str | None = None,
+        status: str | None = None,
+        severity: str | None = None,
+        service: str | None = None,
+        min_bucket: int | None = None,
+    ) -> list[dict]:
+        self.reload()
+        q_emb = EmbeddingModel.encode([query])
+        faiss.normalize_L2(q_emb)
+        filters = {
+            field: value
+            for field, value in (("team_tag", team_tag), ("status", status), ("severity", severity), ("service", service))
+            if value
+        }
+        # Filters, time partitions and tombstones are applied inside FAISS via an id bitmap
+        if filters or min_bucket is not None or self._tombstones():
+            mask = self._bitmaps.mask(filters, min_bucket)
+        else:
+            mask = None
+        if mask is not None and not mask.any():
+            return []
+        scores, ids = self._search_vectors(q_emb, k, mask)
+
+        docs = self.store.docs
+        results = []
+        for s, i in zip(scores.tolist(), ids.tolist()):
+            doc = docs.get(i) if i != -1 else None
+            if doc is None:
+                continue
+            results.append({"id": i, "text": doc["text"], "score": s, "metadata": doc.get("metadata", {}) or {}})
+        return results
+
+    def vectors(self) -> tuple[np.ndarray, np.ndarray] | None:
+        """(ids, vectors) of live documents, or None if the index is lossy (IVF-PQ)."""
+        self.reload()
+        extracted = self._extract_all()
+        if extracted is None:
+            return None
+        ids, vecs = extracted
+        keep = np.fromiter((int(i) in self.store.docs for i in ids), dtype=bool, count=len(ids))
+        return ids[keep], np.ascontiguousarray(vecs[keep])
+
+    def scroll(
+        self,
+        limit: int = 256,
+        offset: int | None = None,
+        team_tag: str | None = None,
+        status: str | None = None,
+        severity: str | None = None,
+        min_ts: float | None = None,
+        max_ts: float | None = None,
+    ) -> tuple[dict, int | None]:
+        """
+        One page of {id: doc} in id order from id `offset`, plus the offset of
+        the next page (None at the end). Metadata filters are bitmap ANDs; the
+        time range [min_ts, max_ts) prunes by bucket, then checks each `ts`.
+        """
+        self.reload()
+        filters = {
+            field: value
+            for field, value in (("team_tag", team_tag), ("status", status), ("severity", severity))
+            if value
+        }
+        mask = self._bitmaps.mask(filters, time_bucket(min_ts) if min_ts is not None else None)
+        timed = min_ts is not None or max_ts is not None
+        docs = self.store.docs
+        page = {}
+        for doc_id in MetadataBitmaps.iter_ids(mask, offset or 0):
+            if len(page) == limit:
+                return page, doc_id
+            doc = docs.get(doc_id)
+            if doc is None:
+                continue
+            if timed:
+                ts = (doc.get("metadata") or {}).get("ts")
+                if ts is None or (min_ts is not None and ts < min_ts) or (max_ts is not None and ts >= max_ts):
+                    continue
+            page[doc_id] = doc
+        return page, None
+
+    def get_documents(self, ids) -> dict:
+        self.reload()
+        docs = self.store.docs
+        return {int(i): docs[int(i)] for i in ids if int(i) in docs}
+
+    def all_docs(self) -> dict:
+        self.reload()
+        return dict(self.store.docs)
+
+    def count(self) -> int:
+        return len(self.store.docs)
+
+    def reset(self):
+        with self._write_lock, locked(WAL_PATH):
+            save(empty_index(), {})
+            truncate_log(WAL_PATH)
+            self._load_locked()
@@ -0,0 +1,352 @@
+"""
+Metadata bitmaps for filtered FAISS search.
+
+One packed bitmap over document ids per (field, value), plus a bitmap of
+live documents. A query ANDs the bitmaps it needs and hands the result to
+FAISS as an `IDSelectorBitmap`, so filtering happens inside the search and
+a filtered query returns k matching hits without over-fetching.
+
+Time buckets are a derived field, so restricting a query to recent
+partitions is one more OR/AND over bitmaps.
+
+High-cardinality keys (issue ids, text hashes) get a reverse index of
+plain dicts instead, for deletes by issue or by text.
+"""
+
+import hashlib
+import json
+import threading
+
+import faiss
+import numpy as np
+
+from retrieval.recency import UNDATED_BUCKET, time_bucket, time_buckets
+
+FILTER_FIELDS = ("team_tag", "status", "severity", "service")
+TIME_FIELD = "time_bucket"
+
+
+def normalize(field: str, value) -> str | None:
+    """Same matching rules as retrieve_node's post-filter (missing status = OPEN)."""
+    if field == "status":
+        return str(value or "OPEN").upper()
+    if field == "severity":
+        return str(value).lower() if value else None
+    return str(value) if value else None
+
+
+def _value(field: str, metadata: dict):
+    """Bitmap key of a document for `field` (time buckets derive from `ts`)."""
+    if field == TIME_FIELD:
+        return time_bucket(metadata.get("ts"))
+    return normalize(field, metadata.get(field))
+
+
+def _pack(ids: np.ndarray, nbytes: int) -> np.ndarray:
+    bits = np.zeros(nbytes * 8, dtype=bool)
+    bits[ids] = True
+    return np.packbits(bits, bitorder="little")
+
+
+class MetadataBitmaps:
+    """
+    Built lazily (per field, on its first filtered query) from the document
+    columns, then kept current by `add` / `remove` as documents change.
+
+    `source_lock` is the lock writers hold while they change `docs` (the
+    backend's write lock); a build reads the documents under it, taken
+    before the bitmaps' own lock as writers do.
+    """
+
+    def __init__(self, docs, source_lock=None):
+        self._docs = docs
+        self._source_lock = source_lock or threading.RLock()
+        self._lock = threading.Lock()
+        self._nbytes = 0
+        self._live: np.ndarray | None = None
+        self._bits: dict[str, dict[str, np.ndarray]] = {}
+
+    # ── maintenance ──────────────────────────────────────────────
+
+    def _grow(self, doc_id: int):
+        need = doc_id // 8 + 1
+        if need <= self._nbytes:
+            return
+        size = max(need, self._nbytes * 2, 64)
+        pad = size - self._nbytes
+
+        def grown(bm):
+            return np.concatenate([bm, np.zeros(pad, dtype=np.uint8)])
+
+        if self._live is not None:
+            self._live = grown(self._live)
+        for values in self._bits.values():
+            for value in values:
+                values[value] = grown(values[value])
+        self._nbytes = size
+
+    def add(self, doc_id: int, metadata: dict | None):
+        with self._lock:
+            if self._live is None and not self._bits:
+                return  # nothing built yet; the first query builds from the docs
+            self._grow(doc_id)
+            byte, bit = doc_id >> 3, np.uint8(1 << (doc_id & 7))
+            if self._live is not None:
+                self._live[byte] |= bit
+            metadata = metadata or {}
+            for field, values in self._bits.items():
+                for bm in values.values():
+                    bm[byte] &= ~bit
+                value = _value(field, metadata)
+                if value is not None:
+                    bm = values.get(value)
+                    if bm is None:
+                        bm = values[value] = np.zeros(self._nbytes, dtype=np.uint8)
+                    bm[byte] |= bit
+
+    def remove(self, doc_id: int):
+        with self._lock:
+            if doc_id >= self._nbytes * 8:
+                return
+            byte, bit = doc_id >> 3, np.uint8(1 << (doc_id & 7))
+            if self._live is not None:
+                self._live[byte] &= ~bit
+            for values in self._bits.values():
+                for bm in values.values():
+                    bm[byte] &= ~bit
+
+    # ── lazy build ───────────────────────────────────────────────
+
+    def _base_live(self, base_ids: np.ndarray) -> np.ndarray | None:
+        """Mask over `base_ids` of the ones not removed (None when nothing is)."""
+        if not self._docs.removed:
+            return None
+        removed = np.fromiter(self._docs.removed, dtype=np.int64, count=len(self._docs.removed))
+        return ~np.isin(base_ids, removed)
+
+    def _doc_ids(self) -> tuple[np.ndarray, np.ndarray]:
+        """(live base ids, overlay ids) without decoding any document."""
+        base = self._docs.base
+        if hasattr(base, "ids"):
+            base_ids = np.asarray(base.ids, dtype=np.int64)
+        else:
+            base_ids = np.fromiter(base.keys(), dtype=np.int64, count=len(base))
+        live = self._base_live(base_ids)
+        if live is not None:
+            base_ids = base_ids[live]
+        overlay = self._docs.overlay
+        return base_ids, np.fromiter(overlay.keys(), dtype=np.int64, count=len(overlay))
+
+    def _ensure_live(self):
+        if self._live is not None:
+            return
+        base_ids, overlay_ids = self._doc_ids()
+        all_ids = np.concatenate([base_ids, overlay_ids])
+        self._grow(int(all_ids.max()) if len(all_ids) else 0)
+        self._live = _pack(all_ids, self._nbytes)
+
+    def _ensure_field(self, field: str):
+        if field in self._bits:
+            return
+        groups: dict[str, list] = {}
+        base = self._docs.base
+        base_ids, overlay_ids = self._doc_ids()
+        columnar = hasattr(base, "ids")
+        if columnar:
+            # The column fast paths walk every snapshot row; drop removed ones
+            # so no id beyond the live range is packed
+            all_ids = np.asarray(base.ids, dtype=np.int64)
+            live = self._base_live(all_ids)
+        if columnar and field == TIME_FIELD and hasattr(base, "numbers") and "ts" in base.numbers:
+            buckets = time_buckets(np.asarray(base.numbers["ts"]))
+            if live is not None:
+                all_ids, buckets = all_ids[live], buckets[live]
+            for bucket in np.unique(buckets).tolist():
+                groups[bucket] = [all_ids[buckets == bucket]]
+        elif columnar and hasattr(base, "codes") and field in base.codes:
+            # Columnar snapshot: group ids by dictionary code, no per-document work
+            codes = np.asarray(base.codes[field])
+            if live is not None:
+                all_ids, codes = all_ids[live], codes[live]
+            vocab = base.vocab[field].values
+            for code in np.unique(codes).tolist():
+                value = normalize(field, vocab[code])
+                if value is not None:
+                    groups.setdefault(value, []).append(all_ids[codes == code])
+        else:
+            slow: dict[str, list[int]] = {}
+            for doc_id in base_ids.tolist():
+                value = _value(field, self._docs.columns(doc_id)[1])
+                if value is not None:
+                    slow.setdefault(value, []).append(doc_id)
+            for value, ids in slow.items():
+                groups.setdefault(value, []).append(np.array(ids, dtype=np.int64))
+        if len(overlay_ids):
+            self._grow(int(overlay_ids.max()))
+        if len(base_ids):
+            self._grow(int(base_ids.max()))
+
+        values = {value: _pack(np.concatenate(parts), self._nbytes) for value, parts in groups.items()}
+        self._bits[field] = values
+        # Overlay records shadow any base record with the same id
+        metadata_of = self._docs.overlay.columns
+        for doc_id in overlay_ids.tolist():
+            byte, bit = doc_id >> 3, np.uint8(1 << (doc_id & 7))
+            for bm in values.values():
+                bm[byte] &= ~bit
+            value = _value(field, metadata_of(doc_id)[1])
+            if value is not None:
+                bm = values.get(value)
+                if bm is None:
+                    bm = values[value] = np.zeros(self._nbytes, dtype=np.uint8)
+                bm[byte] |= bit
+
+    # ── queries ──────────────────────────────────────────────────
+
+    def _built(self, fields) -> bool:
+        return self._live is not None and all(field in self._bits for field in fields)
+
+    def mask(self, filters: dict, min_bucket: int | None = None) -> np.ndarray:
+        """
+        Packed bitmap of live documents matching every `field: value` filter,
+        and dated in `min_bucket` or later (undated documents always pass).
+        """
+        fields = [*filters, *([TIME_FIELD] if min_bucket is not None else [])]
+        with self._lock:
+            if self._built(fields):
+                return self._mask(filters, min_bucket)
+        # Something to build from the documents: keep writers out meanwhile
+        with self._source_lock, self._lock:
+            return self._mask(filters, min_bucket)
+
+    def _mask(self, filters: dict, min_bucket: int | None) -> np.ndarray:
+        """`mask` body; caller holds the lock (and the source lock if anything is unbuilt)."""
+        self._ensure_live()
+        mask = self._live.copy()
+        for field, value in filters.items():
+            self._ensure_field(field)
+            bm = self._bits[field].get(normalize(field, value))
+            if bm is None:
+                return np.zeros_like(mask)
+            mask &= bm
+        if min_bucket is not None:
+            self._ensure_field(TIME_FIELD)
+            recent = np.zeros_like(mask)
+            for bucket, bm in self._bits[TIME_FIELD].items():
+                if bucket >= min_bucket or bucket == UNDATED_BUCKET:
+                    recent |= bm
+            mask &= recent
+        return mask
+
+    def ids_before(self, bucket: int) -> list[int]:
+        """Ids of live documents dated before `bucket` (whole old partitions)."""
+        with self._source_lock, self._lock:
+            self._ensure_live()
+            self._ensure_field(TIME_FIELD)
+            old = np.zeros(self._nbytes, dtype=np.uint8)
+            for b, bm in self._bits[TIME_FIELD].items():
+                if UNDATED_BUCKET != b < bucket:
+                    old |= bm
+            old &= self._live
+            return np.flatnonzero(np.unpackbits(old, bitorder="little")).tolist()
+
+    @staticmethod
+    def iter_ids(mask: np.ndarray, start: int = 0, chunk: int = 1 << 16):
+        """Ids set in a packed mask, ascending from `start`, unpacking `chunk` bytes at a time."""
+        byte = start >> 3
+        while byte < len(mask):
+            bits = np.unpackbits(mask[byte:byte + chunk], bitorder="little")
+            for i in np.flatnonzero(bits).tolist():
+                doc_id = (byte << 3) + i
+                if doc_id >= start:
+                    yield doc_id
+            byte += chunk
+
+    @staticmethod
+    def selector(mask: np.ndarray):
+        """IDSelector over a packed mask; keep `mask` alive while it is in use."""
+        return faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(mask))
+
+
+def _text_key(text: bytes) -> int:
+    """64 bits of the text's SHA-1 (collisions are ruled out by comparing the text)."""
+    return int.from_bytes(hashlib.sha1(text).digest()[:8], "little")
+
+
+class KeyIndex:
+    """
+    issue_id -> ids and text hash -> ids, so deletes by issue or by exact text
+    are lookups rather than a walk over every document. Built on first use
+    from the document columns, then kept current by `add` / `remove`.
+    """
+
+    def __init__(self, docs):
+        self._docs = docs
+        self._lock = threading.Lock()
+        self._keys: dict[int, tuple[str | None, int]] | None = None
+        self._by_issue: dict[str, set[int]] = {}
+        self._by_text: dict[int, set[int]] = {}
+
+    def _insert(self, doc_id: int, issue_id, text_key: int):
+        self._keys[doc_id] = (issue_id, text_key)
+        if issue_id is not None:
+            self._by_issue.setdefault(issue_id, set()).add(doc_id)
+        self._by_text.setdefault(text_key, set()).add(doc_id)
+
+    def _discard(self, doc_id: int):
+        entry = self._keys.pop(doc_id, None)
+        if entry is None:
+            return
+        issue_id, text_key = entry
+        for index, key in ((self._by_issue, issue_id), (self._by_text, text_key)):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del index[key]
+
+    def add(self, doc_id: int, text: str, metadata: dict | None):
+        with self._lock:
+            if self._keys is None:
+                return  # nothing built yet; the first lookup builds from the docs
+            self._discard(doc_id)
+            self._insert(doc_id, (metadata or {}).get("issue_id"), _text_key(text.encode("utf-8")))
+
+    def remove(self, doc_id: int):
+        with self._lock:
+            if self._keys is not None:
+                self._discard(doc_id)
+
+    def _ensure(self):
+        if self._keys is not None:
+            return
+        self._keys = {}
+        for doc_id in self._docs:
+            text, cats, extra = self._docs.columns(doc_id)
+            # issue_id lives in the extra-metadata JSON; skip the parse when it cannot be there
+            issue_id = json.loads(extra).get("issue_id") if b'"issue_id"' in extra else None
+            self._insert(doc_id, issue_id, _text_key(text))
+
+    def issue_ids(self, issue_ids) -> list[int]:
+        """Ids of every document belonging to any of `issue_ids`."""
+        with self._lock:
+            self._ensure()
+            out = []
+            for issue_id in issue_ids:
+                out.extend(self._by_issue.get(issue_id, ()))
+            return out
+
+    def text_ids(self, text: str, team_tag: str | None = None) -> list[int]:
+        """Ids of documents whose text is exactly `text` (and team is `team_tag`, if given)."""
+        with self._lock:
+            self._ensure()
+            candidates = list(self._by_text.get(_text_key(text.encode("utf-8")), ()))
+        out = []
+        for doc_id in candidates:
+            doc = self._docs.get(doc_id)
+            if doc is None or doc["text"] != text:
+                continue
+            if team_tag is not None and (doc.get("metadata") or {}).get("team_tag") != team_tag:
+                continue
+            out.append(doc_id)
+        return out
@@ -0,0 +1,147 @@
+"""
+FAISS index construction for the FAISS backend.
+
+Index types (FAISS_INDEX_TYPE): "flat" (exact), "hnsw", "ivf_flat", "ivf_pq".
+All use inner product over L2-normalized vectors, i.e. cosine similarity.
+"""
+
+import math
+
+import faiss
+import numpy as np
+
+from config import (
+    EMBEDDING_DIM,
+    FAISS_EF_SEARCH,
+    FAISS_HNSW_EF_CONSTRUCTION,
+    FAISS_HNSW_M,
+    FAISS_IVF_NLIST,
+    FAISS_NPROBE,
+    FAISS_PQ_M,
+)
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+_PQ_NBITS = 8
+_TRAIN_POINTS_PER_LIST = 64
+
+
+def empty_index(dim: int = EMBEDDING_DIM):
+    """Exact index; used until the corpus is large enough to train an ANN index."""
+    return faiss.IndexIDMap(faiss.IndexFlatIP(dim))
+
+
+def index_kind(index) -> str:
+    if isinstance(index, faiss.IndexIDMap):
+        inner = faiss.downcast_index(index.index)
+        return "hnsw" if isinstance(inner, faiss.IndexHNSW) else "flat"
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    return "flat"
+
+
+def _nlist_for(n: int) -> int:
+    if FAISS_IVF_NLIST:
+        return max(1, min(FAISS_IVF_NLIST, n))
+    # ~4·sqrt(n) lists, with enough training points per list for k-means
+    return max(1, min(int(4 * math.sqrt(n)), n // 39 or 1))
+
+
+def _pq_m(dim: int) -> int:
+    m = min(FAISS_PQ_M, dim)
+    while dim % m:
+        m -= 1
+    return m
+
+
+def build_index(kind: str, vectors: np.ndarray, ids: np.ndarray):
+    """Build (and train, for IVF) an index of `kind` over normalized vectors."""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Unknown FAISS index type {kind!r}; expected one of {INDEX_TYPES}")
+    n, dim = vectors.shape if len(vectors) else (0, EMBEDDING_DIM)
+    if kind == "ivf_pq" and n < 2 ** _PQ_NBITS:
+        kind = "ivf_flat"  # PQ codebooks need at least 256 training points
+    if kind.startswith("ivf") and n == 0:
+        kind = "flat"
+
+    if kind == "flat":
+        index = empty_index(dim)
+    elif kind == "hnsw":
+        hnsw = faiss.IndexHNSWFlat(dim, FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efConstruction = FAISS_HNSW_EF_CONSTRUCTION
+        index = faiss.IndexIDMap(hnsw)
+    else:
+        nlist = _nlist_for(n)
+        quantizer = faiss.IndexFlatIP(dim)
+        if kind == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_INNER_PRODUCT)
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dim, nlist, _pq_m(dim), _PQ_NBITS, faiss.METRIC_INNER_PRODUCT)
+        sample = vectors
+        max_train = max(nlist * _TRAIN_POINTS_PER_LIST, 2 ** _PQ_NBITS * 39)
+        if n > max_train:
+            sample = vectors[np.random.default_rng(0).choice(n, max_train, replace=False)]
+        index.train(sample)
+
+    if n:
+        index.add_with_ids(vectors, ids.astype("int64"))
+    set_search_params(index)
+    return index
+
+
+def set_search_params(index, nprobe: int | None = None, ef_search: int | None = None):
+    """Apply query-time knobs (defaults: FAISS_NPROBE / FAISS_EF_SEARCH)."""
+    kind = index_kind(index)
+    if kind.startswith("ivf"):
+        faiss.extract_index_ivf(index).nprobe = nprobe or FAISS_NPROBE
+    elif kind == "hnsw":
+        faiss.downcast_index(index.index).hnsw.efSearch = ef_search or FAISS_EF_SEARCH
+
+
+def search_params(index, selector):
+    """SearchParameters carrying `selector`, keeping the index's nprobe/efSearch."""
+    kind = index_kind(index)
+    if kind.startswith("ivf"):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=faiss.extract_index_ivf(index).nprobe)
+    if kind == "hnsw":
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=faiss.downcast_index(index.index).hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def remove_vectors(index, ids) -> bool:
+    """Remove ids from the index; False if the index type cannot delete (HNSW)."""
+    try:
+        index.remove_ids(np.asarray(ids, dtype="int64"))
+        return True
+    except RuntimeError:
+        return False  # left as a tombstone until the next rebuild
+
+
+def extract_vectors(index) -> tuple[np.ndarray, np.ndarray] | None:
+    """
+    (ids, vectors) for indexes that keep exact vectors (flat, HNSW, IVF-Flat).
+    None for lossy indexes (IVF-PQ), whose documents must be re-embedded.
+    """
+    kind = index_kind(index)
+    if kind in ("flat", "hnsw"):
+        inner = faiss.downcast_index(index.index)
+        ids = faiss.vector_to_array(index.id_map).astype("int64")
+        vectors = inner.reconstruct_n(0, inner.ntotal) if inner.ntotal else np.empty((0, inner.d), "float32")
+        return ids, vectors
+    if kind == "ivf_flat":
+        ivf = faiss.extract_index_ivf(index)
+        invlists = ivf.invlists
+        all_ids, all_vecs = [], []
+        for list_no in range(ivf.nlist):
+            size = invlists.list_size(list_no)
+            if not size:
+                continue
+            all_ids.append(faiss.rev_swig_ptr(invlists.get_ids(list_no), size).copy())
+            codes = faiss.rev_swig_ptr(invlists.get_codes(list_no), size * ivf.code_size)
+            all_vecs.append(np.frombuffer(codes.tobytes(), dtype="float32").reshape(size, ivf.d))
+        if not all_ids:
+            return np.empty(0, "int64"), np.empty((0, ivf.d), "float32")
+        return np.concatenate(all_ids).astype("int64"), np.vstack(all_vecs)
+    return None
@@ -1,181 +1,576 @@
-"""Qdrant vector backend — default production store."""
-
-from qdrant_client import QdrantClient
-from qdrant_client.models import (
-    Distance,
-    FieldCondition,
-    Filter,
-    MatchValue,
-    PayloadSchemaType,
-    PointStruct,
-    VectorParams,
-)
-
-from config import EMBEDDING_DIM, QDRANT_COLLECTION, QDRANT_HOST, QDRANT_PORT
-from core.embeddings import EmbeddingModel
-
-# Payload fields used for metadata filtering
-INDEXED_PAYLOAD_FIELDS = ("team_tag", "issue_id", "status", "severity", "service")
-
-
-class QdrantBackend:
-    def __init__(self):
-        self.client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT, check_compatibility=False)
-        self.collection = QDRANT_COLLECTION
-        self._ensure_collection()
-        self._doc_counter = self._max_id() + 1
-
-    def _ensure_collection(self):
-        collections = [c.name for c in self.client.get_collections().collections]
-        if self.collection not in collections:
-            self.client.create_collection(
-                collection_name=self.collection,
-                vectors_config=VectorParams(size=EMBEDDING_DIM, distance=Distance.COSINE),
-            )
-        self._ensure_payload_indexes()
-
-    def _ensure_payload_indexes(self):
-        for field in INDEXED_PAYLOAD_FIELDS:
-            try:
-                self.client.create_payload_index(
-                    collection_name=self.collection,
-                    field_name=field,
-                    field_schema=PayloadSchemaType.KEYWORD,
-                )
-            except Exception:
-                pass  # index may already exist
-
-    def _max_id(self) -> int:
-        try:
-            max_id = -1
-            offset = None
-            while True:
-                points, offset = self.client.scroll(
-                    collection_name=self.collection,
-                    limit=256,
-                    offset=offset,
-                    with_vectors=False,
-                    with_payload=False,
-                )
-                for p in points:
-                    if str(p.id).isdigit():
-                        max_id = max(max_id, int(p.id))
-                if offset is None:
-                    break
-            return max_id
-        except Exception:
-            return -1
-
-    def add_document(self, text: str, metadata: dict | None = None) -> int:
-        doc_id = self._doc_counter
-        self._doc_counter += 1
-        emb = EmbeddingModel.encode([text])[0].tolist()
-        payload = {"text": text, **(metadata or {})}
-        self.client.upsert(
-            collection_name=self.collection,
-            points=[PointStruct(id=doc_id, vector=emb, payload=payload)],
-        )
-        return doc_id
-
-    def delete_documents(self, *, issue_id=None, text=None, team_tag=None) -> int:
-        ids_to_delete = []
-
-        if issue_id:
-            points, _ = self.client.scroll(
-                collection_name=self.collection,
-                scroll_filter=Filter(
-                    must=[FieldCondition(key="issue_id", match=MatchValue(value=issue_id))]
-                ),
-                limit=100,
-                with_vectors=False,
-            )
-            ids_to_delete.extend(p.id for p in points)
-
-        if not ids_to_delete and text:
-            points, _ = self.client.scroll(
-                collection_name=self.collection,
-                limit=10000,
-                with_vectors=False,
-            )
-            for p in points:
-                payload = p.payload or {}
-                if payload.get("text") != text:
-                    continue
-                if team_tag and payload.get("team_tag") != team_tag:
-                    continue
-                ids_to_delete.append(p.id)
-
-        if not ids_to_delete:
-            return 0
-
-        self.client.delete(collection_name=self.collection, points_selector=ids_to_delete)
-        return len(ids_to_delete)
-
-    def search(
-        self,
-        query: str,
-        k: int = 4,
-        team_tag: str | None = None,
-        status: str | None = None,
-        severity: str | None = None,
-    ) -> list[dict]:
-        emb = EmbeddingModel.encode([query])[0].tolist()
-
-        must = []
-        if team_tag:
-            must.append(FieldCondition(key="team_tag", match=MatchValue(value=team_tag)))
-        if status:
-            must.append(FieldCondition(key="status", match=MatchValue(value=status.upper())))
-        if severity:
-            must.append(FieldCondition(key="severity", match=MatchValue(value=severity.lower())))
-
-        query_filter = Filter(must=must) if must else None
-
-        results = self.client.query_points(
-            collection_name=self.collection,
-            query=emb,
-            limit=k,
-            query_filter=query_filter,
-        )
-        return [
-            {
-                "text": r.payload.get("text", ""),
-                "score": float(r.score),
-                "metadata": {key: val for key, val in r.payload.items() if key != "text"},
-            }
-            for r in results.points
-        ]
-
-    def all_docs(self) -> dict:
-        docs = {}
-        offset = None
-        while True:
-            points, offset = self.client.scroll(
-                collection_name=self.collection,
-                limit=256,
-                offset=offset,
-                with_vectors=False,
-            )
-            for p in points:
-                payload = dict(p.payload or {})
-                text = payload.pop("text", "")
-                docs[int(p.id)] = {"text": text, "metadata": payload}
-            if offset is None:
-                break
-        return docs
-
-    def count(self) -> int:
-        info = self.client.get_collection(self.collection)
-        return info.points_count
-
-    def reset(self):
-        """Delete and recreate the collection."""
-        try:
-            self.client.delete_collection(self.collection)
-        except Exception:
-            pass
-        self._ensure_collection()
-        self._doc_counter = 0
-
-    def reload(self):
-        pass  # Qdrant is shared; no disk reload needed
+"""Qdrant vector backend — default production store."""
+
+import hashlib
+import os
+import threading
+import time
+
+from qdrant_client import AsyncQdrantClient, QdrantClient
+from qdrant_client.models import (
+    Distance,
+    FieldCondition,
+    Filter,
+    FilterSelector,
+    IsEmptyCondition,
+    MatchAny,
+    MatchValue,
+    PayloadField,
+    PayloadSchemaType,
+    PointStruct,
+    Range,
+    VectorParams,
+)
+
+from config import (
+    EMBEDDING_DIM,
+    QDRANT_COLLECTION,
+    QDRANT_HOST,
+    QDRANT_ID_NODE,
+    QDRANT_LOCATION,
+    QDRANT_POOL_SIZE,
+    QDRANT_PORT,
+    QDRANT_PREFER_GRPC,
+    QDRANT_TIMEOUT,
+)
+from core.embeddings import EmbeddingModel
+from core.persistence import DATA_DIR, lease_slot
+from retrieval.recency import bucket_start
+
+# Payload fields used for metadata filtering (text_sha1: deletes by exact text)
+INDEXED_PAYLOAD_FIELDS = ("team_tag", "issue_id", "status", "severity", "service", "text_sha1")
+# Written at ingest next to `text`; internal, so not returned as metadata
+HASH_PAYLOAD_FIELD = "text_sha1"
+# Issue ids per delete request in bulk deletes (and point ids per payload rewrite)
+DELETE_BATCH = 1000
+# Epoch-seconds timestamp; time partitions are ranges over it
+TIME_PAYLOAD_FIELD = "ts"
+# Custom epoch for point ids (2024-01-01 UTC, in ms)
+ID_EPOCH_MS = 1_704_067_200_000
+ID_NODE_BITS = 10
+# Lock files backing the per-process node leases
+ID_NODE_LEASE_DIR = os.path.join(DATA_DIR, "point_id_nodes")
+
+
+def _make_client(client_cls=QdrantClient):
+    if QDRANT_LOCATION == ":memory:":
+        return client_cls(location=":memory:")
+    if QDRANT_LOCATION:
+        return client_cls(path=QDRANT_LOCATION)
+    return client_cls(
+        host=QDRANT_HOST,
+        port=QDRANT_PORT,
+        prefer_grpc=QDRANT_PREFER_GRPC,
+        timeout=QDRANT_TIMEOUT,
+        pool_size=QDRANT_POOL_SIZE,
+        check_compatibility=False,
+    )
+
+
+def _normalized(metadata: dict, partial: bool = False) -> dict:
+    """
+    Payload with status upper-cased (missing = OPEN) and severity lower-cased,
+    the forms `_search_filter` matches exactly. `partial` (set_payload
+    patches) leaves fields the patch does not carry alone.
+    """
+    metadata = dict(metadata)
+    if "status" in metadata or not partial:
+        metadata["status"] = str(metadata.get("status") or "OPEN").upper()
+    if metadata.get("severity"):
+        metadata["severity"] = str(metadata["severity"]).lower()
+    return metadata
+
+
+def _search_filter(team_tag=None, status=None, severity=None, service=None, min_bucket=None) -> Filter | None:
+    must = []
+    if team_tag:
+        must.append(FieldCondition(key="team_tag", match=MatchValue(value=team_tag)))
+    if status:
+        status_match = FieldCondition(key="status", match=MatchValue(value=status.upper()))
+        if status.upper() == "OPEN":
+            # Points written before payloads were normalized may lack a status
+            status_match = Filter(should=[status_match, IsEmptyCondition(is_empty=PayloadField(key="status"))])
+        must.append(status_match)
+    if severity:
+        must.append(FieldCondition(key="severity", match=MatchValue(value=severity.lower())))
+    if service:
+        must.append(FieldCondition(key="service", match=MatchValue(value=service)))
+    if min_bucket is not None:
+        # Recent partitions, plus undated points (always searched)
+        must.append(Filter(should=[
+            FieldCondition(key=TIME_PAYLOAD_FIELD, range=Range(gte=bucket_start(min_bucket))),
+            IsEmptyCondition(is_empty=PayloadField(key=TIME_PAYLOAD_FIELD)),
+        ]))
+    return Filter(must=must) if must else None
+
+
+def _scroll_filter(team_tag=None, status=None, severity=None, min_ts=None, max_ts=None) -> Filter | None:
+    """`_search_filter` fields plus an exact [min_ts, max_ts) range (undated points excluded)."""
+    base = _search_filter(team_tag, status, severity)
+    must = list(base.must) if base else []
+    if min_ts is not None or max_ts is not None:
+        must.append(FieldCondition(key=TIME_PAYLOAD_FIELD, range=Range(gte=min_ts, lt=max_ts)))
+    return Filter(must=must) if must else None
+
+
+def _issue_filter(issue_id) -> Filter:
+    return Filter(must=[FieldCondition(key="issue_id", match=MatchValue(value=issue_id))])
+
+
+def _issues_filter(issue_ids: list) -> Filter:
+    return Filter(must=[FieldCondition(key="issue_id", match=MatchAny(any=issue_ids))])
+
+
+def text_sha1(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _text_filter(text: str, team_tag=None) -> Filter:
+    must = [FieldCondition(key=HASH_PAYLOAD_FIELD, match=MatchValue(value=text_sha1(text)))]
+    if team_tag:
+        must.append(FieldCondition(key="team_tag", match=MatchValue(value=team_tag)))
+    return Filter(must=must)
+
+
+def _unhashed_filter(team_tag=None) -> Filter:
+    """Points ingested before text_sha1 existed (optionally one team's)."""
+    must = [IsEmptyCondition(is_empty=PayloadField(key=HASH_PAYLOAD_FIELD))]
+    if team_tag:
+        must.append(FieldCondition(key="team_tag", match=MatchValue(value=team_tag)))
+    return Filter(must=must)
+
+
+def _point_ids(points) -> list[int]:
+    return [int(p.id) for p in points]
+
+
+def _text_matches(points, text, team_tag) -> list:
+    """Ids whose payload text (and team, if given) match exactly."""
+    ids = []
+    for p in points:
+        payload = p.payload or {}
+        if payload.get("text") != text:
+            continue
+        if team_tag and payload.get("team_tag") != team_tag:
+            continue
+        ids.append(p.id)
+    return ids
+
+
+def _points(doc_ids, embs, texts, metadatas) -> list[PointStruct]:
+    return [
+        PointStruct(
+            id=doc_id,
+            vector=emb.tolist(),
+            payload={"text": text, HASH_PAYLOAD_FIELD: text_sha1(text), **_normalized(metadata or {})},
+        )
+        for doc_id, emb, text, metadata in zip(doc_ids, embs, texts, metadatas)
+    ]
+
+
+def _hits(points) -> list[dict]:
+    return [
+        {
+            "id": int(r.id),
+            "text": r.payload.get("text", ""),
+            "score": float(r.score),
+            "metadata": {key: val for key, val in r.payload.items() if key not in ("text", HASH_PAYLOAD_FIELD)},
+        }
+        for r in points
+    ]
+
+
+def _docs(points) -> dict:
+    docs = {}
+    for p in points:
+        payload = dict(p.payload or {})
+        text = payload.pop("text", "")
+        payload.pop(HASH_PAYLOAD_FIELD, None)
+        docs[int(p.id)] = {"text": text, "metadata": payload}
+    return docs
+
+
+class PointIds:
+    """
+    Time-ordered point ids without reading the collection:
+    41 bits of milliseconds | 10-bit node | 12-bit sequence.
+
+    The node keeps concurrent writers (API workers, the Kafka consumer)
+    apart and is unique by construction: QDRANT_ID_NODE when set, otherwise
+    a slot leased with an exclusive lock under data/, held for the life of
+    the process (a forked child leases its own). Within a process the clock
+    never runs backwards and a sequence overflow borrows the next millisecond.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._node: int | None = None
+        self._lease = None
+        self._pid = None
+        self._last_ms = 0
+        self._seq = 0
+
+    def _ensure_node(self):
+        if self._pid == os.getpid():
+            return
+        if QDRANT_ID_NODE:
+            node = int(QDRANT_ID_NODE)
+            if not 0 <= node < 1 << ID_NODE_BITS:
+                raise ValueError(f"QDRANT_ID_NODE must be in [0, {(1 << ID_NODE_BITS) - 1}], got {node}")
+        else:
+            node, self._lease = lease_slot(ID_NODE_LEASE_DIR, 1 << ID_NODE_BITS)
+        self._node, self._pid = node, os.getpid()
+        self._last_ms = self._seq = 0
+
+    def allocate(self, n: int) -> list[int]:
+        ids = []
+        with self._lock:
+            self._ensure_node()
+            now = int(time.time() * 1000) - ID_EPOCH_MS
+            for _ in range(n):
+                if now > self._last_ms:
+                    self._last_ms, self._seq = now, 0
+                elif self._seq == 0xFFF:
+                    self._last_ms, self._seq = self._last_ms + 1, 0
+                else:
+                    self._seq += 1
+                ids.append((self._last_ms << 22) | (self._node << 12) | self._seq)
+        return ids
+
+
+class QdrantBackend:
+    def __init__(self):
+        self.client = _make_client()
+        self.collection = QDRANT_COLLECTION
+        self._ids = PointIds()
+        self._ensure_collection()
+
+    def _ensure_collection(self):
+        if not self.client.collection_exists(self.collection):
+            self.client.create_collection(
+                collection_name=self.collection,
+                vectors_config=VectorParams(size=EMBEDDING_DIM, distance=Distance.COSINE),
+            )
+        self._ensure_payload_indexes()
+
+    def _ensure_payload_indexes(self):
+        """Create only the payload indexes the collection is missing."""
+        existing = self.client.get_collection(self.collection).payload_schema or {}
+        wanted = {field: PayloadSchemaType.KEYWORD for field in INDEXED_PAYLOAD_FIELDS}
+        wanted[TIME_PAYLOAD_FIELD] = PayloadSchemaType.FLOAT
+        for field, schema in wanted.items():
+            if field in existing:
+                continue
+            try:
+                self.client.create_payload_index(
+                    collection_name=self.collection,
+                    field_name=field,
+                    field_schema=schema,
+                )
+            except Exception:
+                pass  # created concurrently by another process
+
+    def health(self) -> dict:
+        start = time.perf_counter()
+        try:
+            self.client.get_collection(self.collection)
+        except Exception as e:
+            return {"ok": False, "error": str(e)}
+        return {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+    def add_document(self, text: str, metadata: dict | None = None) -> int:
+        return self.add_documents([text], [metadata])[0]
+
+    def add_documents(self, texts: list[str], metadatas: list[dict | None] | None = None) -> list[int]:
+        """Embed a batch in one encode call and upsert it in one request."""
+        if not texts:
+            return []
+        metadatas = metadatas or [None] * len(texts)
+        doc_ids = self._ids.allocate(len(texts))
+        embs = EmbeddingModel.encode(texts)
+        self.client.upsert(collection_name=self.collection, points=_points(doc_ids, embs, texts, metadatas))
+        return doc_ids
+
+    def update_metadata(self, issue_id, patch: dict) -> list[int]:
+        """Merge `patch` into the payload of the issue's points (set_payload); vectors and ids stay."""
+        ids = self._scroll_ids(_issue_filter(issue_id))
+        if ids:
+            self.client.set_payload(collection_name=self.collection, payload=_normalized(patch, partial=True), points=ids)
+        return ids
+
+    def _scroll_ids(self, scroll_filter: Filter) -> list[int]:
+        """Every matching point id, page by page over the payload index."""
+        ids, offset = [], None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection,
+                scroll_filter=scroll_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            ids.extend(_point_ids(points))
+            if offset is None:
+                return ids
+
+    def _unhashed_text_ids(self, text, team_tag) -> list[int]:
+        """Exact-text matches among points that predate text_sha1 (none once re-ingested)."""
+        ids, offset = [], None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection,
+                scroll_filter=_unhashed_filter(team_tag),
+                limit=1000,
+                offset=offset,
+                with_vectors=False,
+            )
+            ids.extend(_text_matches(points, text, team_tag))
+            if offset is None:
+                return ids
+
+    def delete_documents(self, *, issue_id=None, text=None, team_tag=None) -> list[int]:
+        """The issue's points; failing that, points whose text (and team) match `text` exactly."""
+        ids_to_delete = self._scroll_ids(_issue_filter(issue_id)) if issue_id else []
+        if not ids_to_delete and text:
+            ids_to_delete = self._scroll_ids(_text_filter(text, team_tag)) or self._unhashed_text_ids(text, team_tag)
+        if ids_to_delete:
+            self.client.delete(collection_name=self.collection, points_selector=ids_to_delete)
+        return ids_to_delete
+
+    def delete_many(self, issue_ids) -> list[int]:
+        """Bulk delete every point of `issue_ids`, DELETE_BATCH issues per request."""
+        issue_ids = list(issue_ids)
+        deleted = []
+        for i in range(0, len(issue_ids), DELETE_BATCH):
+            ids = self._scroll_ids(_issues_filter(issue_ids[i:i + DELETE_BATCH]))
+            if ids:
+                self.client.delete(collection_name=self.collection, points_selector=ids)
+                deleted.extend(ids)
+        return deleted
+
+    def drop_buckets_before(self, bucket: int) -> int:
+        """Delete every dated point older than the start of `bucket`; returns the count."""
+        old = Filter(must=[FieldCondition(key=TIME_PAYLOAD_FIELD, range=Range(lt=bucket_start(bucket)))])
+        dropped = self.client.count(collection_name=self.collection, count_filter=old, exact=True).count
+        if dropped:
+            self.client.delete(collection_name=self.collection, points_selector=FilterSelector(filter=old))
+        return dropped
+
+    def search(
+        self,
+        query: str,
+        k: int = 4,
+        team_tag: str | None = None,
+        status: str | None = None,
+        severity: str | None = None,
+        service: str | None = None,
+        min_bucket: int | None = None,
+    ) -> list[dict]:
+        emb = EmbeddingModel.encode([query])[0].tolist()
+        results = self.client.query_points(
+            collection_name=self.collection,
+            query=emb,
+            limit=k,
+            query_filter=_search_filter(team_tag, status, severity, service, min_bucket),
+        )
+        return _hits(results.points)
+
+    def get_documents(self, ids) -> dict:
+        """Fetch text + metadata for specific point ids."""
+        if not ids:
+            return {}
+        points = self.client.retrieve(
+            collection_name=self.collection,
+            ids=[int(i) for i in ids],
+            with_payload=True,
+            with_vectors=False,
+        )
+        return _docs(points)
+
+    def scroll(self, limit: int = 256, offset=None, **filters) -> tuple[dict, object]:
+        """One page of {id: doc} in id order, filtered in Qdrant (see `_scroll_filter`), plus the next offset."""
+        points, next_offset = self.client.scroll(
+            collection_name=self.collection,
+            scroll_filter=_scroll_filter(**filters),
+            limit=limit,
+            offset=offset,
+            with_vectors=False,
+        )
+        return _docs(points), next_offset
+
+    def all_docs(self) -> dict:
+        docs = {}
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection,
+                limit=256,
+                offset=offset,
+                with_vectors=False,
+            )
+            docs.update(_docs(points))
+            if offset is None:
+                break
+        return docs
+
+    def normalize_payloads(self) -> int:
+        """
+        Rewrite status/severity of points stored before ingest normalized
+        them (see `_normalized`); returns the number of points updated.
+        """
+        fixes: dict[tuple, list[int]] = {}
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection,
+                limit=1000,
+                offset=offset,
+                with_payload=["status", "severity"],
+                with_vectors=False,
+            )
+            for p in points:
+                payload = p.payload or {}
+                fixed = _normalized(payload)
+                if fixed != payload:
+                    fixes.setdefault(tuple(sorted(fixed.items())), []).append(int(p.id))
+            if offset is None:
+                break
+        for patch, ids in fixes.items():
+            for start in range(0, len(ids), DELETE_BATCH):
+                self.client.set_payload(
+                    collection_name=self.collection, payload=dict(patch), points=ids[start:start + DELETE_BATCH]
+                )
+        return sum(len(ids) for ids in fixes.values())
+
+    def count(self) -> int:
+        info = self.client.get_collection(self.collection)
+        return info.points_count
+
+    def reset(self):
+        """Delete and recreate the collection."""
+        try:
+            self.client.delete_collection(self.collection)
+        except Exception:
+            pass
+        self._ensure_collection()
+
+    def reload(self):
+        pass  # Qdrant is shared; no disk reload needed
+
+
+class AsyncQdrantBackend:
+    """
+    Non-blocking counterpart of `QdrantBackend` for async request handlers:
+    network round trips are awaited on AsyncQdrantClient and embedding runs
+    through `EmbeddingModel.encode_async` (batcher / executor), so the event
+    loop keeps serving other requests meanwhile.
+
+    The collection and payload indexes are created by the sync backend, which
+    also lends its id allocator so both paths draw from one sequence.
+    """
+
+    def __init__(self, ids: PointIds | None = None):
+        self.client = _make_client(AsyncQdrantClient)
+        self.collection = QDRANT_COLLECTION
+        self._ids = ids or PointIds()
+
+    async def add_document(self, text: str, metadata: dict | None = None) -> int:
+        return (await self.add_documents([text], [metadata]))[0]
+
+    async def add_documents(self, texts: list[str], metadatas: list[dict | None] | None = None) -> list[int]:
+        if not texts:
+            return []
+        metadatas = metadatas or [None] * len(texts)
+        doc_ids = self._ids.allocate(len(texts))
+        embs = await EmbeddingModel.encode_async(texts)
+        await self.client.upsert(collection_name=self.collection, points=_points(doc_ids, embs, texts, metadatas))
+        return doc_ids
+
+    async def update_metadata(self, issue_id, patch: dict) -> list[int]:
+        ids = await self._scroll_ids(_issue_filter(issue_id))
+        if ids:
+            await self.client.set_payload(
+                collection_name=self.collection, payload=_normalized(patch, partial=True), points=ids
+            )
+        return ids
+
+    async def _scroll_ids(self, scroll_filter: Filter) -> list[int]:
+        ids, offset = [], None
+        while True:
+            points, offset = await self.client.scroll(
+                collection_name=self.collection,
+                scroll_filter=scroll_filter,
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            ids.extend(_point_ids(points))
+            if offset is None:
+                return ids
+
+    async def _unhashed_text_ids(self, text, team_tag) -> list[int]:
+        ids, offset = [], None
+        while True:
+            points, offset = await self.client.scroll(
+                collection_name=self.collection,
+                scroll_filter=_unhashed_filter(team_tag),
+                limit=1000,
+                offset=offset,
+                with_vectors=False,
+            )
+            ids.extend(_text_matches(points, text, team_tag))
+            if offset is None:
+                return ids
+
+    async def delete_documents(self, *, issue_id=None, text=None, team_tag=None) -> list[int]:
+        ids_to_delete = await self._scroll_ids(_issue_filter(issue_id)) if issue_id else []
+        if not ids_to_delete and text:
+            ids_to_delete = (
+                await self._scroll_ids(_text_filter(text, team_tag))
+                or await self._unhashed_text_ids(text, team_tag)
+            )
+        if ids_to_delete:
+            await self.client.delete(collection_name=self.collection, points_selector=ids_to_delete)
+        return ids_to_delete
+
+    async def search(
+        self,
+        query: str,
+        k: int = 4,
+        team_tag: str | None = None,
+        status: str | None = None,
+        severity: str | None = None,
+        service: str | None = None,
+        min_bucket: int | None = None,
+    ) -> list[dict]:
+        emb = (await EmbeddingModel.encode_async([query]))[0].tolist()
+        results = await self.client.query_points(
+            collection_name=self.collection,
+            query=emb,
+            limit=k,
+            query_filter=_search_filter(team_tag, status, severity, service, min_bucket),
+        )
+        return _hits(results.points)
+
+    async def get_documents(self, ids) -> dict:
+        if not ids:
+            return {}
+        points = await self.client.retrieve(
+            collection_name=self.collection,
+            ids=[int(i) for i in ids],
+            with_payload=True,
+            with_vectors=False,
+        )
+        return _docs(points)
+
+    async def scroll(self, limit: int = 256, offset=None, **filters) -> tuple[dict, object]:
+        """One page of {id: {"text", "metadata"}} plus the offset of the next page (None at the end)."""
+        points, next_offset = await self.client.scroll(
+            collection_name=self.collection,
+            scroll_filter=_scroll_filter(**filters),
+            limit=limit,
+            offset=offset,
+            with_vectors=False,
+        )
+        return _docs(points), next_offset
@@ -1,79 +1,299 @@
-from langsmith import traceable
-
-from config import VECTOR_BACKEND
-
-
-def _create_backend():
-    if VECTOR_BACKEND == "faiss":
-        from core.vector_backends.faiss_backend import FaissBackend
-        print("Using FAISS vector backend (fallback/local mode)")
-        return FaissBackend()
-
-    from core.vector_backends.qdrant_backend import QdrantBackend
-    print("Using Qdrant vector backend")
-    return QdrantBackend()
-
-
-@traceable(name="vecstore")
-class VectorStore:
-    """Facade over Qdrant (default) or FAISS (optional fallback)."""
-
-    def __init__(self):
-        self._backend = _create_backend()
-
-    @property
-    def backend_name(self) -> str:
-        return VECTOR_BACKEND
-
-    @property
-    def store(self):
-        """Compatibility shim for code that reads store.docs."""
-        if hasattr(self._backend, "store"):
-            return self._backend.store
-
-        class _PseudoStore:
-            def __init__(self, docs):
-                self.docs = docs
-
-            def all_texts(self):
-                return [v["text"] for v in self.docs.values()]
-
-        return _PseudoStore(self._backend.all_docs())
-
-    def iter_docs(self):
-        """Yield (text, metadata) for all indexed documents."""
-        for doc in self.store.docs.values():
-            yield doc["text"], doc.get("metadata", {}) or {}
-
-    def count(self) -> int:
-        if hasattr(self._backend, "count"):
-            return self._backend.count()
-        return len(self.store.docs)
-
-    def _reload_if_needed(self):
-        if hasattr(self._backend, "reload"):
-            self._backend.reload()
-
-    def add_document(self, text, metadata=None):
-        return self._backend.add_document(text, metadata)
-
-    def delete_documents(self, *, issue_id=None, text=None, team_tag=None):
-        return self._backend.delete_documents(
-            issue_id=issue_id, text=text, team_tag=team_tag
-        )
-
-    def search(self, query, k=4, team_tag=None, status=None, severity=None):
-        self._reload_if_needed()
-        if hasattr(self._backend, "search"):
-            # Qdrant supports native metadata filters
-            import inspect
-            sig = inspect.signature(self._backend.search)
-            if "status" in sig.parameters:
-                return self._backend.search(
-                    query, k=k, team_tag=team_tag, status=status, severity=severity
-                )
-        return self._backend.search(query, k=k, team_tag=team_tag)
-
-    def reset(self):
-        if hasattr(self._backend, "reset"):
-            self._backend.reset()
+import asyncio
+import threading
+
+from langsmith import traceable
+
+from config import QDRANT_LOCATION, VECTOR_BACKEND
+from core.compute import run_cpu
+from retrieval.bm import get_sparse_index, search_task
+from retrieval.recency import time_bucket, to_epoch
+
+
+def _create_async_backend(backend):
+    """
+    Non-blocking Qdrant client for async handlers. None for the in-process
+    FAISS backend and embedded Qdrant (one client per local store), which
+    run in a worker thread instead.
+    """
+    if VECTOR_BACKEND == "faiss" or QDRANT_LOCATION:
+        return None
+    from core.vector_backends.qdrant_backend import AsyncQdrantBackend
+    return AsyncQdrantBackend(ids=backend._ids)
+
+
+def _create_backend():
+    if VECTOR_BACKEND == "faiss":
+        from core.vector_backends.faiss_backend import FaissBackend
+        print("Using FAISS vector backend (fallback/local mode)")
+        return FaissBackend()
+
+    from core.vector_backends.qdrant_backend import QdrantBackend
+    print("Using Qdrant vector backend")
+    return QdrantBackend()
+
+
+@traceable(name="vecstore")
+class VectorStore:
+    """Facade over Qdrant (default) or FAISS (optional fallback)."""
+
+    def __init__(self):
+        self._backend = _create_backend()
+        self._async_backend = _create_async_backend(self._backend)
+        self.sparse = get_sparse_index()
+        if not len(self.sparse) and self.count():
+            self.rebuild_sparse_index()
+
+    @property
+    def backend_name(self) -> str:
+        return VECTOR_BACKEND
+
+    @property
+    def store(self):
+        """Compatibility shim for code that reads store.docs."""
+        if hasattr(self._backend, "store"):
+            return self._backend.store
+
+        class _PseudoStore:
+            def __init__(self, docs):
+                self.docs = docs
+
+            def all_texts(self):
+                return [v["text"] for v in self.docs.values()]
+
+        return _PseudoStore(self._backend.all_docs())
+
+    def iter_docs(self):
+        """Yield (text, metadata) for all indexed documents."""
+        for doc in self.store.docs.values():
+            yield doc["text"], doc.get("metadata", {}) or {}
+
+    def health(self) -> dict:
+        """Backend reachability (a cheap metadata call for Qdrant; FAISS is in-process)."""
+        if hasattr(self._backend, "health"):
+            status = self._backend.health()
+        else:
+            status = {"ok": True}
+        return {"backend": self.backend_name, **status}
+
+    def count(self) -> int:
+        if hasattr(self._backend, "count"):
+            return self._backend.count()
+        return len(self.store.docs)
+
+    def _reload_if_needed(self):
+        if hasattr(self._backend, "reload"):
+            self._backend.reload()
+
+    def get_documents(self, ids) -> dict:
+        """Fetch {id: {"text", "metadata"}} for specific document ids."""
+        return self._backend.get_documents(ids)
+
+    def add_document(self, text, metadata=None):
+        return self.add_documents([text], [metadata])[0]
+
+    @staticmethod
+    def _with_ts(metadata):
+        """Metadata plus `ts` (epoch seconds of `timestamp`), which places it in a time partition."""
+        metadata = dict(metadata or {})
+        ts = to_epoch(metadata.get("timestamp"))
+        if ts is not None:
+            metadata["ts"] = ts
+        return metadata
+
+    def add_documents(self, texts, metadatas=None):
+        """Batch ingest: one embedding call and one backend write for all texts."""
+        metadatas = [self._with_ts(m) for m in (metadatas or [None] * len(texts))]
+        doc_ids = self._backend.add_documents(texts, metadatas)
+        self.sparse.add_many(
+            (doc_id, text, metadata.get("team_tag"), time_bucket(metadata.get("ts")))
+            for doc_id, text, metadata in zip(doc_ids, texts, metadatas)
+        )
+        return doc_ids
+
+    async def add_documents_async(self, texts, metadatas=None):
+        """add_documents() for async callers: awaits Qdrant, runs FAISS and the BM25 log in a thread."""
+        if self._async_backend is None:
+            return await asyncio.to_thread(self.add_documents, texts, metadatas)
+        metadatas = [self._with_ts(m) for m in (metadatas or [None] * len(texts))]
+        doc_ids = await self._async_backend.add_documents(texts, metadatas)
+        await asyncio.to_thread(self.sparse.add_many, [
+            (doc_id, text, metadata.get("team_tag"), time_bucket(metadata.get("ts")))
+            for doc_id, text, metadata in zip(doc_ids, texts, metadatas)
+        ])
+        return doc_ids
+
+    async def add_document_async(self, text, metadata=None):
+        return (await self.add_documents_async([text], [metadata]))[0]
+
+    def delete_documents(self, *, issue_id=None, text=None, team_tag=None):
+        deleted_ids = self._backend.delete_documents(
+            issue_id=issue_id, text=text, team_tag=team_tag
+        )
+        self.sparse.remove(deleted_ids)
+        return len(deleted_ids)
+
+    @staticmethod
+    def _metadata_patch(patch: dict) -> dict:
+        patch = {key: value for key, value in patch.items() if key != "text"}
+        if "timestamp" in patch:
+            ts = to_epoch(patch["timestamp"])
+            if ts is not None:
+                patch["ts"] = ts
+        return patch
+
+    @staticmethod
+    def _moves_partition(patch: dict) -> bool:
+        """Whether a patch moves documents to another BM25 partition (team, time bucket)."""
+        return "team_tag" in patch or "ts" in patch
+
+    def _repartition_sparse(self, docs: dict):
+        self.sparse.add_many(
+            (doc_id, doc["text"], metadata.get("team_tag"), time_bucket(metadata.get("ts")))
+            for doc_id, doc in docs.items()
+            for metadata in [doc.get("metadata") or {}]
+        )
+
+    def update_metadata(self, issue_id, patch: dict) -> int:
+        """
+        Merge `patch` into the metadata of an issue's documents in place: no
+        re-embedding, and ids and vectors stay stable. Returns the number of
+        documents updated (0 if the issue is not indexed).
+        """
+        patch = self._metadata_patch(patch)
+        ids = self._backend.update_metadata(issue_id, patch)
+        if ids and self._moves_partition(patch):
+            self._repartition_sparse(self.get_documents(ids))
+        return len(ids)
+
+    async def update_metadata_async(self, issue_id, patch: dict) -> int:
+        if self._async_backend is None:
+            return await asyncio.to_thread(self.update_metadata, issue_id, patch)
+        patch = self._metadata_patch(patch)
+        ids = await self._async_backend.update_metadata(issue_id, patch)
+        if ids and self._moves_partition(patch):
+            docs = await self._async_backend.get_documents(ids)
+            await asyncio.to_thread(self._repartition_sparse, docs)
+        return len(ids)
+
+    def delete_many(self, issue_ids) -> int:
+        """Bulk delete every document of `issue_ids` (batched index lookups, no scans)."""
+        deleted_ids = self._backend.delete_many(list(issue_ids))
+        self.sparse.remove(deleted_ids)
+        return len(deleted_ids)
+
+    def drop_partitions_before(self, bucket: int) -> int:
+        """Retention: drop every dated document in a time bucket older than `bucket`."""
+        dropped = 0
+        if hasattr(self._backend, "drop_buckets_before"):
+            dropped = self._backend.drop_buckets_before(bucket)
+        self.sparse.drop_buckets_before(bucket)
+        return dropped
+
+    async def delete_documents_async(self, *, issue_id=None, text=None, team_tag=None):
+        if self._async_backend is None:
+            return await asyncio.to_thread(
+                self.delete_documents, issue_id=issue_id, text=text, team_tag=team_tag
+            )
+        deleted_ids = await self._async_backend.delete_documents(
+            issue_id=issue_id, text=text, team_tag=team_tag
+        )
+        await asyncio.to_thread(self.sparse.remove, deleted_ids)
+        return len(deleted_ids)
+
+    def sparse_search(self, query, k=8, team_tag=None, min_bucket=None):
+        """BM25 over the persistent inverted index: (doc_ids, scores) arrays, best first."""
+        return self.sparse.search(query, k, team=team_tag, min_bucket=min_bucket)
+
+    async def sparse_search_async(self, query, k=8, team_tag=None, min_bucket=None):
+        """BM25 is CPU work; run it in the CPU pool (see core.compute)."""
+        return await run_cpu(search_task, query, k, team_tag, min_bucket)
+
+    async def get_documents_async(self, ids) -> dict:
+        if self._async_backend is None:
+            return await asyncio.to_thread(self.get_documents, ids)
+        return await self._async_backend.get_documents(ids)
+
+    def scroll(self, limit=256, offset=None, team_tag=None, status=None, severity=None, min_ts=None, max_ts=None):
+        """
+        One page of {id: {"text", "metadata"}} in id order with the filters
+        applied inside the backend, plus the offset of the next page (None at
+        the end). The time range [min_ts, max_ts) is in epoch seconds.
+        """
+        return self._backend.scroll(
+            limit, offset, team_tag=team_tag, status=status, severity=severity, min_ts=min_ts, max_ts=max_ts
+        )
+
+    async def scroll_async(self, limit=256, offset=None, team_tag=None, status=None, severity=None, min_ts=None, max_ts=None):
+        if self._async_backend is None:
+            return await asyncio.to_thread(
+                self.scroll, limit, offset, team_tag, status, severity, min_ts, max_ts
+            )
+        return await self._async_backend.scroll(
+            limit, offset, team_tag=team_tag, status=status, severity=severity, min_ts=min_ts, max_ts=max_ts
+        )
+
+    def rebuild_sparse_index(self):
+        """One-off full build, e.g. for corpora indexed before the sparse index existed."""
+        self.sparse.clear()
+        self.sparse.add_many(
+            (doc_id, doc["text"], metadata.get("team_tag"), time_bucket(metadata.get("ts")))
+            for doc_id, doc in self.store.docs.items()
+            for metadata in [doc.get("metadata") or {}]
+        )
+
+    def maintain_index(self):
+        """Backend index maintenance (FAISS ANN rebuild/retrain); no-op for Qdrant."""
+        if hasattr(self._backend, "maintain"):
+            return self._backend.maintain()
+        return None
+
+    def index_info(self) -> dict:
+        if hasattr(self._backend, "index_info"):
+            return self._backend.index_info()
+        return {}
+
+    def search(self, query, k=4, team_tag=None, status=None, severity=None, service=None, min_bucket=None):
+        """
+        Dense search; both backends apply the metadata filters inside the search.
+        With `min_bucket`, only time partitions from that bucket on (and undated
+        documents) are searched.
+        """
+        self._reload_if_needed()
+        return self._backend.search(
+            query, k=k, team_tag=team_tag, status=status, severity=severity, service=service,
+            min_bucket=min_bucket,
+        )
+
+    async def search_async(self, query, k=4, team_tag=None, status=None, severity=None, service=None, min_bucket=None):
+        """search() without blocking the event loop (AsyncQdrantClient, or a thread for FAISS)."""
+        if self._async_backend is None:
+            return await asyncio.to_thread(
+                self.search, query, k, team_tag, status, severity, service, min_bucket
+            )
+        return await self._async_backend.search(
+            query, k=k, team_tag=team_tag, status=status, severity=severity, service=service,
+            min_bucket=min_bucket,
+        )
+
+    def reset(self):
+        if hasattr(self._backend, "reset"):
+            self._backend.reset()
+        self.sparse.clear()
+
+
+_vector_store = None
+_vector_store_lock = threading.Lock()
+
+
+def get_vector_store():
+    """
+    Process-wide VectorStore: one backend and one (pooled) client, created at
+    startup and shared by every request, job and graph run. Also usable as a
+    FastAPI dependency.
+    """
+    global _vector_store
+    if _vector_store is None:
+        with _vector_store_lock:
+            if _vector_store is None:
+                _vector_store = VectorStore()
+    return _vector_store
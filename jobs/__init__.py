@@ -1 +1 @@
-"""Vector store backends."""
+"""Vector store backends."""
@@ -1,35 +1,47 @@
-"""Daily cleanup job: archive resolved incidents and purge expired vectors."""
-
-from datetime import datetime
-
-from config import RETENTION_DAYS_CLOSED, RETENTION_DAYS_RESOLVED
-from core.analytics import AnalyticsManager
-from core.incidents import IncidentManager
-from core.vector_store import VectorStore
-
-
-def run_cleanup() -> dict:
-    """Archive old resolved incidents and remove expired vectors from index."""
-    archived = IncidentManager.archive_resolved_older_than(RETENTION_DAYS_RESOLVED)
-
-    expired_ids = IncidentManager.get_expired_incident_ids(RETENTION_DAYS_CLOSED)
-    store = VectorStore()
-    vectors_removed = 0
-    analytics_removed = 0
-
-    for issue_id in expired_ids:
-        deleted = store.delete_documents(issue_id=issue_id)
-        vectors_removed += deleted
-        if AnalyticsManager.delete_issue(issue_id):
-            analytics_removed += 1
-        IncidentManager.delete_incident(issue_id)
-
-    result = {
-        "timestamp": datetime.utcnow().isoformat(),
-        "archived_count": archived,
-        "expired_purged": len(expired_ids),
-        "vectors_removed": vectors_removed,
-        "analytics_removed": analytics_removed,
-    }
-    print(f"Cleanup complete: {result}")
-    return result
+"""Daily cleanup job: archive resolved incidents and purge expired vectors."""
+
+import time
+from datetime import datetime
+
+from config import (
+    RETENTION_DAYS_CLOSED,
+    RETENTION_DAYS_INDEX,
+    RETENTION_DAYS_RESOLVED,
+    RETENTION_DROP_PARTITIONS,
+)
+from core.analytics import AnalyticsManager
+from core.incidents import IncidentManager
+from core.vector_store import get_vector_store
+from retrieval.recency import time_bucket
+
+
+def run_cleanup() -> dict:
+    """Archive old resolved incidents and remove expired vectors from index."""
+    archived = IncidentManager.archive_resolved_older_than(RETENTION_DAYS_RESOLVED)
+
+    expired_ids = IncidentManager.get_expired_incident_ids(RETENTION_DAYS_CLOSED)
+    store = get_vector_store()
+    # Opt-in: whole partitions past retention, one bulk drop per index. This
+    # ignores incident status, so it stays off unless the index must be bounded
+    partitions_removed = 0
+    if RETENTION_DROP_PARTITIONS:
+        partitions_removed = store.drop_partitions_before(
+            time_bucket(time.time() - RETENTION_DAYS_INDEX * 86400)
+        )
+    # Expired incidents: one bulk delete per store instead of one call per incident
+    vectors_removed = store.delete_many(expired_ids) if expired_ids else 0
+    analytics_removed = AnalyticsManager.delete_issues(expired_ids)
+    IncidentManager.delete_incidents(expired_ids)
+    rollups_pruned = AnalyticsManager.prune_rollups()
+
+    result = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "archived_count": archived,
+        "expired_purged": len(expired_ids),
+        "vectors_removed": vectors_removed,
+        "partition_vectors_removed": partitions_removed,
+        "analytics_removed": analytics_removed,
+        "minute_rollups_pruned": rollups_pruned,
+    }
+    print(f"Cleanup complete: {result}")
+    return result
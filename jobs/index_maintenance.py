@@ -0,0 +1,22 @@
+"""FAISS index maintenance: (re)build the ANN index when size/tombstone thresholds are crossed."""
+
+from datetime import datetime
+
+from core.vector_store import get_vector_store
+
+
+def run_index_maintenance() -> dict:
+    store = get_vector_store()
+    rebuilt_as = store.maintain_index()
+    result = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "rebuilt_as": rebuilt_as,
+        "index": store.index_info(),
+    }
+    if rebuilt_as:
+        print(f"Index maintenance complete: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    run_index_maintenance()
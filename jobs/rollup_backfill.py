@@ -0,0 +1,92 @@
+"""Rebuild the dashboard rollups (analytics_rollups) from the raw query, issue and incident rows."""
+
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import func
+
+from core.analytics import (
+    ROLLUP_VERSION,
+    AnalyticsRollup,
+    AnalyticsRollupState,
+    IssueAnalytic,
+    QueryAnalytic,
+    Session,
+    issue_events,
+    prune_minute_rollups,
+    query_events,
+    record_rollups,
+)
+from core.incidents import Incident, incident_events
+
+BATCH = 5000
+# analytics_rollup_state row of a completed backfill
+MARKER = "backfill"
+
+
+def _replay(session, rows, to_events) -> int:
+    """Stream `rows` into the rollups BATCH rows at a time; returns the row count."""
+    rows = iter(rows)
+    total = 0
+    while batch := list(islice(rows, BATCH)):
+        record_rollups(session, [e for row in batch for e in to_events(*row)])
+        total += len(batch)
+    return total
+
+
+def run_rollup_backfill(only_if_missing: bool = False) -> dict:
+    """
+    Replace every rollup with one recomputed from the raw tables, in a single
+    transaction so dashboards never read a half-built state; the same
+    transaction records the backfill in analytics_rollup_state. With
+    `only_if_missing`, does nothing once a backfill of the current
+    ROLLUP_VERSION has completed (rows counted live since then are current).
+    """
+    session = Session()
+    try:
+        if only_if_missing:
+            marker = session.get(AnalyticsRollupState, MARKER)
+            if marker is not None and marker.version >= ROLLUP_VERSION:
+                return {"skipped": True}
+
+        session.query(AnalyticsRollup).delete(synchronize_session=False)
+        # yield_per streams the SELECTs; only column tuples are ever loaded
+        queries = _replay(
+            session,
+            session.query(
+                QueryAnalytic.team, QueryAnalytic.response_time, QueryAnalytic.accuracy, QueryAnalytic.timestamp
+            ).yield_per(BATCH),
+            query_events,
+        )
+        issues = _replay(
+            session,
+            session.query(IssueAnalytic.team, IssueAnalytic.issue_type, IssueAnalytic.timestamp).yield_per(BATCH),
+            issue_events,
+        )
+        incidents = _replay(
+            session,
+            session.query(
+                Incident.severity, Incident.service, Incident.created_at, Incident.resolved_at
+            ).yield_per(BATCH),
+            incident_events,
+        )
+        # Minute rows older than the retention the cleanup job keeps are never read
+        prune_minute_rollups(session)
+        session.merge(AnalyticsRollupState(name=MARKER, version=ROLLUP_VERSION, completed_at=datetime.utcnow()))
+        session.commit()
+
+        result = {
+            "timestamp": datetime.utcnow().isoformat(),
+            "queries": queries,
+            "issues": issues,
+            "incidents": incidents,
+            "rollup_rows": session.query(func.count(AnalyticsRollup.id)).scalar(),
+        }
+        print(f"Rollup backfill complete: {result}")
+        return result
+    finally:
+        session.close()
+
+
+if __name__ == "__main__":
+    run_rollup_backfill()
@@ -1,36 +1,53 @@
-"""Background scheduler for periodic jobs."""
-
-import atexit
-import threading
-
-from apscheduler.schedulers.background import BackgroundScheduler
-
-from config import CLEANUP_INTERVAL_HOURS
-from jobs.cleanup import run_cleanup
-
-_scheduler: BackgroundScheduler | None = None
-
-
-def start_scheduler():
-    global _scheduler
-    if _scheduler is not None:
-        return _scheduler
-
-    _scheduler = BackgroundScheduler(daemon=True)
-    _scheduler.add_job(
-        run_cleanup,
-        "interval",
-        hours=CLEANUP_INTERVAL_HOURS,
-        id="daily_cleanup",
-        replace_existing=True,
-    )
-    _scheduler.start()
-    atexit.register(lambda: _scheduler.shutdown(wait=False))
-    print(f"Background scheduler started (cleanup every {CLEANUP_INTERVAL_HOURS}h)")
-    return _scheduler
-
-
-def start_scheduler_in_thread():
-    """Non-blocking scheduler start for FastAPI lifespan."""
-    t = threading.Thread(target=start_scheduler, daemon=True)
-    t.start()
+"""Background scheduler for periodic jobs."""
+
+import atexit
+import threading
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from config import CLEANUP_INTERVAL_HOURS, FAISS_MAINTENANCE_INTERVAL_MINUTES, VECTOR_BACKEND
+from jobs.cleanup import run_cleanup
+from jobs.index_maintenance import run_index_maintenance
+from jobs.rollup_backfill import run_rollup_backfill
+
+_scheduler: BackgroundScheduler | None = None
+
+
+def start_scheduler():
+    global _scheduler
+    if _scheduler is not None:
+        return _scheduler
+
+    _scheduler = BackgroundScheduler(daemon=True)
+    _scheduler.add_job(
+        run_cleanup,
+        "interval",
+        hours=CLEANUP_INTERVAL_HOURS,
+        id="daily_cleanup",
+        replace_existing=True,
+    )
+    if VECTOR_BACKEND == "faiss":
+        _scheduler.add_job(
+            run_index_maintenance,
+            "interval",
+            minutes=FAISS_MAINTENANCE_INTERVAL_MINUTES,
+            id="faiss_index_maintenance",
+            replace_existing=True,
+        )
+    # Rollups rebuilt from the raw tables once per database and ROLLUP_VERSION, in the background
+    _scheduler.add_job(
+        run_rollup_backfill,
+        kwargs={"only_if_missing": True},
+        id="rollup_backfill",
+        replace_existing=True,
+    )
+    _scheduler.start()
+    atexit.register(lambda: _scheduler.shutdown(wait=False))
+    print(f"Background scheduler started (cleanup every {CLEANUP_INTERVAL_HOURS}h)")
+    return _scheduler
+
+
+def start_scheduler_in_thread():
+    """Non-blocking scheduler start for FastAPI lifespan."""
+    t = threading.Thread(target=start_scheduler, daemon=True)
+    t.start()
@@ -1,21 +1,534 @@
-from rank_bm25 import BM25Okapi
-from langsmith import traceable
-@traceable(name="sparseretriver")
-class SparseRetriever:
-    def __init__(self, documents):
-        self.docs = documents
-        if not documents:
-            self.bm25 = None
-        else:
-            self.bm25 = BM25Okapi([d.split() for d in documents])
-
-    def search(self, query, k):
-        if self.bm25 is None:
-            return []   # <- prevent crash 
-        scores = self.bm25.get_scores(query.split())
-        ranked = sorted(
-            zip(self.docs, scores),
-            key=lambda x: x[1],
-            reverse=True
-        )
-        return ranked[:k]
+import json
+import math
+import os
+import threading
+from collections import Counter
+
+import numpy as np
+
+from config import SPARSE_COMPACT_EVERY
+from retrieval.recency import UNDATED_BUCKET
+from core.persistence import (
+    SPARSE_INDEX_PATH,
+    SPARSE_LEGACY_PATH,
+    SPARSE_LOG_PATH,
+    append_log,
+    file_signature,
+    locked,
+    read_json,
+    read_log,
+    truncate_log,
+)
+
+
+def tokenize(text):
+    return text.split()
+
+
+def top_k(ids: np.ndarray, scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """O(n) top-k selection (argpartition), then sort only the k survivors."""
+    if k <= 0 or not len(scores):
+        return ids[:0], scores[:0]
+    if len(scores) > k:
+        part = np.argpartition(-scores, k - 1)[:k]
+        ids, scores = ids[part], scores[part]
+    order = np.argsort(-scores, kind="stable")
+    return ids[order], scores[order]
+
+
+class _Partition:
+    """Postings for one (team, time bucket): term -> {doc_id: tf}, plus document lengths."""
+
+    def __init__(self):
+        self.postings: dict[str, dict[int, int]] = {}
+        self.doc_len: dict[int, int] = {}
+        self.total_len = 0
+        # term -> (doc_ids, tfs, doc_lens) arrays, rebuilt lazily after a mutation
+        self._arrays: dict[str, tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    def term_arrays(self, term):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            plist = self.postings[term]
+            ids = np.fromiter(plist.keys(), dtype=np.int64, count=len(plist))
+            tfs = np.fromiter(plist.values(), dtype=np.float64, count=len(plist))
+            lens = np.fromiter((self.doc_len[i] for i in plist), dtype=np.float64, count=len(plist))
+            arrays = self._arrays[term] = (ids, tfs, lens)
+        return arrays
+
+
+_MAGIC = b"BM25BIN1"
+
+
+def _write_sections(path: str, header: dict, payload: list[tuple[str, np.ndarray]]) -> None:
+    """magic | header length | JSON header (with section offsets) | 8-byte aligned sections."""
+    header = {**header, "sections": {}}
+    header_len = len(json.dumps(header).encode()) + 64 * len(payload) + 64
+    header_len += -header_len % 8
+    offset = 16 + header_len
+    for name, arr in payload:
+        header["sections"][name] = [offset, arr.dtype.str, len(arr)]
+        offset += arr.nbytes + (-arr.nbytes % 8)
+    header_bytes = json.dumps(header).encode()
+    assert len(header_bytes) <= header_len
+    with open(path, "wb") as f:
+        f.write(_MAGIC)
+        f.write(np.array([header_len], dtype="<i8").tobytes())
+        f.write(header_bytes.ljust(header_len, b" "))
+        for _, arr in payload:
+            f.write(arr.tobytes())
+            f.write(b"\0" * (-arr.nbytes % 8))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class PostingsSnapshot:
+    """
+    Read-only BM25 postings in one memory-mapped file, so every process (API
+    workers, CPU-pool workers, the consumer) shares the same pages:
+
+      terms_off/terms   sorted vocabulary (UTF-8)
+      term_off          term -> its range of the posting columns
+      post_doc/post_part/post_tf/post_len
+                        postings ordered by (term, partition, doc id)
+      doc_ids/doc_part/doc_len
+                        documents by id, for removals
+      part_n/part_len   documents and total length per partition
+
+    Partition keys ([team, bucket]) live in the JSON header.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mm = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(self._mm[:8]) != _MAGIC:
+            raise ValueError(f"{path} is not a BM25 snapshot")
+        header_len = int(np.frombuffer(self._mm, dtype="<i8", count=1, offset=8)[0])
+        header = json.loads(bytes(self._mm[16:16 + header_len]))
+        self.partitions = [(team, int(bucket)) for team, bucket in header["partitions"]]
+        for name, (offset, dtype, count) in header["sections"].items():
+            setattr(self, name, np.frombuffer(self._mm, dtype=dtype, count=count, offset=offset))
+
+    def term(self, i: int) -> str:
+        return bytes(self.terms[self.terms_off[i]:self.terms_off[i + 1]]).decode("utf-8")
+
+    def term_range(self, term: str) -> tuple[int, int] | None:
+        """Slice of the posting columns for `term` (binary search over the vocabulary)."""
+        key = term.encode("utf-8")
+        lo, hi = 0, len(self.term_off) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(self.terms[self.terms_off[mid]:self.terms_off[mid + 1]]) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self.term_off) - 1 and bytes(self.terms[self.terms_off[lo]:self.terms_off[lo + 1]]) == key:
+            return int(self.term_off[lo]), int(self.term_off[lo + 1])
+        return None
+
+    def doc(self, doc_id: int) -> tuple[int, int] | None:
+        """(partition index, length) of a snapshot document."""
+        pos = int(np.searchsorted(self.doc_ids, doc_id))
+        if pos < len(self.doc_ids) and self.doc_ids[pos] == doc_id:
+            return int(self.doc_part[pos]), int(self.doc_len[pos])
+        return None
+
+    @staticmethod
+    def write(path: str, partitions: list, terms: list[str], columns: dict, docs: dict) -> None:
+        """
+        `columns`: post_term (index into the sorted `terms`), post_part,
+        post_doc, post_tf, post_len; `docs`: doc_ids, doc_part, doc_len.
+        """
+        order = np.lexsort((columns["post_doc"], columns["post_part"], columns["post_term"]))
+        term_off = np.searchsorted(columns["post_term"][order], np.arange(len(terms) + 1)).astype("<i8")
+        encoded = [t.encode("utf-8") for t in terms]
+        terms_off = np.zeros(len(encoded) + 1, dtype="<i8")
+        np.cumsum([len(t) for t in encoded], out=terms_off[1:])
+        doc_order = np.argsort(docs["doc_ids"], kind="stable")
+        doc_part = docs["doc_part"][doc_order].astype("<i4")
+        doc_len = docs["doc_len"][doc_order].astype("<i4")
+        payload = [
+            ("terms_off", terms_off),
+            ("term_off", term_off),
+            ("post_doc", columns["post_doc"][order].astype("<i8")),
+            ("post_part", columns["post_part"][order].astype("<i4")),
+            ("post_tf", columns["post_tf"][order].astype("<i4")),
+            ("post_len", columns["post_len"][order].astype("<i4")),
+            ("doc_ids", docs["doc_ids"][doc_order].astype("<i8")),
+            ("doc_part", doc_part),
+            ("doc_len", doc_len),
+            ("part_n", np.bincount(doc_part, minlength=len(partitions)).astype("<i8")),
+            ("part_len", np.bincount(doc_part, weights=doc_len, minlength=len(partitions)).astype("<i8")),
+            ("terms", np.frombuffer(b"".join(encoded), dtype=np.uint8)),
+        ]
+        _write_sections(path, {"partitions": [list(key) for key in partitions]}, payload)
+
+
+class SparseIndex:
+    """
+    Long-lived BM25 index over postings lists partitioned by team and time
+    bucket (see `retrieval.recency.time_bucket`).
+
+    Updated incrementally as documents are added/removed, so a query only
+    touches the postings of its own terms in the partitions it can match, and
+    retention drops whole old partitions. State is persisted as a columnar
+    snapshot (`bm25.bin`, memory-mapped and shared by every process; see
+    `PostingsSnapshot`) plus an append-only mutation log (`bm25.log`). Only
+    the log since the last compaction lives in per-process dicts: its adds in
+    `partitions`, and the snapshot documents it removed or replaced in
+    `removed` / dropped partitions.
+    """
+
+    def __init__(self, path=SPARSE_INDEX_PATH, log_path=SPARSE_LOG_PATH, k1=1.5, b=0.75):
+        self.path = path
+        self.log_path = log_path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._reset_state()
+        self._load()
+
+    def _reset_state(self):
+        self.base: PostingsSnapshot | None = None
+        self._base_dropped = np.zeros(0, dtype=bool)
+        self._base_n = np.zeros(0, dtype=np.int64)
+        self._base_len = np.zeros(0, dtype=np.int64)
+        self.removed: set[int] = set()
+        self._removed_arr: np.ndarray | None = None
+        # Overlay: documents added since the snapshot
+        self.partitions: dict[tuple[str, int], _Partition] = {}
+        self.doc_terms: dict[int, tuple[tuple[str, int], dict[str, int]]] = {}
+        self._snapshot_sig = None
+        self._log_offset = 0
+        self._log_records = 0
+
+    # ── persistence ──────────────────────────────────────────────
+
+    def _load(self):
+        with self._lock:
+            self._reset_state()
+            self._snapshot_sig = file_signature(self.path)
+            if self._snapshot_sig is not None:
+                self.base = PostingsSnapshot(self.path)
+                n = len(self.base.partitions)
+                self._base_dropped = np.zeros(n, dtype=bool)
+                self._base_n = np.array(self.base.part_n, dtype=np.int64)
+                self._base_len = np.array(self.base.part_len, dtype=np.int64)
+            else:
+                # Pre-columnar JSON snapshot: loaded into the overlay until the next compaction
+                snapshot = read_json(SPARSE_LEGACY_PATH) or {}
+                for doc_id, (team, tf, *bucket) in snapshot.get("docs", {}).items():
+                    self._apply_add(int(doc_id), team, tf, bucket[0] if bucket else UNDATED_BUCKET)
+            records, self._log_offset = read_log(self.log_path)
+            self._replay(records)
+
+    def _replay(self, records):
+        for r in records:
+            if r["op"] == "add":
+                self._apply_add(int(r["id"]), r["team"], r["tf"], r.get("bucket", UNDATED_BUCKET))
+            elif r["op"] == "remove":
+                self._apply_remove(int(r["id"]))
+            elif r["op"] == "drop_before":
+                self._apply_drop_before(r["bucket"])
+        self._log_records += len(records)
+
+    def refresh(self):
+        """Pick up mutations written by other processes (cheap stat when unchanged)."""
+        with self._lock:
+            sig = file_signature(self.path)
+            log_sig = file_signature(self.log_path)
+            log_size = log_sig[2] if log_sig else 0
+            if sig != self._snapshot_sig or log_size < self._log_offset:
+                self._load()  # compacted elsewhere
+            elif log_size > self._log_offset:
+                records, self._log_offset = read_log(self.log_path, self._log_offset)
+                self._replay(records)
+
+    def _commit(self, records):
+        """Apply records locally and append them to the shared log."""
+        with self._lock, locked(self.log_path):
+            self.refresh()  # replay other writers first so the log order holds
+            self._replay(records)
+            append_log(self.log_path, records)
+            self._log_offset = file_signature(self.log_path)[2]
+            if self._log_records >= SPARSE_COMPACT_EVERY:
+                self._compact()
+
+    def _merged(self):
+        """(partitions, terms, posting columns, doc columns) of the live index."""
+        keys, term_ids = {}, {}
+        cols = {name: [] for name in ("post_term", "post_part", "post_doc", "post_tf", "post_len")}
+        docs = {name: [] for name in ("doc_ids", "doc_part", "doc_len")}
+        base_terms = None
+        if self.base is not None:
+            base = self.base
+            part_map = np.full(len(base.partitions), -1, dtype=np.int64)
+            for i, key in enumerate(base.partitions):
+                if not self._base_dropped[i] and self._base_n[i]:
+                    part_map[i] = keys.setdefault(key, len(keys))
+            removed = self._removed_array()
+            live = part_map[base.post_part] >= 0
+            if len(removed):
+                live &= ~np.isin(base.post_doc, removed)
+            post_term = np.repeat(np.arange(len(base.term_off) - 1), np.diff(base.term_off))[live]
+            base_terms = np.unique(post_term)
+            cols["post_part"].append(part_map[base.post_part[live]])
+            cols["post_doc"].append(np.asarray(base.post_doc[live], dtype=np.int64))
+            cols["post_tf"].append(np.asarray(base.post_tf[live], dtype=np.int64))
+            cols["post_len"].append(np.asarray(base.post_len[live], dtype=np.int64))
+            live_docs = part_map[base.doc_part] >= 0
+            if len(removed):
+                live_docs &= ~np.isin(base.doc_ids, removed)
+            docs["doc_ids"].append(np.asarray(base.doc_ids[live_docs], dtype=np.int64))
+            docs["doc_part"].append(part_map[base.doc_part[live_docs]])
+            docs["doc_len"].append(np.asarray(base.doc_len[live_docs], dtype=np.int64))
+            for t in base_terms.tolist():
+                term_ids.setdefault(base.term(t), len(term_ids))
+        overlay_terms, overlay = [], {name: [] for name in ("post_part", "post_doc", "post_tf", "post_len")}
+        for key, part in self.partitions.items():
+            p = keys.setdefault(key, len(keys))
+            for term, plist in part.postings.items():
+                t = term_ids.setdefault(term, len(term_ids))
+                for doc_id, tf in plist.items():
+                    overlay_terms.append(t)
+                    overlay["post_part"].append(p)
+                    overlay["post_doc"].append(doc_id)
+                    overlay["post_tf"].append(tf)
+                    overlay["post_len"].append(part.doc_len[doc_id])
+            docs["doc_ids"].append(np.fromiter(part.doc_len.keys(), dtype=np.int64, count=len(part.doc_len)))
+            docs["doc_part"].append(np.full(len(part.doc_len), p, dtype=np.int64))
+            docs["doc_len"].append(np.fromiter(part.doc_len.values(), dtype=np.int64, count=len(part.doc_len)))
+
+        # Renumber terms in sorted (UTF-8 byte) order
+        terms = sorted(term_ids, key=lambda t: t.encode("utf-8"))
+        rank = np.empty(len(terms), dtype=np.int64)
+        rank[[term_ids[t] for t in terms]] = np.arange(len(terms))
+        if base_terms is not None:
+            local = np.empty(len(self.base.term_off) - 1, dtype=np.int64)
+            local[base_terms] = np.arange(len(base_terms))  # first ids handed out, in base_terms order
+            cols["post_term"].append(rank[local[post_term]])
+        cols["post_term"].append(rank[np.array(overlay_terms, dtype=np.int64)])
+        for name, values in overlay.items():
+            cols[name].append(np.array(values, dtype=np.int64))
+
+        def join(parts):
+            return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+        return (
+            sorted(keys, key=keys.get),
+            terms,
+            {name: join(parts) for name, parts in cols.items()},
+            {name: join(parts) for name, parts in docs.items()},
+        )
+
+    def _compact(self):
+        """Write a full snapshot, truncate the log and map the new snapshot. Caller holds the file lock."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        PostingsSnapshot.write(tmp, *self._merged())
+        os.replace(tmp, self.path)
+        truncate_log(self.log_path)
+        if os.path.exists(SPARSE_LEGACY_PATH):
+            os.remove(SPARSE_LEGACY_PATH)
+        self._load()
+
+    # ── mutations ────────────────────────────────────────────────
+
+    def _removed_array(self) -> np.ndarray:
+        if self._removed_arr is None:
+            self._removed_arr = np.fromiter(self.removed, dtype=np.int64, count=len(self.removed))
+        return self._removed_arr
+
+    def _hide_base(self, doc_id):
+        """Hide a live snapshot document (removed, or replaced by an overlay add)."""
+        if self.base is None or doc_id in self.removed:
+            return
+        entry = self.base.doc(doc_id)
+        if entry is None or self._base_dropped[entry[0]]:
+            return
+        part, length = entry
+        self.removed.add(doc_id)
+        self._removed_arr = None
+        self._base_n[part] -= 1
+        self._base_len[part] -= length
+
+    def _apply_add(self, doc_id, team, tf, bucket=UNDATED_BUCKET):
+        if doc_id in self.doc_terms:
+            self._apply_remove(doc_id)
+        else:
+            self._hide_base(doc_id)
+        key = (team, bucket)
+        part = self.partitions.setdefault(key, _Partition())
+        for term, count in tf.items():
+            part.postings.setdefault(term, {})[doc_id] = count
+            part._arrays.pop(term, None)
+        length = sum(tf.values())
+        part.doc_len[doc_id] = length
+        part.total_len += length
+        self.doc_terms[doc_id] = (key, tf)
+
+    def _apply_remove(self, doc_id):
+        entry = self.doc_terms.pop(doc_id, None)
+        if entry is None:
+            self._hide_base(doc_id)
+            return
+        key, tf = entry
+        part = self.partitions[key]
+        for term in tf:
+            part._arrays.pop(term, None)
+            plist = part.postings.get(term)
+            if plist is not None:
+                plist.pop(doc_id, None)
+                if not plist:
+                    del part.postings[term]
+        part.total_len -= part.doc_len.pop(doc_id, 0)
+        if not part.doc_len:
+            del self.partitions[key]
+
+    def _apply_drop_before(self, bucket):
+        for key in [key for key in self.partitions if UNDATED_BUCKET != key[1] < bucket]:
+            for doc_id in self.partitions.pop(key).doc_len:
+                del self.doc_terms[doc_id]
+        if self.base is not None:
+            for i, (_, b) in enumerate(self.base.partitions):
+                if UNDATED_BUCKET != b < bucket:
+                    self._base_dropped[i] = True
+                    self._base_n[i] = self._base_len[i] = 0
+
+    def add(self, doc_id, text, team_tag=None, bucket=UNDATED_BUCKET):
+        self.add_many([(doc_id, text, team_tag, bucket)])
+
+    def add_many(self, docs):
+        """Index (doc_id, text, team_tag, time_bucket) tuples."""
+        records = [
+            {
+                "op": "add",
+                "id": int(doc_id),
+                "team": team_tag or "",
+                "bucket": int(bucket),
+                "tf": dict(Counter(tokenize(text))),
+            }
+            for doc_id, text, team_tag, bucket in docs
+        ]
+        if records:
+            self._commit(records)
+
+    def remove(self, doc_ids):
+        records = [{"op": "remove", "id": int(doc_id)} for doc_id in doc_ids]
+        if records:
+            self._commit(records)
+
+    def _partition_sizes(self):
+        """(key, documents, total length) of every non-empty partition, snapshot and overlay."""
+        sizes: dict[tuple[str, int], list[int]] = {}
+        if self.base is not None:
+            for key, n, length in zip(self.base.partitions, self._base_n.tolist(), self._base_len.tolist()):
+                if n:
+                    sizes[key] = [n, length]
+        for key, part in self.partitions.items():
+            entry = sizes.setdefault(key, [0, 0])
+            entry[0] += len(part.doc_len)
+            entry[1] += part.total_len
+        return sizes
+
+    def drop_buckets_before(self, bucket: int) -> int:
+        """Drop every dated partition older than `bucket`; returns the documents removed."""
+        with self._lock:
+            self.refresh()
+            dropped = sum(
+                n for (_, b), (n, _) in self._partition_sizes().items() if UNDATED_BUCKET != b < bucket
+            )
+        if dropped:
+            self._commit([{"op": "drop_before", "bucket": int(bucket)}])
+        return dropped
+
+    def clear(self):
+        with self._lock, locked(self.log_path):
+            self._reset_state()
+            self._compact()
+
+    def __len__(self):
+        return int(self._base_n.sum()) + len(self.doc_terms)
+
+    # ── search ───────────────────────────────────────────────────
+
+    def _idf(self, n, df):
+        # Non-negative BM25 idf, so very common terms never subtract score
+        return math.log((n - df + 0.5) / (df + 0.5) + 1.0)
+
+    def search(self, query, k, team=None, min_bucket=None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k over one team's partitions (or all teams), restricted to time
+        buckets >= `min_bucket` plus undated documents when it is given.
+        Returns (doc_ids, scores) arrays, best first.
+        """
+        self.refresh()
+        terms = set(tokenize(query))
+        empty = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        def matches(key):
+            part_team, bucket = key
+            return (team is None or part_team == team) and (
+                min_bucket is None or bucket >= min_bucket or bucket == UNDATED_BUCKET
+            )
+
+        with self._lock:
+            sizes = [size for key, size in self._partition_sizes().items() if matches(key)]
+            n = sum(docs for docs, _ in sizes)
+            if not n or not terms:
+                return empty
+            avgdl = sum(length for _, length in sizes) / n
+            parts = [part for key, part in self.partitions.items() if matches(key)]
+            base = self.base
+            if base is not None:
+                allowed = np.array([matches(key) for key in base.partitions], dtype=bool) & ~self._base_dropped
+                removed = self._removed_array()
+
+            hit_ids, hit_scores = [], []
+            for term in terms:
+                arrays = [p.term_arrays(term) for p in parts if term in p.postings]
+                span = base.term_range(term) if base is not None else None
+                if span is not None:
+                    lo, hi = span
+                    keep = allowed[base.post_part[lo:hi]]
+                    ids = base.post_doc[lo:hi]
+                    if len(removed):
+                        keep &= ~np.isin(ids, removed)
+                    if keep.any():
+                        arrays.append((
+                            ids[keep],
+                            base.post_tf[lo:hi][keep].astype(np.float64),
+                            base.post_len[lo:hi][keep].astype(np.float64),
+                        ))
+                if not arrays:
+                    continue
+                idf = self._idf(n, sum(len(a[0]) for a in arrays))
+                for ids, tfs, lens in arrays:
+                    norm = self.k1 * (1 - self.b + self.b * lens / avgdl)
+                    hit_ids.append(ids)
+                    hit_scores.append(idf * tfs * (self.k1 + 1) / (tfs + norm))
+
+        if not hit_ids:
+            return empty
+        ids, inverse = np.unique(np.concatenate(hit_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(hit_scores))
+        return top_k(ids, scores, k)
+
+
+_sparse_index: SparseIndex | None = None
+_sparse_lock = threading.Lock()
+
+
+def get_sparse_index() -> SparseIndex:
+    """Process-wide sparse index (loaded once, refreshed incrementally)."""
+    global _sparse_index
+    if _sparse_index is None:
+        with _sparse_lock:
+            if _sparse_index is None:
+                _sparse_index = SparseIndex()
+    return _sparse_index
+
+
+def search_task(query, k, team=None, min_bucket=None):
+    """CPU-pool task: BM25 over this process's index (postings memory-mapped from the shared snapshot)."""
+    return get_sparse_index().search(query, k, team=team, min_bucket=min_bucket)
@@ -1,8 +1,11 @@
-from langsmith import traceable
-@traceable(name="denseretriver")
-class DenseRetriever:
-    def __init__(self, vector_store):
-        self.store = vector_store
-
-    def search(self, query, k):
-        return self.store.search(query, k)
+from langsmith import traceable
+@traceable(name="denseretriver")
+class DenseRetriever:
+    def __init__(self, vector_store):
+        self.store = vector_store
+
+    def search(self, query, k, **filters):
+        return self.store.search(query, k, **filters)
+
+    async def search_async(self, query, k, **filters):
+        return await self.store.search_async(query, k, **filters)
@@ -0,0 +1,68 @@
+"""
+Fused ranking of dense and sparse candidates, keyed by document id.
+
+RRF, normalized score fusion and recency are computed together over
+preallocated arrays, so two incidents with identical text stay distinct and
+no per-stage text dicts are built.
+"""
+
+import numpy as np
+from langsmith import traceable
+
+from retrieval.recency import recency_arrays, recency_scores
+
+
+@traceable(name="fused_ranking")
+def fuse(
+    dense: list[dict],
+    sparse: list[dict],
+    now: float,
+    rrf_k: int = 60,
+    semantic_weight: float = 0.5,
+    bm25_weight: float = 0.3,
+    recency_weight: float = 0.2,
+) -> list[dict]:
+    """
+    Rank the union of dense hits ({id, text, score, metadata}) and sparse hits
+    ({id, text, bm25_score, metadata}), each list in retrieval order.
+
+    final = semantic_weight * score / max(score) + bm25_weight * bm25
+            + recency_weight * recency, ties broken by RRF.
+    Returns {id, text, metadata, scores} best first, where `scores` holds the
+    dense, bm25, rrf, recency and final components.
+    """
+    slot: dict[int, int] = {}
+    docs: list[dict] = []
+    for d in (*dense, *sparse):
+        if d["id"] not in slot:
+            slot[d["id"]] = len(docs)
+            docs.append(d)
+    if not docs:
+        return []
+
+    n = len(docs)
+    dense_idx = np.fromiter((slot[d["id"]] for d in dense), dtype=np.int64, count=len(dense))
+    sparse_idx = np.fromiter((slot[d["id"]] for d in sparse), dtype=np.int64, count=len(sparse))
+
+    sem = np.zeros(n)
+    sem[dense_idx] = [d.get("score", 0) for d in dense]
+    bm25 = np.zeros(n)
+    bm25[sparse_idx] = [d.get("bm25_score", 0) for d in sparse]
+    rrf = np.zeros(n)
+    np.add.at(rrf, dense_idx, 1.0 / (rrf_k + np.arange(len(dense))))
+    np.add.at(rrf, sparse_idx, 1.0 / (rrf_k + np.arange(len(sparse))))
+    rec = recency_scores(*recency_arrays([d.get("metadata", {}) or {} for d in docs]), now)
+
+    final = semantic_weight * sem / (sem.max() or 1.0) + bm25_weight * bm25 + recency_weight * rec
+    order = np.lexsort((-rrf, -final))
+
+    columns = np.stack([sem, bm25, rrf, rec, final], axis=1)[order].tolist()
+    return [
+        {
+            "id": docs[i]["id"],
+            "text": docs[i]["text"],
+            "metadata": docs[i].get("metadata", {}) or {},
+            "scores": {"dense": s, "bm25": b, "rrf": r, "recency": t, "final": f},
+        }
+        for i, (s, b, r, t, f) in zip(order.tolist(), columns)
+    ]
@@ -1,77 +1,117 @@
-"""Recency weighting for time-aware retrieval."""
-
-from datetime import datetime, timezone
-from typing import Optional
-
-from config import RECENCY_WINDOWS
-
-
-def _parse_timestamp(ts: str | None) -> Optional[datetime]:
-    if not ts:
-        return None
-    try:
-        if ts.endswith("Z"):
-            ts = ts[:-1] + "+00:00"
-        dt = datetime.fromisoformat(ts)
-        if dt.tzinfo:
-            dt = dt.replace(tzinfo=None)
-        return dt
-    except (ValueError, TypeError):
-        return None
-
-
-def recency_window_days(severity: str | None) -> int:
-    sev = (severity or "normal").lower()
-    return RECENCY_WINDOWS.get(sev, RECENCY_WINDOWS.get("normal", 30))
-
-
-def recency_score(timestamp: str | None, severity: str | None = None) -> float:
-    """
-    Exponential decay score in [0, 1]. Recent incidents score higher.
-    Half-life is proportional to severity window.
-    """
-    dt = _parse_timestamp(timestamp)
-    if dt is None:
-        return 0.3
-
-    age_days = (datetime.utcnow() - dt).total_seconds() / 86400
-    window = recency_window_days(severity)
-    if age_days > window:
-        return 0.0
-
-    half_life = max(window / 3, 1)
-    import math
-    return math.exp(-0.693 * age_days / half_life)
-
-
-def within_recency_window(timestamp: str | None, severity: str | None = None) -> bool:
-    dt = _parse_timestamp(timestamp)
-    if dt is None:
-        return True
-    age_days = (datetime.utcnow() - dt).total_seconds() / 86400
-    return age_days <= recency_window_days(severity)
-
-
-def apply_recency_boost(
-    docs: list[dict],
-    semantic_weight: float = 0.5,
-    bm25_weight: float = 0.3,
-    recency_weight: float = 0.2,
-) -> list[dict]:
-    """Combine normalized scores with recency for final ranking."""
-    if not docs:
-        return []
-
-    max_score = max((d.get("score", 0) for d in docs), default=1.0) or 1.0
-
-    boosted = []
-    for d in docs:
-        meta = d.get("metadata", {}) or {}
-        sem = d.get("score", 0) / max_score
-        bm25 = d.get("bm25_score", 0)
-        rec = recency_score(meta.get("timestamp"), meta.get("severity"))
-        final = semantic_weight * sem + bm25_weight * bm25 + recency_weight * rec
-        boosted.append({**d, "recency_score": rec, "final_score": final})
-
-    boosted.sort(key=lambda x: x["final_score"], reverse=True)
-    return boosted
+"""Recency weighting for time-aware retrieval."""
+
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+
+from config import RECENCY_WINDOWS, TIME_BUCKET_DAYS
+
+UNDATED_BUCKET = -1
+
+
+def _parse_timestamp(ts: str | None) -> Optional[datetime]:
+    if not ts:
+        return None
+    try:
+        if ts.endswith("Z"):
+            ts = ts[:-1] + "+00:00"
+        dt = datetime.fromisoformat(ts)
+        if dt.tzinfo:
+            dt = dt.replace(tzinfo=None)
+        return dt
+    except (ValueError, TypeError):
+        return None
+
+
+def to_epoch(timestamp: str | None) -> float | None:
+    """ISO timestamp (naive = UTC, as stored at ingest) -> epoch seconds."""
+    dt = _parse_timestamp(timestamp)
+    if dt is None:
+        return None
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+def time_bucket(ts: float | None) -> int:
+    """Partition for an epoch timestamp; undated documents share UNDATED_BUCKET."""
+    if ts is None or ts != ts:  # None or NaN
+        return UNDATED_BUCKET
+    return int(ts // (TIME_BUCKET_DAYS * 86400))
+
+
+def bucket_start(bucket: int) -> float:
+    """Epoch seconds at which `bucket` begins."""
+    return float(bucket * TIME_BUCKET_DAYS * 86400)
+
+
+def time_buckets(ts: np.ndarray) -> np.ndarray:
+    """Vectorized `time_bucket` over an array of epoch seconds (NaN = undated)."""
+    buckets = np.floor_divide(ts, TIME_BUCKET_DAYS * 86400)
+    return np.where(np.isnan(ts), UNDATED_BUCKET, buckets).astype(np.int64)
+
+
+def min_time_bucket(severity: str | None = None, now: float | None = None) -> int:
+    """
+    Oldest bucket a query can need: the severity's window if filtered, else the
+    largest window. Older partitions cannot pass `within_recency_window`.
+    """
+    days = recency_window_days(severity) if severity else max(RECENCY_WINDOWS.values())
+    now = _now() if now is None else now
+    return time_bucket(now - days * 86400)
+
+
+def recency_window_days(severity: str | None) -> int:
+    sev = (severity or "normal").lower()
+    return RECENCY_WINDOWS.get(sev, RECENCY_WINDOWS.get("normal", 30))
+
+
+def recency_arrays(metadatas: list[dict]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (epoch seconds, window days) per document. `ts` is written at ingest;
+    older records without it fall back to parsing `timestamp`. NaN = undated.
+    """
+    ts = np.full(len(metadatas), np.nan)
+    windows = np.empty(len(metadatas))
+    for i, meta in enumerate(metadatas):
+        value = meta.get("ts")
+        if value is None:
+            value = to_epoch(meta.get("timestamp"))
+        if value is not None:
+            ts[i] = value
+        windows[i] = recency_window_days(meta.get("severity"))
+    return ts, windows
+
+
+def recency_scores(ts: np.ndarray, windows: np.ndarray, now: float) -> np.ndarray:
+    """
+    Exponential decay scores in [0, 1]. Recent incidents score higher; the
+    half-life is a third of the severity window. Undated documents score 0.3.
+    """
+    age_days = (now - ts) / 86400
+    half_life = np.maximum(windows / 3, 1)
+    scores = np.where(age_days > windows, 0.0, np.exp(-0.693 * age_days / half_life))
+    return np.where(np.isnan(ts), 0.3, scores)
+
+
+def in_recency_window(ts: np.ndarray, windows: np.ndarray, now: float) -> np.ndarray:
+    """Boolean mask of documents inside their severity window (undated always pass)."""
+    return np.isnan(ts) | ((now - ts) / 86400 <= windows)
+
+
+def _now() -> float:
+    return datetime.now(timezone.utc).timestamp()
+
+
+def recency_score(timestamp: str | None, severity: str | None = None, now: float | None = None) -> float:
+    """Single-document `recency_scores`."""
+    ts = to_epoch(timestamp)
+    if ts is None:
+        return 0.3
+    return float(recency_scores(np.array([ts]), np.array([recency_window_days(severity)]), now or _now())[0])
+
+
+def within_recency_window(timestamp: str | None, severity: str | None = None, now: float | None = None) -> bool:
+    ts = to_epoch(timestamp)
+    if ts is None:
+        return True
+    return ((now or _now()) - ts) / 86400 <= recency_window_days(severity)
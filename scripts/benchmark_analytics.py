@@ -0,0 +1,140 @@
+"""
+Dashboard analytics benchmark over growing synthetic tables.
+
+Fills the query, issue and incident tables of a throwaway SQLite database
+(in a temporary directory; ./rag_analytics.db is never touched) up to each
+--sizes row count, spread over the last 30 days, rebuilds the minute/hour
+rollups from them (the bulk insert bypasses the write-path increments),
+then times every /analytics/dashboard aggregate over the full 720-hour
+window and records its peak Python allocation (tracemalloc). The
+aggregates read rollup rows, so latency follows the number of buckets in
+the window rather than the number of events; only top_questions still
+scans the raw query table.
+
+Usage:
+  python -m scripts.benchmark_analytics [--sizes 10k,100k,1m] [--repeat 5] [--json bench.json]
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WINDOW_HOURS = 720
+TEAMS = ("devops", "security", "backend", "frontend", "data")
+SEVERITIES = ("critical", "high", "medium", "low")
+SERVICES = ("payments", "auth", "search", "checkout", "gateway", "inventory")
+ISSUE_TYPES = ("alert", "error", "latency", "outage", "deploy")
+
+
+def _parse_size(value: str) -> int:
+    value = value.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * scale)
+
+
+def _fill(start: int, stop: int, rng: random.Random, batch: int = 20_000):
+    """Insert rows [start, stop) into all three tables with executemany batches."""
+    from core.analytics import IssueAnalytic, QueryAnalytic, engine
+    from core.incidents import Incident
+
+    now = datetime.utcnow()
+    for lo in range(start, stop, batch):
+        queries, issues, incidents = [], [], []
+        for i in range(lo, min(lo + batch, stop)):
+            ts = now - timedelta(seconds=rng.uniform(0, WINDOW_HOURS * 3600))
+            team = rng.choice(TEAMS)
+            queries.append({
+                "query_id": f"q{i}", "question": f"why is {rng.choice(SERVICES)} slow #{i % 500}",
+                "team": team, "response_time": rng.uniform(50, 3000), "accuracy": rng.random(), "timestamp": ts,
+            })
+            issues.append({
+                "issue_id": f"i{i}", "issue_type": rng.choice(ISSUE_TYPES), "team": team,
+                "text": "synthetic issue", "timestamp": ts,
+            })
+            incidents.append({
+                "incident_id": f"inc{i}", "status": "RESOLVED" if i % 3 else "OPEN",
+                "severity": rng.choice(SEVERITIES), "service": rng.choice(SERVICES), "team": team,
+                "text": "synthetic incident", "created_at": ts,
+                "resolved_at": ts + timedelta(minutes=rng.uniform(5, 600)) if i % 3 else None,
+                "archived": False,
+            })
+        with engine.begin() as conn:
+            conn.execute(QueryAnalytic.__table__.insert(), queries)
+            conn.execute(IssueAnalytic.__table__.insert(), issues)
+            conn.execute(Incident.__table__.insert(), incidents)
+
+
+def _aggregates() -> dict:
+    from core.analytics import AnalyticsManager
+    from core.incidents import IncidentManager
+
+    return {
+        "query_stats": lambda: AnalyticsManager.get_query_stats(WINDOW_HOURS),
+        "issue_stats": lambda: AnalyticsManager.get_issue_stats(WINDOW_HOURS),
+        "time_series": lambda: AnalyticsManager.get_time_series(WINDOW_HOURS),
+        "mttr": lambda: IncidentManager.get_mttr_stats(WINDOW_HOURS),
+        "severity": lambda: IncidentManager.get_severity_distribution(WINDOW_HOURS),
+        "top_services": lambda: IncidentManager.get_top_services(WINDOW_HOURS),
+    }
+
+
+def _measure(fn, repeat: int) -> dict:
+    fn()  # warm the page cache and statement cache
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"median_ms": round(statistics.median(times), 3), "peak_kb": round(peak / 1024, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10k,100k", help="comma-separated row counts per table, ascending")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", help="write results here")
+    args = parser.parse_args()
+    json_path = os.path.abspath(args.json_path) if args.json_path else None
+
+    sys.path.insert(0, REPO_ROOT)
+    with tempfile.TemporaryDirectory(prefix="bench-analytics-") as workdir:
+        os.chdir(workdir)  # the analytics engine opens ./rag_analytics.db
+        from jobs.rollup_backfill import run_rollup_backfill
+
+        rng = random.Random(0)
+        aggregates = _aggregates()
+        runs, filled = [], 0
+        for size in sorted(map(_parse_size, args.sizes.split(","))):
+            print(f"Filling to {size:,} rows per table...", flush=True)
+            _fill(filled, size, rng)
+            filled = size
+            run_rollup_backfill()
+            results = {name: _measure(fn, args.repeat) for name, fn in aggregates.items()}
+            runs.append({"rows": size, "aggregates": results})
+
+            print(f"\n{size:,} rows — {WINDOW_HOURS}h window")
+            print(f"  {'aggregate':<14} {'median ms':>10} {'peak KB':>9}")
+            for name, r in results.items():
+                print(f"  {name:<14} {r['median_ms']:>10.3f} {r['peak_kb']:>9.1f}")
+            print()
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({"window_hours": WINDOW_HOURS, "runs": runs}, f, indent=2)
+        print(f"Wrote {json_path}")
+
+
+if __name__ == "__main__":
+    main()
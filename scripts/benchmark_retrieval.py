@@ -0,0 +1,371 @@
+"""
+Retrieval benchmark over synthetic incident corpora.
+
+Builds a corpus with `simulation.alert_generator.generate_batch` (spread over
+all teams and the last 180 days), ingests it, then runs the retrieve_node
+stages — embed, dense, sparse, hydrate, fusion, rerank — and reports:
+
+  - p50/p95/p99 latency per stage (sequential queries),
+  - QPS of the whole pipeline under --concurrency threads,
+  - RSS memory after ingest,
+  - dense recall@k against exact search (unfiltered queries).
+
+Each (backend, size) runs in a fresh subprocess inside a temporary directory,
+so ./data is never touched and memory figures are per run. FAISS uses its
+normal on-disk backend (index type from FAISS_INDEX_TYPE, applied by
+`maintain_index`); Qdrant runs embedded in memory (QDRANT_LOCATION=":memory:").
+
+Results are written as a JSON baseline; --compare diffs against an older one
+and exits non-zero on regressions beyond --tolerance.
+
+Usage:
+  python -m scripts.benchmark_retrieval [--sizes 1k,100k,1m] [--backends faiss,qdrant]
+      [--queries 200] [--k 8] [--concurrency 8] [--json bench.json] [--compare baseline.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STAGES = ("embed", "dense", "sparse", "hydrate", "fusion", "rerank", "total")
+CORPUS_DAYS = 180
+
+
+def _parse_size(value: str) -> int:
+    value = value.strip().lower()
+    scale = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * scale)
+
+
+# ── corpus / queries ─────────────────────────────────────────────
+
+
+def _corpus_batches(size: int, batch: int, seed: int = 0):
+    """Yield (texts, metadatas) batches; teams rotate per batch, timestamps are uniform."""
+    from simulation.alert_generator import TEAMS, generate_batch
+
+    random.seed(seed)  # generate_alert draws from the module-level RNG
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    for start in range(0, size, batch):
+        team = TEAMS[(start // batch) % len(TEAMS)]
+        texts, metadatas = [], []
+        for i, event in enumerate(generate_batch(min(batch, size - start), team), start):
+            meta = event["metadata"]
+            # Templates repeat; a host suffix keeps texts (and embeddings) distinct
+            texts.append(f"{event['text']} (host {meta['service']}-{rng.randrange(10_000)})")
+            metadatas.append({
+                **meta,
+                "team_tag": team,
+                "issue_id": f"BENCH-{i}",
+                "incident_id": f"BENCH-{i}",
+                "issue_type": event["type"],
+                "timestamp": (now - timedelta(seconds=rng.uniform(0, CORPUS_DAYS * 86400))).isoformat(),
+            })
+        yield texts, metadatas
+
+
+def _queries(n: int, seed: int = 1) -> list[dict]:
+    """Alert-style questions; every other one is team-filtered, every fourth severity-filtered."""
+    from simulation.alert_generator import ALERT_TEMPLATES, SERVICES, TEAMS
+
+    rng = random.Random(seed)
+    queries = []
+    for i in range(n):
+        title, severity, _ = rng.choice(ALERT_TEMPLATES)
+        queries.append({
+            "query": f"{title} {rng.choice(SERVICES)}",
+            "team": rng.choice(TEAMS) if i % 2 else None,
+            "severity": severity if i % 4 == 3 else None,
+        })
+    return queries
+
+
+# ── pipeline ─────────────────────────────────────────────────────
+
+
+def _run_pipeline(vs, q: dict, k: int, timings: dict | None = None) -> list[dict]:
+    """The retrieve_node stages (without guardrails), timing each into `timings`."""
+    from core.embeddings import EmbeddingModel
+    from retrieval.fusion import fuse
+    from retrieval.recency import min_time_bucket
+    from retrieval.rerank import simple_rerank
+
+    query, team, severity = q["query"], q["team"], q["severity"]
+    marks = [("start", time.perf_counter())]
+
+    def mark(stage):
+        marks.append((stage, time.perf_counter()))
+
+    now = time.time()
+    min_bucket = min_time_bucket(severity, now)
+    EmbeddingModel.encode([query])
+    mark("embed")
+    dense = vs.search(query, k, team_tag=team, severity=severity, min_bucket=min_bucket)
+    mark("dense")
+    sparse_ids, sparse_scores = vs.sparse_search(query, k, team_tag=team, min_bucket=min_bucket)
+    mark("sparse")
+    sparse_meta = vs.get_documents(sparse_ids.tolist())
+    sparse_docs = [
+        {"id": i, "text": sparse_meta[i]["text"], "bm25_score": s,
+         "metadata": sparse_meta[i].get("metadata", {})}
+        for i, s in zip(sparse_ids.tolist(), sparse_scores.tolist())
+        if i in sparse_meta
+    ]
+    mark("hydrate")
+    fused = fuse(dense, sparse_docs, now)
+    mark("fusion")
+    reranked = simple_rerank(query, fused)
+    mark("rerank")
+
+    if timings is not None:
+        for (_, before), (stage, after) in zip(marks, marks[1:]):
+            timings[stage].append((after - before) * 1000)
+        timings["total"].append((marks[-1][1] - marks[0][1]) * 1000)
+    return reranked
+
+
+def _exact_ids(vs, queries: list[str], k: int) -> list[set] | None:
+    """Ground-truth top-k ids by exhaustive search (None if the FAISS index is lossy)."""
+    from core.embeddings import EmbeddingModel
+
+    backend = vs._backend
+    if hasattr(backend, "vectors"):
+        extracted = backend.vectors()
+        if extracted is None:
+            return None
+        ids, vecs = extracted
+        truth = []
+        for q in queries:
+            q_emb = EmbeddingModel.encode([q])[0]
+            q_emb = q_emb / (np.linalg.norm(q_emb) or 1.0)
+            scores = vecs @ q_emb
+            top = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+            truth.append(set(ids[top].tolist()))
+        return truth
+
+    from qdrant_client.models import SearchParams
+
+    truth = []
+    for q in queries:
+        result = backend.client.query_points(
+            collection_name=backend.collection,
+            query=EmbeddingModel.encode([q])[0].tolist(),
+            limit=k,
+            search_params=SearchParams(exact=True),
+        )
+        truth.append({int(p.id) for p in result.points})
+    return truth
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _percentiles(values: list[float]) -> dict:
+    arr = np.asarray(values)
+    return {f"p{p}_ms": round(float(np.percentile(arr, p)), 3) for p in (50, 95, 99)}
+
+
+def run_one(backend: str, size: int, n_queries: int, k: int, concurrency: int) -> dict:
+    """One benchmark run in the current process (expects a scratch working directory)."""
+    from config import INGEST_BATCH_MAX
+    from core.vector_store import VectorStore
+
+    vs = VectorStore()
+    vs.reset()
+
+    start = time.perf_counter()
+    for texts, metadatas in _corpus_batches(size, INGEST_BATCH_MAX):
+        vs.add_documents(texts, metadatas)
+    ingest_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vs.maintain_index()
+    maintain_s = time.perf_counter() - start
+
+    queries = _queries(n_queries)
+    for q in queries[:10]:
+        _run_pipeline(vs, q, k)  # warm-up: caches, lazy bitmaps, page cache
+
+    timings = defaultdict(list)
+    for q in queries:
+        _run_pipeline(vs, q, k, timings)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda q: _run_pipeline(vs, q, k), queries))
+    qps = len(queries) / (time.perf_counter() - start)
+
+    unfiltered = [q["query"] for q in queries if not q["team"] and not q["severity"]]
+    truth = _exact_ids(vs, unfiltered, k)
+    recall = None
+    if truth is not None:
+        hits = sum(
+            len({d["id"] for d in vs.search(query, k)} & expected)
+            for query, expected in zip(unfiltered, truth)
+        )
+        recall = round(hits / max(sum(len(t) for t in truth), 1), 4)
+
+    return {
+        "backend": backend,
+        "size": size,
+        "ingest_docs_per_s": round(size / ingest_s, 1),
+        "maintain_s": round(maintain_s, 2),
+        "stages": {stage: _percentiles(timings[stage]) for stage in STAGES},
+        "qps": round(qps, 1),
+        "concurrency": concurrency,
+        f"recall@{k}": recall,
+        "rss_mb": round(_rss_mb(), 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "index": vs.index_info(),
+    }
+
+
+def _spawn(backend: str, size: int, args) -> dict:
+    """Run one benchmark in a child process with its own data directory."""
+    with tempfile.TemporaryDirectory(prefix="ragbench-") as workdir:
+        out_path = os.path.join(workdir, "result.json")
+        env = dict(os.environ, VECTOR_BACKEND=backend)
+        env["PYTHONPATH"] = os.pathsep.join(filter(None, [REPO_ROOT, env.get("PYTHONPATH")]))
+        if backend == "qdrant":
+            env["QDRANT_LOCATION"] = ":memory:"
+        cmd = [
+            sys.executable, "-m", "scripts.benchmark_retrieval",
+            "--worker", backend, str(size), out_path,
+            "--queries", str(args.queries), "--k", str(args.k), "--concurrency", str(args.concurrency),
+        ]
+        subprocess.run(cmd, cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL)
+        with open(out_path) as f:
+            return json.load(f)
+
+
+# ── baseline diff ────────────────────────────────────────────────
+
+
+def _metrics(run: dict) -> dict[str, tuple[float, bool]]:
+    """Flattened {name: (value, higher_is_better)} for comparison."""
+    out = {}
+    for stage, pct in run["stages"].items():
+        for name, value in pct.items():
+            out[f"{stage}.{name}"] = (value, False)
+    out["qps"] = (run["qps"], True)
+    out["rss_mb"] = (run["rss_mb"], False)
+    for key, value in run.items():
+        if key.startswith("recall@"):
+            out[key] = (value, True)
+    return out
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Lines describing every metric that got worse by more than `tolerance` (relative)."""
+    old_runs = {(r["backend"], r["size"]): r for r in baseline.get("runs", [])}
+    regressions = []
+    for run in current["runs"]:
+        old = old_runs.get((run["backend"], run["size"]))
+        if old is None:
+            continue
+        old_metrics = _metrics(old)
+        for name, (value, higher_is_better) in _metrics(run).items():
+            if name not in old_metrics:
+                continue
+            before = old_metrics[name][0]
+            if not before or value is None:
+                continue
+            change = (value - before) / before
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(
+                    f"{run['backend']}/{run['size']} {name}: {before} -> {value} ({change:+.1%})"
+                )
+    return regressions
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_run(run: dict, k: int):
+    recall = run[f"recall@{k}"]
+    print(f"\n{run['backend']} / {run['size']:,} docs — ingest {run['ingest_docs_per_s']:,.0f} docs/s, "
+          f"{run['qps']:.1f} QPS @ {run['concurrency']} threads, "
+          f"recall@{k} {'n/a' if recall is None else f'{recall:.3f}'}, RSS {run['rss_mb']:.0f} MB")
+    print(f"  {'stage':<10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, pct in run["stages"].items():
+        print(f"  {stage:<10} {pct['p50_ms']:>9.3f} {pct['p95_ms']:>9.3f} {pct['p99_ms']:>9.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1k", help="comma-separated corpus sizes, e.g. 1k,100k,1m")
+    parser.add_argument("--backends", default="faiss,qdrant")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--json", dest="json_path", help="write results here (the next run's baseline)")
+    parser.add_argument("--compare", dest="baseline_path", help="diff against an earlier --json file")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change counted as a regression")
+    parser.add_argument("--worker", nargs=3, metavar=("BACKEND", "SIZE", "OUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        backend, size, out_path = args.worker
+        result = run_one(backend, int(size), args.queries, args.k, args.concurrency)
+        with open(out_path, "w") as f:
+            json.dump(result, f)
+        return
+
+    report = {
+        "commit": _git_commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "settings": {"queries": args.queries, "k": args.k, "concurrency": args.concurrency},
+        "runs": [],
+    }
+    for backend in args.backends.split(","):
+        for size in map(_parse_size, args.sizes.split(",")):
+            print(f"Running {backend} with {size:,} documents...", flush=True)
+            run = _spawn(backend, size, args)
+            report["runs"].append(run)
+            _print_run(run, args.k)
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.json_path}")
+
+    if args.baseline_path:
+        with open(args.baseline_path) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) vs {args.baseline_path}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions vs {args.baseline_path} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
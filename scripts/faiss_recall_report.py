@@ -0,0 +1,123 @@
+"""
+Recall-vs-latency report for the FAISS ANN index types.
+
+Builds each index type over the stored FAISS corpus (or a synthetic one) and
+sweeps nprobe / efSearch, comparing top-k results against the exact flat
+index.
+
+Usage:
+  python -m scripts.faiss_recall_report [--synthetic 200000] [--queries 200] [--k 10] [--json out.json]
+"""
+
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from config import EMBEDDING_DIM
+from core.vector_backends.faiss_index import build_index, set_search_params
+
+SWEEPS = {
+    "flat": [{}],
+    "hnsw": [{"ef_search": ef} for ef in (16, 32, 64, 128, 256)],
+    "ivf_flat": [{"nprobe": p} for p in (1, 4, 16, 64)],
+    "ivf_pq": [{"nprobe": p} for p in (1, 4, 16, 64)],
+}
+
+
+def _corpus(synthetic: int) -> tuple[np.ndarray, np.ndarray]:
+    if synthetic:
+        rng = np.random.default_rng(0)
+        # Clustered vectors, closer to real embeddings than uniform noise
+        centers = rng.standard_normal((max(synthetic // 500, 8), EMBEDDING_DIM)).astype("float32")
+        vectors = centers[rng.integers(len(centers), size=synthetic)]
+        vectors += 0.5 * rng.standard_normal(vectors.shape).astype("float32")
+        faiss.normalize_L2(vectors)
+        return np.arange(synthetic, dtype="int64"), vectors
+
+    from core.vector_backends.faiss_backend import FaissBackend
+
+    extracted = FaissBackend().vectors()
+    if extracted is None:
+        raise SystemExit("Stored index is lossy (ivf_pq); use --synthetic or rebuild as flat first")
+    return extracted
+
+
+def _timed_search(index, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """One query at a time, as the API issues them. Returns (ids, per-query ms)."""
+    out = np.empty((len(queries), k), dtype="int64")
+    latencies = np.empty(len(queries))
+    for i, q in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(q[None, :], k)
+        latencies[i] = (time.perf_counter() - start) * 1000
+        out[i] = ids[0]
+    return out, latencies
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f[f >= 0]) & set(t[t >= 0])) for f, t in zip(found, truth))
+    return hits / max(int((truth >= 0).sum()), 1)
+
+
+def run(synthetic: int, n_queries: int, k: int, kinds: list[str]) -> list[dict]:
+    ids, vectors = _corpus(synthetic)
+    if not len(ids):
+        raise SystemExit("Corpus is empty")
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), min(n_queries, len(vectors)), replace=False)].copy()
+    queries += 0.05 * rng.standard_normal(queries.shape).astype("float32")
+    faiss.normalize_L2(queries)
+
+    flat = build_index("flat", vectors, ids)
+    truth, _ = _timed_search(flat, queries, k)
+
+    rows = []
+    for kind in kinds:
+        start = time.perf_counter()
+        index = build_index(kind, vectors, ids)
+        build_s = time.perf_counter() - start
+        for params in SWEEPS[kind]:
+            set_search_params(index, **params)
+            found, latencies = _timed_search(index, queries, k)
+            rows.append({
+                "index": kind,
+                "params": params,
+                "corpus": len(ids),
+                f"recall@{k}": round(_recall(found, truth), 4),
+                "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+                "build_s": round(build_s, 2),
+            })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic vectors instead of data/")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--kinds", default="flat,hnsw,ivf_flat,ivf_pq")
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    rows = run(args.synthetic, args.queries, args.k, args.kinds.split(","))
+    flat_p50 = next((r["p50_ms"] for r in rows if r["index"] == "flat"), None)
+
+    print(f"{'index':<10} {'params':<18} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p95 ms':>8} {'speedup':>8}")
+    for r in rows:
+        params = ",".join(f"{key}={v}" for key, v in r["params"].items()) or "-"
+        speedup = f"{flat_p50 / r['p50_ms']:.1f}x" if flat_p50 and r["p50_ms"] else "-"
+        print(f"{r['index']:<10} {params:<18} {r[f'recall@{args.k}']:>10.3f} "
+              f"{r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} {speedup:>8}")
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Wrote {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+"""
+One-time migration: upper-case `status` (missing = OPEN) and lower-case
+`severity` on Qdrant points ingested before payloads were normalized, so
+status/severity filters match them.
+
+Usage:
+  python -m scripts.normalize_qdrant_payloads
+"""
+
+from core.vector_backends.qdrant_backend import QdrantBackend
+
+
+def migrate():
+    backend = QdrantBackend()
+    updated = backend.normalize_payloads()
+    print(f"Normalized status/severity on {updated} points in Qdrant collection '{backend.collection}'")
+
+
+if __name__ == "__main__":
+    migrate()
@@ -1 +1 @@
-"""Simulation package."""
+"""Simulation package."""
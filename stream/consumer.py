@@ -1,23 +1,46 @@
-from kafka import KafkaConsumer
+"""
+Kafka -> vector store indexer.
+
+Batch mode (default): poll up to KAFKA_BATCH_MAX_RECORDS at a time, close a
+batch on size or KAFKA_BATCH_MAX_WAIT_MS, embed + upsert each batch with one
+`add_documents` call (up to KAFKA_INDEX_CONCURRENCY batches in flight), and
+commit offsets only after a batch is indexed — at-least-once delivery.
+
+Records that cannot be indexed (malformed, or failing on their own while the
+rest of their batch indexes) go to KAFKA_DEAD_LETTER_TOPIC and are committed
+past, as is a whole batch still failing after KAFKA_INDEX_MAX_REDELIVERIES
+redeliveries, so one bad record never blocks its partition.
+
+Run: python -m stream.consumer [--mode batch|single]
+"""
+
+import argparse
 import json
-from core.vector_store import VectorStore
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 
-store = VectorStore()
+from kafka import KafkaConsumer, KafkaProducer, OffsetAndMetadata
 
-consumer = KafkaConsumer(
-    "live_issues",
-    bootstrap_servers="localhost:9092",
-    value_deserializer=lambda m: json.loads(m.decode("utf-8")),
-    auto_offset_reset="latest",
-    enable_auto_commit=True,
+from config import (
+    KAFKA_BATCH_MAX_RECORDS,
+    KAFKA_BATCH_MAX_WAIT_MS,
+    KAFKA_BOOTSTRAP_SERVERS,
+    KAFKA_CONSUMER_GROUP,
+    KAFKA_DEAD_LETTER_TOPIC,
+    KAFKA_INDEX_CONCURRENCY,
+    KAFKA_INDEX_MAX_REDELIVERIES,
+    KAFKA_INDEX_MAX_RETRIES,
+    KAFKA_TOPIC,
 )
+from core.vector_store import VectorStore
+
+METRICS_INTERVAL_SECONDS = 10
 
-print("Kafka consumer started...")
+_dead_letter_producer: KafkaProducer | None = None
 
-for message in consumer:
-    event = message.value
-    print("Received:", event)
 
+def event_to_document(event: dict) -> tuple[str, dict]:
     metadata = event.get("metadata", {}) or {}
     team_tag = event.get("team_tag")
     if team_tag:
@@ -28,6 +51,307 @@ for message in consumer:
     metadata.setdefault("timestamp", event.get("timestamp"))
     metadata.setdefault("status", metadata.get("status", "OPEN"))
     metadata.setdefault("severity", metadata.get("severity", "medium"))
+    return event["text"], metadata
+
+
+def _validate(event) -> tuple[str, dict]:
+    """event_to_document for a record that may be malformed; raises ValueError/KeyError if it is."""
+    if not isinstance(event, dict):
+        raise ValueError("not a JSON object")
+    text, metadata = event_to_document(event)
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("empty or non-string text")
+    return text, metadata
+
+
+def _deserialize(raw: bytes):
+    # Undecodable payloads reach validation as text and are dead-lettered there
+    try:
+        return json.loads(raw.decode("utf-8"))
+    except ValueError:
+        return raw.decode("utf-8", "replace")
+
+
+def dead_letter(failed: list[tuple]):
+    """
+    Publish (record, error) pairs to KAFKA_DEAD_LETTER_TOPIC, or only log them
+    when it is unset. Raises unless every record was delivered, so the caller
+    commits past them only once they are safe.
+    """
+    global _dead_letter_producer
+    for record, error in failed:
+        print(f"Dead-lettering {record.topic}-{record.partition}@{record.offset}: {error}")
+    if not failed or not KAFKA_DEAD_LETTER_TOPIC:
+        return
+    if _dead_letter_producer is None:
+        _dead_letter_producer = KafkaProducer(
+            bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+            value_serializer=lambda v: json.dumps(v, default=str).encode("utf-8"),
+        )
+    futures = [
+        _dead_letter_producer.send(KAFKA_DEAD_LETTER_TOPIC, {
+            "topic": record.topic,
+            "partition": record.partition,
+            "offset": record.offset,
+            "error": error,
+            "value": record.value,
+            "failed_at": time.time(),
+        })
+        for record, error in failed
+    ]
+    _dead_letter_producer.flush()
+    for future in futures:
+        future.get()
+
+
+class ConsumerMetrics:
+    """Throughput / lag counters, printed every METRICS_INTERVAL_SECONDS."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.consumed = 0
+        self.indexed = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.dead_lettered = 0
+        self.last_batch_ms = 0.0
+        self.lag: dict[str, int] = {}
+        self._window_start = time.monotonic()
+        self._window_indexed = 0
+
+    def record_batch(self, size: int, elapsed_ms: float):
+        self.batches += 1
+        self.indexed += size
+        self._window_indexed += size
+        self.last_batch_ms = elapsed_ms
+
+    def update_lag(self, consumer: KafkaConsumer):
+        partitions = consumer.assignment()
+        if not partitions:
+            return
+        end_offsets = consumer.end_offsets(list(partitions))
+        self.lag = {
+            f"{tp.topic}-{tp.partition}": max(end_offsets[tp] - consumer.position(tp), 0)
+            for tp in partitions
+        }
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        window = max(now - self._window_start, 1e-9)
+        snap = {
+            "uptime_s": round(now - self.started, 1),
+            "consumed": self.consumed,
+            "indexed": self.indexed,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "dead_lettered": self.dead_lettered,
+            "last_batch_ms": round(self.last_batch_ms, 1),
+            "docs_per_sec": round(self._window_indexed / window, 1),
+            "total_lag": sum(self.lag.values()),
+            "lag": self.lag,
+        }
+        self._window_start, self._window_indexed = now, 0
+        return snap
+
+
+def _add_with_retries(store: VectorStore, texts: list[str], metadatas: list[dict]):
+    for attempt in range(KAFKA_INDEX_MAX_RETRIES + 1):
+        try:
+            store.add_documents(texts, metadatas)
+            return
+        except Exception as e:
+            if attempt == KAFKA_INDEX_MAX_RETRIES:
+                raise
+            print(f"Batch indexing failed (attempt {attempt + 1}): {e}")
+            time.sleep(min(2 ** attempt, 30))
+
+
+def _index_batch(store: VectorStore, events: list) -> tuple[float, list[tuple[int, str]]]:
+    """
+    Embed + upsert one batch, retrying with backoff. Returns (elapsed ms,
+    [(position, error)] of records to dead-letter).
+
+    Malformed records are set aside before indexing. If the rest still fails
+    after the retries, each record is tried on its own and only the failing
+    ones are set aside; when every one fails (store unavailable) the error
+    propagates and the batch is redelivered.
+    """
+    start = time.perf_counter()
+    docs, dead = [], []
+    for pos, event in enumerate(events):
+        try:
+            docs.append((pos, *_validate(event)))
+        except Exception as e:
+            dead.append((pos, f"invalid record: {e!r}"))
+    if docs:
+        _, texts, metadatas = zip(*docs)
+        try:
+            _add_with_retries(store, list(texts), list(metadatas))
+        except Exception:
+            if len(docs) == 1:
+                raise
+            failed = []
+            for pos, text, metadata in docs:
+                try:
+                    store.add_documents([text], [metadata])
+                except Exception as e:
+                    failed.append((pos, f"indexing failed: {e!r}"))
+            if len(failed) == len(docs):
+                raise
+            dead.extend(failed)
+    return (time.perf_counter() - start) * 1000, dead
+
+
+def _make_consumer(enable_auto_commit: bool) -> KafkaConsumer:
+    return KafkaConsumer(
+        KAFKA_TOPIC,
+        bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
+        group_id=KAFKA_CONSUMER_GROUP,
+        value_deserializer=_deserialize,
+        auto_offset_reset="latest",
+        enable_auto_commit=enable_auto_commit,
+    )
+
+
+def run_single(store: VectorStore):
+    """Original one-message-at-a-time mode."""
+    consumer = _make_consumer(enable_auto_commit=True)
+    print("Kafka consumer started (single mode)...")
+    for message in consumer:
+        event = message.value
+        print("Received:", event)
+        try:
+            text, metadata = _validate(event)
+        except Exception as e:
+            dead_letter([(message, f"invalid record: {e!r}")])
+            continue
+        store.add_document(text=text, metadata=metadata)
+        print(f"Stored in Qdrant/FAISS ({len(metadata)} metadata fields)")
+
+
+def run_batched(
+    store: VectorStore,
+    max_records: int = KAFKA_BATCH_MAX_RECORDS,
+    max_wait_ms: float = KAFKA_BATCH_MAX_WAIT_MS,
+    concurrency: int = KAFKA_INDEX_CONCURRENCY,
+):
+    consumer = _make_consumer(enable_auto_commit=False)
+    metrics = ConsumerMetrics()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="indexer")
+    # (future, {tp: next_offset}, {tp: first_offset}, records) in poll order; committed strictly FIFO
+    in_flight: deque[tuple[Future, dict, dict, list]] = deque()
+    # (tp, first offset) of failed batches -> failures so far
+    failures: dict[tuple, int] = {}
+    buffer: list = []
+    buffer_started = 0.0
+    last_report = time.monotonic()
+    print(f"Kafka consumer started (batch mode: {max_records} records / {max_wait_ms:.0f} ms, "
+          f"concurrency {concurrency})...")
+
+    def flush_buffer():
+        nonlocal buffer
+        if not buffer:
+            return
+        next_offsets, first_offsets = {}, {}
+        for tp, record in buffer:
+            next_offsets[tp] = record.offset + 1
+            first_offsets.setdefault(tp, record.offset)
+        records = [record for _, record in buffer]
+        events = [record.value for record in records]
+        in_flight.append((executor.submit(_index_batch, store, events), next_offsets, first_offsets, records))
+        buffer = []
+
+    def commit(next_offsets: dict, first_offsets: dict):
+        consumer.commit({tp: OffsetAndMetadata(o, "") for tp, o in next_offsets.items()})
+        for key in first_offsets.items():
+            failures.pop(key, None)
+
+    def settle(block: bool):
+        """
+        Commit finished batches in order, dead-lettering the records they set
+        aside. A failed batch is rewound for redelivery, or dead-lettered whole
+        once it has failed KAFKA_INDEX_MAX_REDELIVERIES times already.
+        """
+        while in_flight and (block or in_flight[0][0].done()):
+            future, next_offsets, first_offsets, records = in_flight.popleft()
+            batch_size = sum(n - first_offsets[tp] for tp, n in next_offsets.items())
+            try:
+                elapsed_ms, dead = future.result()
+            except Exception as e:
+                metrics.failed_batches += 1
+                attempts = max(failures.get(key, 0) for key in first_offsets.items()) + 1
+                if attempts > KAFKA_INDEX_MAX_REDELIVERIES:
+                    print(f"Batch failed {attempts} times, dead-lettering it: {e}")
+                    dead_letter([(record, f"indexing failed: {e!r}") for record in records])
+                    metrics.dead_lettered += len(records)
+                    commit(next_offsets, first_offsets)
+                    block = False
+                    continue
+                for key in first_offsets.items():
+                    failures[key] = attempts
+                print(f"Batch failed (attempt {attempts}), rewinding for redelivery: {e}")
+                # Rewind every partition to its oldest uncommitted record, dropping
+                # later batches too (they are redelivered; duplicates are allowed)
+                rewind = dict(first_offsets)
+                for f, _, later_first, _ in in_flight:
+                    f.cancel()
+                    for tp, offset in later_first.items():
+                        rewind[tp] = min(rewind.get(tp, offset), offset)
+                for tp, record in buffer:
+                    rewind[tp] = min(rewind.get(tp, record.offset), record.offset)
+                for tp, offset in rewind.items():
+                    consumer.seek(tp, offset)
+                in_flight.clear()
+                buffer.clear()
+                return
+            if dead:
+                dead_letter([(records[pos], error) for pos, error in dead])
+                metrics.dead_lettered += len(dead)
+            commit(next_offsets, first_offsets)
+            metrics.record_batch(batch_size - len(dead), elapsed_ms)
+            block = False
+
+    try:
+        while True:
+            polled = consumer.poll(timeout_ms=min(max_wait_ms, 1000), max_records=max_records - len(buffer))
+            for tp, records in polled.items():
+                if not buffer:
+                    buffer_started = time.monotonic()
+                buffer.extend((tp, r) for r in records)
+                metrics.consumed += len(records)
+
+            if buffer and (
+                len(buffer) >= max_records
+                or (time.monotonic() - buffer_started) * 1000 >= max_wait_ms
+            ):
+                if len(in_flight) >= concurrency:
+                    settle(block=True)  # bounded: wait for the oldest batch
+                flush_buffer()
+            settle(block=False)
+
+            if time.monotonic() - last_report >= METRICS_INTERVAL_SECONDS:
+                metrics.update_lag(consumer)
+                print(f"Consumer metrics: {metrics.snapshot()}")
+                last_report = time.monotonic()
+    finally:
+        flush_buffer()
+        while in_flight:
+            settle(block=True)
+        executor.shutdown(wait=True)
+        consumer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index live_issues events into the vector store")
+    parser.add_argument("--mode", choices=["batch", "single"], default="batch")
+    args = parser.parse_args()
+
+    store = VectorStore()
+    if args.mode == "single":
+        run_single(store)
+    else:
+        run_batched(store)
+
 
-    store.add_document(text=event["text"], metadata=metadata)
-    print(f"Stored in Qdrant/FAISS ({len(metadata)} metadata fields)")
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
 import json
 
+from config import KAFKA_BOOTSTRAP_SERVERS, KAFKA_TOPIC
+
 producer = None
 
 def _get_producer():
@@ -8,7 +10,7 @@ def _get_producer():
         try:
             from kafka import KafkaProducer
             producer = KafkaProducer(
-                bootstrap_servers="localhost:9092",
+                bootstrap_servers=KAFKA_BOOTSTRAP_SERVERS,
                 value_serializer=lambda v: json.dumps(v).encode("utf-8")
             )
         except Exception as e:
@@ -21,5 +23,17 @@ def send_issue_event(event: dict):
     if p is None:
         print("Kafka not available, skipping event send")
         return
-    p.send("live_issues", event)
+    p.send(KAFKA_TOPIC, event)
+    p.flush()
+
+
+def send_issue_events(events: list[dict]) -> bool:
+    """Publish a batch and flush once; returns False when Kafka is unavailable."""
+    p = _get_producer()
+    if p is None:
+        print("Kafka not available, skipping batch send")
+        return False
+    for event in events:
+        p.send(KAFKA_TOPIC, event)
     p.flush()
+    return True
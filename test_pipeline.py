@@ -2,7 +2,7 @@
 Full RAG Pipeline Test - shows data flowing through EVERY step.
 Run: python test_pipeline.py
 """
-import os, sys
+import os, sys, time
 os.environ["PYTHONIOENCODING"] = "utf-8"
 
 from dotenv import load_dotenv
@@ -11,10 +11,9 @@ load_dotenv()
 from core.vector_store import VectorStore
 from core.embeddings import EmbeddingModel
 from retrieval.dense import DenseRetriever
-from retrieval.bm import SparseRetriever
-from retrieval.rrf import rrf
+from retrieval.fusion import fuse
 from retrieval.rerank import simple_rerank
-from retrieval.recency import apply_recency_boost, within_recency_window
+from retrieval.recency import within_recency_window
 
 query = sys.argv[1] if len(sys.argv) > 1 else "database CPU critical"
 team = sys.argv[2] if len(sys.argv) > 2 else None
@@ -50,53 +49,38 @@ print(f"  After filtering: {len(filtered)} results remain")
 # ── STEP 3: BM25 Sparse Search ──
 print(f"\n[STEP 3] BM25 SPARSE SEARCH (keyword matching)")
 print("-" * 50)
-if team:
-    texts = [text for text, meta in store.iter_docs() if meta.get("team_tag") == team]
-else:
-    texts = store.store.all_texts()
+sparse_ids, sparse_scores = store.sparse_search(query, 8, team_tag=team)
+print(f"  BM25 index size: {len(store.sparse)} documents")
+print(f"  Found {len(sparse_ids)} BM25 matches:")
+sparse_meta = store.get_documents(sparse_ids.tolist())
+for i, (doc_id, score) in enumerate(zip(sparse_ids.tolist(), sparse_scores.tolist())):
+    text = sparse_meta.get(doc_id, {}).get("text", "")
+    print(f"  #{i+1} bm25={score:.4f} | {text[:80]}...")
 
-if texts:
-    sparse_results = SparseRetriever(texts).search(query, 8)
-    print(f"  BM25 corpus size: {len(texts)} documents")
-    print(f"  Found {len(sparse_results)} BM25 matches:")
-    for i, (text, score) in enumerate(sparse_results):
-        print(f"  #{i+1} bm25={score:.4f} | {text[:80]}...")
-else:
-    sparse_results = []
-    print("  No documents in corpus for BM25")
-
-# ── STEP 4: RRF Fusion ──
-print(f"\n[STEP 4] RRF FUSION (merging dense + sparse)")
+# ── STEP 4: Fusion (RRF + normalized scores + recency, by document id) ──
+print(f"\n[STEP 4] FUSION (merging dense + sparse with recency)")
 print("-" * 50)
-text_to_meta = {text: meta for text, meta in store.iter_docs()}
 sparse_docs = []
-bm25_map = {t: s for t, s in sparse_results}
-for text, bm25_score in sparse_results:
-    meta = text_to_meta.get(text, {})
-    sparse_docs.append({"text": text, "score": 0, "bm25_score": bm25_score, "metadata": meta})
-
-dense_enriched = [{**d, "bm25_score": bm25_map.get(d["text"], 0)} for d in filtered]
-fused = rrf(dense_enriched, [(d["text"], d["bm25_score"]) for d in sparse_docs])
-print(f"  RRF produced {len(fused)} fused results")
-
-all_by_text = {d["text"]: d for d in dense_enriched}
-for t in sparse_docs:
-    all_by_text.setdefault(t["text"], t)
-fused_docs = [all_by_text.get(text, {"text": text, "score": 0, "metadata": {}}) for text in fused]
+for doc_id, bm25_score in zip(sparse_ids.tolist(), sparse_scores.tolist()):
+    doc = sparse_meta.get(doc_id)
+    if doc is None:
+        continue
+    sparse_docs.append({"id": doc_id, "text": doc["text"], "bm25_score": bm25_score, "metadata": doc.get("metadata", {})})
 
-# ── STEP 5: Recency Boost ──
-print(f"\n[STEP 5] RECENCY BOOST")
-print("-" * 50)
-boosted = apply_recency_boost(fused_docs)
-print(f"  Boosted {len(boosted)} documents by recency")
+fused = fuse(filtered, sparse_docs, time.time())
+print(f"  Fusion produced {len(fused)} ranked results")
+for i, d in enumerate(fused):
+    sc = d["scores"]
+    print(f"  #{i+1} final={sc['final']:.4f} dense={sc['dense']:.4f} bm25={sc['bm25']:.4f} "
+          f"rrf={sc['rrf']:.4f} recency={sc['recency']:.4f} | {d['text'][:60]}...")
 
-# ── STEP 6: Reranking ──
-print(f"\n[STEP 6] FINAL RERANKING")
+# ── STEP 5: Reranking ──
+print(f"\n[STEP 5] FINAL RERANKING")
 print("-" * 50)
-reranked = simple_rerank(query, [{"text": d["text"], "final_score": d.get("final_score", 0)} for d in boosted])
+reranked = simple_rerank(query, fused)
 print(f"  Reranked to {len(reranked)} results")
 
-# ── STEP 7: Top 3 sent to LLM ──
+# ── STEP 6: Top 3 sent to LLM ──
 top3 = [d["text"] for d in reranked[:3]]
 print(f"\n{'=' * 70}")
 print(f"  [FINAL] TOP 3 DOCUMENTS SENT TO LLM:")
@@ -0,0 +1,24 @@
+"""Shared fixtures: data/ and the analytics database are relative to the working directory."""
+
+import numpy as np
+import pytest
+
+from config import EMBEDDING_DIM
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run the test in its own directory, so its data/ starts empty."""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    """Deterministic EMBEDDING_DIM pseudo-embeddings instead of the model."""
+    from core.embeddings import EmbeddingModel, _pseudo_embedding
+
+    def encode(cls, texts):
+        return np.stack([_pseudo_embedding(text, EMBEDDING_DIM) for text in texts])
+
+    monkeypatch.setattr(EmbeddingModel, "encode", classmethod(encode))
@@ -0,0 +1,91 @@
+"""Kafka consumer dead-lettering: records that cannot be indexed are set aside, not redelivered forever."""
+
+from collections import namedtuple
+
+import pytest
+
+from stream import consumer
+
+TopicPartition = namedtuple("TopicPartition", "topic partition")
+Record = namedtuple("Record", "topic partition offset value")
+TP = TopicPartition("live_issues", 0)
+
+
+class FakeConsumer:
+    """Serves `log` in poll order, honours seek() and stops the loop after `max_polls`."""
+
+    def __init__(self, log, max_polls=40):
+        self.log = log
+        self.position = 0
+        self.committed = None
+        self.polls = 0
+        self.max_polls = max_polls
+
+    def poll(self, timeout_ms, max_records):
+        self.polls += 1
+        if self.polls > self.max_polls:
+            raise KeyboardInterrupt
+        end = min(len(self.log), self.position + max_records)
+        records = [Record(TP.topic, TP.partition, o, self.log[o]) for o in range(self.position, end)]
+        self.position = end
+        return {TP: records} if records else {}
+
+    def commit(self, offsets):
+        self.committed = offsets[TP].offset
+
+    def seek(self, tp, offset):
+        self.position = offset
+
+    def close(self):
+        pass
+
+
+class FakeStore:
+    def __init__(self):
+        self.texts = []
+
+    def add_documents(self, texts, metadatas):
+        if "POISON" in texts:
+            raise RuntimeError("rejected")
+        self.texts.extend(texts)
+
+
+@pytest.fixture
+def dead_letters(monkeypatch):
+    sent = []
+    monkeypatch.setattr(consumer, "dead_letter", lambda failed: sent.extend(failed))
+    monkeypatch.setattr(consumer.time, "sleep", lambda seconds: None)
+    return sent
+
+
+def _run(monkeypatch, log, **kwargs):
+    fake, store = FakeConsumer(log), FakeStore()
+    monkeypatch.setattr(consumer, "_make_consumer", lambda **_: fake)
+    try:
+        consumer.run_batched(store, max_wait_ms=0, concurrency=1, **kwargs)
+    except KeyboardInterrupt:
+        pass
+    return fake, store
+
+
+def test_bad_records_are_dead_lettered_and_the_rest_indexed(dead_letters, monkeypatch):
+    log = [{"id": i, "text": f"incident {i}"} for i in range(10)]
+    log[3] = {"id": 3}  # no text
+    log[5] = "not json{"
+    log[7] = {"id": 7, "text": "POISON"}  # the store rejects it
+
+    fake, store = _run(monkeypatch, log, max_records=4)
+
+    assert fake.committed == len(log)
+    assert store.texts == [f"incident {i}" for i in range(10) if i not in (3, 5, 7)]
+    assert sorted(record.offset for record, _ in dead_letters) == [3, 5, 7]
+
+
+def test_a_batch_failing_every_redelivery_is_dead_lettered(dead_letters, monkeypatch):
+    log = [{"id": 0, "text": "POISON"}, {"id": 1, "text": "incident 1"}]
+
+    fake, store = _run(monkeypatch, log, max_records=1)
+
+    assert fake.committed == len(log)
+    assert store.texts == ["incident 1"]
+    assert [(record.offset, error.startswith("indexing failed")) for record, error in dead_letters] == [(0, True)]
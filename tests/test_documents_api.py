@@ -0,0 +1,78 @@
+"""/documents pagination: cursors walk every matching document once, in id order, with string ids."""
+
+import json
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from core import vector_store
+from retrieval import bm
+
+DOCS = [
+    ("disk full on db-1", {"issue_id": "a", "team_tag": "ops", "status": "OPEN", "timestamp": "2026-01-01T00:00:00"}),
+    ("cpu spike on api-2", {"issue_id": "b", "team_tag": "ops", "status": "RESOLVED", "timestamp": "2026-01-02T00:00:00"}),
+    ("oom kill in worker", {"issue_id": "c", "team_tag": "sec", "status": "OPEN", "timestamp": "2026-01-03T00:00:00"}),
+    ("tls expiry on edge", {"issue_id": "d", "team_tag": "ops", "status": "OPEN", "timestamp": "2026-01-04T00:00:00"}),
+    ("queue backlog", {"issue_id": "e", "team_tag": "ops", "status": "OPEN"}),
+]
+
+
+@pytest.fixture
+def api(workdir, fake_embeddings, monkeypatch):
+    monkeypatch.setenv("GROQ_API_KEY", os.environ.get("GROQ_API_KEY") or "test")
+    monkeypatch.setattr(vector_store, "VECTOR_BACKEND", "faiss")
+    monkeypatch.setattr(bm, "_sparse_index", None)
+    from app.auth import UserContext, get_current_user
+    from app.main import app
+
+    store = vector_store.VectorStore()
+    ids = store.add_documents([text for text, _ in DOCS], [meta for _, meta in DOCS])
+    user = {"role": "admin"}
+    app.dependency_overrides[get_current_user] = lambda: UserContext(id="u1", team="ops", **user)
+    app.dependency_overrides[vector_store.get_vector_store] = lambda: store
+    yield TestClient(app), [str(doc_id) for doc_id in ids], user
+    app.dependency_overrides.clear()
+
+
+def _pages(client, **params) -> list[list[str]]:
+    pages, cursor = [], None
+    while True:
+        body = client.get("/documents", params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        pages.append(list(body["documents"]))
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+        assert isinstance(cursor, str)
+
+
+def test_cursor_pages_cover_every_document_once(api):
+    client, ids, _ = api
+    pages = _pages(client, limit=2)
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [doc_id for page in pages for doc_id in page] == ids
+
+
+def test_filters_apply_across_pages(api):
+    client, ids, _ = api
+    assert sum(_pages(client, limit=1, team="ops", status="open"), []) == [ids[0], ids[3], ids[4]]
+    timed = sum(_pages(client, limit=1, since="2026-01-02T00:00:00", until="2026-01-04T00:00:00"), [])
+    assert timed == [ids[1], ids[2]]
+
+
+def test_ndjson_streams_from_the_cursor(api):
+    client, ids, _ = api
+    first = client.get("/documents", params={"limit": 2}).json()
+    response = client.get("/documents", params={"limit": 2, "cursor": first["next_cursor"], "format": "ndjson"})
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == ids[2:]
+    assert rows[0]["text"] == DOCS[2][0]
+
+
+def test_bad_cursor_and_team_scoping(api):
+    client, ids, user = api
+    assert client.get("/documents", params={"cursor": "nope"}).status_code == 400
+
+    user["role"] = "engineer"  # non-admins only see their own team
+    assert sum(_pages(client, limit=10), []) == [ids[0], ids[1], ids[3], ids[4]]
+    assert client.get("/documents", params={"team": "sec"}).status_code == 403
@@ -0,0 +1,65 @@
+"""Embedding micro-batcher cancellation and the on-disk cache spill."""
+
+import threading
+
+import numpy as np
+import pytest
+
+from core.embeddings import EmbeddingBatcher, EmbeddingCache
+
+
+def test_batcher_skips_cancelled_callers():
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def encode(texts):
+        calls.append(list(texts))
+        started.set()
+        release.wait(5)
+        return [np.full(2, len(text), dtype=np.float32) for text in texts]
+
+    batcher = EmbeddingBatcher(encode, max_batch_size=8, max_wait_ms=50)
+    first = batcher.submit("a")
+    assert started.wait(5)  # the worker is busy with the first batch
+    cancelled, kept = batcher.submit("bb"), batcher.submit("ccc")
+    assert cancelled.cancel()
+    release.set()
+
+    assert first.result(5).tolist() == [1, 1]
+    assert kept.result(5).tolist() == [3, 3]
+    assert cancelled.cancelled()
+    assert calls == [["a"], ["ccc"]]
+
+
+def test_batcher_survives_a_failed_batch():
+    def encode(texts):
+        if "bad" in texts:
+            raise ValueError("boom")
+        return [np.zeros(2, dtype=np.float32) for _ in texts]
+
+    batcher = EmbeddingBatcher(encode, max_batch_size=1, max_wait_ms=0)
+    with pytest.raises(ValueError):
+        batcher.submit("bad").result(5)
+    assert batcher.submit("good").result(5).tolist() == [0, 0]
+
+
+def test_disk_spill_is_shared_and_survives_restarts(tmp_path):
+    vec = np.arange(4, dtype=np.float32)
+    writer = EmbeddingCache(disk_dir=str(tmp_path), disk_slots=64)
+    writer.put(EmbeddingCache.key("m", "disk full"), vec)
+
+    reader = EmbeddingCache(disk_dir=str(tmp_path), disk_slots=64)
+    key = EmbeddingCache.key("m", "disk full")
+    np.testing.assert_array_equal(reader.get(key, dim=4), vec)
+    assert reader.stats()["disk_hits"] == 1
+    assert reader.get(EmbeddingCache.key("m", "other"), dim=4) is None
+
+
+def test_disk_spill_slot_collision_evicts_the_old_key(tmp_path):
+    cache = EmbeddingCache(disk_dir=str(tmp_path), disk_slots=1)
+    cache.put(1, np.ones(4, dtype=np.float32))
+    cache.put(2, np.full(4, 2, dtype=np.float32))
+
+    fresh = EmbeddingCache(disk_dir=str(tmp_path), disk_slots=1)
+    assert fresh.get(1, dim=4) is None
+    np.testing.assert_array_equal(fresh.get(2, dim=4), np.full(4, 2))
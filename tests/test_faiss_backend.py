@@ -0,0 +1,144 @@
+"""FAISS backend persistence (WAL replay, reload, compaction) and in-place updates and bulk deletes."""
+
+import threading
+
+import numpy as np
+import pytest
+
+from core import vector_store
+from core.vector_backends import faiss_backend
+from core.vector_backends.faiss_backend import FaissBackend
+from retrieval import bm
+
+ISSUES = [
+    ("disk full on db-1", {"issue_id": "a", "team_tag": "ops", "status": "OPEN"}),
+    ("cpu spike on api-2", {"issue_id": "b", "team_tag": "ops", "status": "OPEN"}),
+    ("oom kill in worker", {"issue_id": "c", "team_tag": "sec", "severity": "high"}),
+    ("disk full on db-1 again", {"issue_id": "a", "team_tag": "ops", "status": "OPEN"}),
+]
+
+
+@pytest.fixture
+def backend(workdir, fake_embeddings):
+    return FaissBackend()
+
+
+@pytest.fixture
+def store(workdir, fake_embeddings, monkeypatch):
+    monkeypatch.setattr(vector_store, "VECTOR_BACKEND", "faiss")
+    monkeypatch.setattr(bm, "_sparse_index", None)
+    return vector_store.VectorStore()
+
+
+def _add(target) -> list[int]:
+    return target.add_documents([text for text, _ in ISSUES], [dict(meta) for _, meta in ISSUES])
+
+
+def _docs(backend) -> dict:
+    return {doc_id: (doc["text"], doc.get("metadata")) for doc_id, doc in backend.all_docs().items()}
+
+
+def _vectors(backend) -> dict:
+    ids, vecs = backend.vectors()
+    return dict(zip(ids.tolist(), vecs))
+
+
+def test_wal_replay_restores_every_write(backend):
+    ids = _add(backend)
+    backend.update_metadata("b", {"status": "RESOLVED"})
+    backend.delete_many(["c"])
+
+    reopened = FaissBackend()
+    assert _docs(reopened) == _docs(backend)
+    assert reopened.search("disk full on db-1", 1)[0]["id"] == ids[0]
+    assert [hit["id"] for hit in reopened.search("cpu spike", 4, status="RESOLVED")] == [ids[1]]
+    assert reopened.add_document("new incident") > max(ids)
+
+
+def test_reload_picks_up_another_writer(backend):
+    other = FaissBackend()
+    ids = _add(other)
+    assert set(backend.get_documents(ids)) == set(ids)
+
+    [own] = backend.add_documents(["fresh incident"])
+    assert own not in ids
+    other.delete_many(["a"])
+    assert set(backend.get_documents(ids)) == {ids[1], ids[2]}
+    assert own in other.get_documents([own])
+
+
+def test_compaction_round_trip(backend):
+    ids = _add(backend)
+    backend.update_metadata("a", {"status": "MITIGATED"})
+    backend.delete_many(["b"])
+    docs, vectors = _docs(backend), _vectors(backend)
+
+    assert backend._compact()
+    info = backend.index_info()
+    assert info["wal_records"] == 0 and info["delta_vectors"] == 0 and info["tombstones"] == 0
+
+    for target in (backend, FaissBackend()):
+        assert _docs(target) == docs
+        compacted = _vectors(target)
+        assert set(compacted) == set(vectors)
+        for doc_id, vec in vectors.items():
+            np.testing.assert_allclose(compacted[doc_id], vec)
+        assert [hit["id"] for hit in target.search("oom kill", 4, team_tag="sec")] == [ids[2]]
+    assert backend.add_document("after compaction") > max(ids)
+
+
+def test_only_one_compaction_runs_at_a_time(backend, monkeypatch):
+    runs, release = [], threading.Event()
+
+    def compact(rebuild_as=None):
+        runs.append(rebuild_as)
+        release.wait(5)
+        backend._compacting = False
+        return True
+
+    monkeypatch.setattr(faiss_backend, "FAISS_COMPACT_EVERY", 0)
+    monkeypatch.setattr(backend, "_compact", compact)
+    barrier = threading.Barrier(8)
+
+    def race():
+        barrier.wait()
+        backend._maybe_compact()
+
+    racers = [threading.Thread(target=race) for _ in range(8)]
+    for racer in racers:
+        racer.start()
+    for racer in racers:
+        racer.join(5)
+    assert backend.rebuild("flat") is False  # one is still running
+    release.set()
+    assert len(runs) == 1
+
+
+def test_update_metadata_in_place(store):
+    ids = _add(store)
+    vectors = _vectors(store._backend)
+
+    assert store.update_metadata("a", {"status": "RESOLVED", "team_tag": "sec"}) == 2
+    assert store.update_metadata("missing", {"status": "RESOLVED"}) == 0
+
+    docs = store.get_documents(ids)
+    assert set(docs) == set(ids)
+    for doc_id in (ids[0], ids[3]):
+        assert docs[doc_id]["metadata"] == {"issue_id": "a", "team_tag": "sec", "status": "RESOLVED"}
+    assert docs[ids[1]]["metadata"]["status"] == "OPEN"
+    for doc_id, vec in _vectors(store._backend).items():
+        np.testing.assert_array_equal(vec, vectors[doc_id])
+    # The filters and the team's BM25 partition follow the new metadata
+    assert sorted(hit["id"] for hit in store.search("disk full", 4, status="RESOLVED")) == [ids[0], ids[3]]
+    assert sorted(store.sparse_search("disk", 8, team_tag="sec")[0].tolist()) == [ids[0], ids[3]]
+    assert store.sparse_search("disk", 8, team_tag="ops")[0].tolist() == []
+
+
+def test_delete_many(store):
+    ids = _add(store)
+
+    assert store.delete_many(["a", "c", "missing"]) == 3
+    assert set(store.get_documents(ids)) == {ids[1]}
+    assert store.sparse_search("disk oom cpu", 8)[0].tolist() == [ids[1]]
+    assert [hit["id"] for hit in store.search("disk full on db-1", 4)] == [ids[1]]
+    assert store.delete_many(["a"]) == 0
@@ -0,0 +1,62 @@
+"""Regression tests for the FAISS metadata bitmaps."""
+
+import threading
+
+import numpy as np
+
+from core.document_store import ColumnarDocs, LayeredDocs
+from core.vector_backends.faiss_filters import MetadataBitmaps
+
+
+def _snapshot(tmp_path, n: int = 1000) -> LayeredDocs:
+    path = str(tmp_path / "docs.bin")
+    ColumnarDocs.write(path, {
+        i: {"text": f"incident {i}", "metadata": {"team_tag": "ops", "ts": 1.7e9 + i}}
+        for i in range(n)
+    })
+    return LayeredDocs(ColumnarDocs(path))
+
+
+def _ids(mask: np.ndarray) -> list[int]:
+    return list(MetadataBitmaps.iter_ids(mask))
+
+
+def test_filtered_mask_after_deleting_newest_documents(tmp_path):
+    # A fresh process over a snapshot whose highest ids were deleted: the
+    # column fast paths must not pack removed ids past the live range
+    docs = _snapshot(tmp_path)
+    for doc_id in range(900, 1000):
+        del docs[doc_id]
+    bitmaps = MetadataBitmaps(docs)
+
+    assert _ids(bitmaps.mask({"team_tag": "ops"})) == list(range(900))
+    assert _ids(bitmaps.mask({}, min_bucket=0)) == list(range(900))
+
+
+def test_filtered_mask_excludes_removed_and_shadowed_ids(tmp_path):
+    docs = _snapshot(tmp_path, n=100)
+    del docs[10]
+    docs[20] = {"text": "incident 20", "metadata": {"team_tag": "sec", "ts": 1.7e9}}
+    bitmaps = MetadataBitmaps(docs)
+
+    ops = _ids(bitmaps.mask({"team_tag": "ops"}))
+    assert 10 not in ops and 20 not in ops
+    assert _ids(bitmaps.mask({"team_tag": "sec"})) == [20]
+
+
+def test_build_waits_for_writers_holding_the_source_lock(tmp_path):
+    # The overlay is only read under the writers' lock, so a concurrent add
+    # can neither break the iteration nor be missed by the new bitmaps
+    docs = _snapshot(tmp_path, n=10)
+    write_lock = threading.RLock()
+    bitmaps = MetadataBitmaps(docs, write_lock)
+    result = []
+    with write_lock:
+        reader = threading.Thread(target=lambda: result.append(_ids(bitmaps.mask({"team_tag": "ops"}))))
+        reader.start()
+        reader.join(0.2)
+        assert reader.is_alive()
+        docs[10] = {"text": "incident 10", "metadata": {"team_tag": "ops", "ts": 1.7e9}}
+        bitmaps.add(10, docs[10]["metadata"])
+    reader.join(5)
+    assert result == [list(range(11))]
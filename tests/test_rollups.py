@@ -0,0 +1,90 @@
+"""Dashboard rollups: upsert increments and the backfill that rebuilds them from the raw rows."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+
+@pytest.fixture
+def db(workdir, monkeypatch):
+    """A fresh analytics database in the test directory, behind every module's Session."""
+    from core import analytics, incidents
+    from jobs import rollup_backfill
+
+    engine = create_engine(f"sqlite:///{workdir / 'analytics.db'}")
+    analytics.Base.metadata.create_all(engine)
+    incidents.Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)
+    for module in (analytics, incidents, rollup_backfill):
+        monkeypatch.setattr(module, "Session", session)
+    yield session
+    engine.dispose()
+
+
+def _rollups(Session) -> dict:
+    from core.analytics import ROLLUP_DIMENSIONS, AnalyticsRollup
+
+    with Session() as session:
+        return {
+            (row.metric, row.granularity, row.bucket, *(getattr(row, d) for d in ROLLUP_DIMENSIONS)):
+                (row.count, round(row.value_sum, 6), round(row.accuracy_sum, 6))
+            for row in session.query(AnalyticsRollup)
+            if row.count
+        }
+
+
+def test_upserts_increment_one_row_per_key(db):
+    from core.analytics import AnalyticsRollup, issue_events, query_events, record_rollups
+
+    t = datetime(2026, 1, 1, 10, 30, 15)
+    with db() as session:
+        record_rollups(session, query_events("ops", 120, 0.9, t))
+        record_rollups(session, query_events("ops", 80, 0.5, t + timedelta(seconds=10)))
+        record_rollups(session, issue_events("ops", "alert", t))
+        record_rollups(session, issue_events("ops", "alert", t, sign=-1))
+        session.commit()
+
+        queries = session.query(AnalyticsRollup).filter_by(metric="query", team="ops").all()
+        assert sorted(row.granularity for row in queries) == ["hour", "minute"]
+        assert {row.bucket for row in queries} == {datetime(2026, 1, 1, 10, 30), datetime(2026, 1, 1, 10)}
+        assert all((row.count, row.value_sum) == (2, 200) for row in queries)
+        assert all(row.accuracy_sum == pytest.approx(1.4) for row in queries)
+        latency = session.query(AnalyticsRollup).filter_by(metric="query_latency", granularity="hour").all()
+        assert sorted((row.le, row.count) for row in latency) == [("100", 1), ("250", 1)]
+        retracted = session.query(AnalyticsRollup).filter_by(metric="issue_team").all()
+        assert [row.count for row in retracted] == [0, 0]
+
+
+def test_backfill_rebuilds_the_live_rollups(db):
+    from core.analytics import ROLLUP_VERSION, AnalyticsManager, AnalyticsRollup, AnalyticsRollupState
+    from core.incidents import IncidentManager
+    from jobs.rollup_backfill import MARKER, run_rollup_backfill
+
+    AnalyticsManager.track_query("q1", "why is db slow", "ops", 120, 0.9)
+    AnalyticsManager.track_query("q2", "tls expiry", "sec", 3000, 0.4)
+    AnalyticsManager.track_issues([
+        {"issue_id": "i1", "issue_type": "alert", "team": "ops", "text": "disk full"},
+        {"issue_id": "i2", "issue_type": "bug", "team": "sec", "text": "tls expiry"},
+    ])
+    IncidentManager.create("inc1", "disk full", "ops", severity="HIGH", service="db")
+    IncidentManager.create("inc2", "tls expiry", "sec", service="edge")
+    IncidentManager.transition_status("inc1", "RESOLVED")
+    IncidentManager.delete_incident("inc2")
+    live = _rollups(db)
+
+    # Rollups counted live but never backfilled: the marker, not the rows, decides
+    assert run_rollup_backfill(only_if_missing=True)["queries"] == 2
+    assert _rollups(db) == live
+    with db() as session:
+        assert session.get(AnalyticsRollupState, MARKER).version == ROLLUP_VERSION
+    assert run_rollup_backfill(only_if_missing=True) == {"skipped": True}
+
+    # A database from before the rollups: raw rows only
+    with db() as session:
+        session.query(AnalyticsRollup).delete()
+        session.query(AnalyticsRollupState).delete()
+        session.commit()
+    run_rollup_backfill(only_if_missing=True)
+    assert _rollups(db) == live
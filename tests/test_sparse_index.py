@@ -0,0 +1,90 @@
+"""Round trips of the partitioned BM25 index through its snapshot and mutation log."""
+
+import pytest
+
+from retrieval import bm
+from retrieval.bm import SparseIndex
+from retrieval.recency import UNDATED_BUCKET
+
+
+@pytest.fixture
+def paths(workdir):
+    return str(workdir / "bm25.bin"), str(workdir / "bm25.log")
+
+
+def _ids(index, query, **kwargs) -> list[int]:
+    return sorted(index.search(query, 20, **kwargs)[0].tolist())
+
+
+def _scores(index, query) -> dict:
+    ids, scores = index.search(query, 20)
+    return dict(zip(ids.tolist(), scores.tolist()))
+
+
+def test_add_replace_and_remove(paths):
+    index = SparseIndex(*paths)
+    index.add_many([
+        (1, "disk full on db-1", "ops", 10),
+        (2, "cpu spike on db-1", "ops", 10),
+        (3, "disk latency", "sec", 10),
+    ])
+    assert _ids(index, "disk") == [1, 3]
+    assert _ids(index, "disk", team="ops") == [1]
+
+    index.add(2, "disk errors", "ops", 10)  # re-adding replaces the old terms
+    assert _ids(index, "cpu") == []
+    assert _ids(index, "disk") == [1, 2, 3]
+
+    index.remove([1, 99])
+    assert _ids(index, "disk") == [2, 3]
+    assert len(index) == 2
+
+
+def test_drop_buckets_before_keeps_recent_and_undated(paths):
+    index = SparseIndex(*paths)
+    index.add_many([
+        (1, "disk full", "ops", 5),
+        (2, "disk full", "ops", 9),
+        (3, "disk full", "ops", UNDATED_BUCKET),
+    ])
+    assert index.drop_buckets_before(8) == 1
+    assert _ids(index, "disk") == [2, 3]
+    assert _ids(index, "disk", min_bucket=10) == [3]
+    assert index.drop_buckets_before(8) == 0
+
+
+def test_other_instances_replay_the_log(paths):
+    writer, reader = SparseIndex(*paths), SparseIndex(*paths)
+    writer.add_many([(1, "disk full", "ops", 1), (2, "cpu spike", "ops", 1)])
+    assert _ids(reader, "disk") == [1]
+
+    writer.remove([1])
+    writer.drop_buckets_before(0)  # nothing older than bucket 0
+    assert _ids(reader, "disk") == []
+    assert len(SparseIndex(*paths)) == len(reader) == 1
+
+
+def test_compacted_snapshot_matches_the_log(paths, workdir, monkeypatch):
+    def build(index):
+        for i in range(1, 41):
+            index.add(i, f"incident {i} {'disk' if i % 2 else 'cpu'} full", "ops" if i % 3 else "sec", i % 4)
+        index.add(5, "incident 5 cpu", "sec", 3)
+        index.remove([2, 3])
+        index.drop_buckets_before(1)
+        return index
+
+    monkeypatch.setattr(bm, "SPARSE_COMPACT_EVERY", 10**9)
+    reference = build(SparseIndex(str(workdir / "ref.bin"), str(workdir / "ref.log")))
+    monkeypatch.setattr(bm, "SPARSE_COMPACT_EVERY", 7)
+    compacted = build(SparseIndex(*paths))
+    assert compacted.base is not None and len(compacted.base.doc_ids) > 0
+
+    reopened = SparseIndex(*paths)
+    for index in (compacted, reopened):
+        assert len(index) == len(reference)
+        for query in ("disk", "cpu incident", "full"):
+            assert _scores(index, query) == pytest.approx(_scores(reference, query))
+        assert _ids(index, "disk", team="sec") == _ids(reference, "disk", team="sec")
+
+    reopened.clear()
+    assert len(SparseIndex(*paths)) == 0